@@ -0,0 +1,347 @@
+"""
+从 AniList 角色数据导出文件批量导入 characters 表
+
+支持 NDJSON（每行一个角色对象）和 JSON 数组两种格式，角色对象的结构与
+AniListService.search_characters 返回的一致。文件按流读取，不会整体载入内存；
+映射后的行按块用 executemany 做 upsert，每块提交后记录检查点（文件字节偏移），
+中断后重新运行同一命令会从检查点继续。
+
+运行方式:
+    python -m app.cli.import_characters characters.ndjson
+    python -m app.cli.import_characters characters.json --chunk-size 2000 --workers 4
+"""
+import argparse
+import codecs
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Any, BinaryIO, Deque, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Engine
+
+from app.database import bump_version_statement, get_engine, init_db, upsert_statement
+from app.models import Character
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('auto', 'ndjson', 'json')
+
+# 读取 JSON 数组时每次读入的字节数、单个元素的最大长度
+READ_SIZE = 1 << 20
+MAX_RECORD_SIZE = 64 << 20
+
+_WHITESPACE = ' \t\r\n'
+
+
+@dataclass
+class ImportStats:
+    """导入统计"""
+    rows: int = 0  # 本次导入的行数
+    total: int = 0  # 包括之前中断的导入在内的累计行数
+    skipped: int = 0
+    chunks: int = 0
+    offset: int = 0
+    elapsed: float = 0.0
+    resumed_from: int = 0
+
+    @property
+    def rate(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def detect_format(path: Path) -> str:
+    """根据第一个非空白字符判断格式：[ 为 JSON 数组，否则为 NDJSON"""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(4096)
+            if not chunk:
+                return 'ndjson'
+            stripped = chunk.lstrip()
+            if stripped:
+                return 'json' if stripped[:1] == b'[' else 'ndjson'
+
+
+def map_record(record: Any) -> Optional[Dict[str, Any]]:
+    """把一个角色对象映射为表的一行，缺少有效 id 时返回 None"""
+    if not isinstance(record, dict):
+        return None
+    char_id = record.get('id')
+    if not isinstance(char_id, int) or isinstance(char_id, bool):
+        return None
+    return Character.row_from_anilist(record)
+
+
+def parse_lines(lines: List[bytes]) -> Tuple[List[Dict[str, Any]], int]:
+    """解析并映射一批 NDJSON 行，返回 (行, 跳过的数量)；也在解析子进程中执行"""
+    rows = []
+    skipped = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = map_record(json.loads(line))
+        except ValueError:
+            row = None
+        if row is None:
+            skipped += 1
+        else:
+            rows.append(row)
+    return rows, skipped
+
+
+def iter_ndjson_batches(f: BinaryIO, batch_size: int) -> Iterator[Tuple[List[bytes], int]]:
+    """按批读取 NDJSON 行，返回 (原始行, 这批结束处的字节偏移)"""
+    while True:
+        lines = list(islice(f, batch_size))
+        if not lines:
+            return
+        yield lines, f.tell()
+
+
+def iter_json_array(f: BinaryIO, offset: int) -> Iterator[Tuple[Any, int]]:
+    """
+    流式解析 JSON 数组，逐个返回 (元素, 元素结束处的字节偏移)
+
+    从 offset 开始读取；offset 为 0 时跳过开头的 [，否则 offset 应指向某个元素之后。
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    f.seek(offset)
+    buffer = ''
+    pos = 0
+    started = offset > 0
+    eof = False
+
+    def fill() -> None:
+        nonlocal buffer, pos, eof
+        if len(buffer) - pos > MAX_RECORD_SIZE:
+            raise ValueError(f'JSON 数组格式错误：偏移 {offset} 之后的元素无法解析')
+        data = f.read(READ_SIZE)
+        eof = not data
+        buffer = buffer[pos:] + utf8.decode(data, final=eof)
+        pos = 0
+
+    while True:
+        # 跳过空白和分隔符（都是单字节字符）
+        while True:
+            if pos == len(buffer):
+                if eof:
+                    return
+                fill()
+                continue
+            ch = buffer[pos]
+            if ch in _WHITESPACE or (ch == ',' and started):
+                pos += 1
+                offset += 1
+            elif not started:
+                if ch != '[':
+                    raise ValueError('JSON 数组格式错误：文件没有以 [ 开头')
+                started = True
+                pos += 1
+                offset += 1
+            elif ch == ']':
+                return
+            else:
+                break
+
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            if eof:
+                raise
+            # 元素跨越了读取边界：读入更多数据再试
+            fill()
+            continue
+        if end == len(buffer) and not eof:
+            # 数字可能在边界处被截断，读入更多数据后重新解析
+            fill()
+            continue
+        text = buffer[pos:end]
+        offset += len(text) if text.isascii() else len(text.encode('utf-8'))
+        pos = end
+        yield value, offset
+
+
+def load_checkpoint(path: Path, source: Path) -> Dict[str, Any]:
+    """读取检查点，源文件大小或修改时间变化时不使用"""
+    if not path.exists():
+        return {}
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    stat = source.stat()
+    if data.get('size') != stat.st_size or data.get('mtime') != stat.st_mtime:
+        logger.warning('源文件已变化，忽略检查点，从头导入')
+        return {}
+    return data
+
+
+def save_checkpoint(path: Path, source: Path, offset: int, rows: int) -> None:
+    """原子地写入检查点"""
+    stat = source.stat()
+    data = {'source': str(source), 'size': stat.st_size, 'mtime': stat.st_mtime, 'offset': offset, 'rows': rows}
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(data), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def iter_row_chunks(
+    path: Path,
+    fmt: str,
+    offset: int,
+    chunk_size: int,
+    workers: int,
+    stats: ImportStats
+) -> Iterator[Tuple[List[Dict[str, Any]], int]]:
+    """读取文件，返回 (映射后的一块行, 这块结束处的字节偏移)"""
+    def collect(result: Any, end: int) -> Tuple[List[Dict[str, Any]], int]:
+        rows, skipped = result.get() if hasattr(result, 'get') else result
+        stats.skipped += skipped
+        return rows, end
+
+    with open(path, 'rb') as f:
+        if fmt == 'ndjson':
+            f.seek(offset)
+            batches = iter_ndjson_batches(f, chunk_size)
+            if workers > 1:
+                # 多进程解析：主进程只负责读行和写库，按提交顺序取结果，检查点偏移依然正确；
+                # 最多预读 workers * 2 批，避免整个文件堆积在内存里
+                with multiprocessing.Pool(workers) as pool:
+                    window: Deque[Tuple[Any, int]] = deque()
+                    for lines, end in batches:
+                        window.append((pool.apply_async(parse_lines, (lines,)), end))
+                        if len(window) >= workers * 2:
+                            yield collect(*window.popleft())
+                    while window:
+                        yield collect(*window.popleft())
+            else:
+                for lines, end in batches:
+                    yield collect(parse_lines(lines), end)
+            return
+
+        rows: List[Dict[str, Any]] = []
+        end = offset
+        for record, end in iter_json_array(f, offset):
+            row = map_record(record)
+            if row is None:
+                stats.skipped += 1
+                continue
+            rows.append(row)
+            if len(rows) >= chunk_size:
+                yield rows, end
+                rows = []
+        if rows or end != offset:
+            yield rows, end
+
+
+def write_rows(engine: Engine, rows: List[Dict[str, Any]]) -> None:
+    """一个事务内用 executemany 写入一块行（同一 id 只保留最后一次），同时更新角色表版本"""
+    if not rows:
+        return
+    rows = list({row['id']: row for row in rows}.values())
+    statement = upsert_statement(engine.dialect.name, Character.__table__, list(rows[0]))
+    with engine.begin() as conn:
+        conn.execute(statement, rows)
+        conn.execute(bump_version_statement(engine.dialect.name, Character.__tablename__))
+
+
+def import_file(
+    path: Path,
+    engine: Engine,
+    fmt: str = 'auto',
+    chunk_size: int = 1000,
+    workers: int = 0,
+    checkpoint_path: Optional[Path] = None,
+    restart: bool = False,
+    progress_every: float = 5.0
+) -> ImportStats:
+    """
+    导入一个导出文件
+
+    Args:
+        path: 导出文件路径
+        engine: 同步数据库引擎
+        fmt: 文件格式（auto / ndjson / json）
+        chunk_size: 每条 upsert 语句的行数
+        workers: NDJSON 解析进程数，0 或 1 表示在主进程解析
+        checkpoint_path: 检查点文件，默认为 <导出文件>.checkpoint
+        restart: 忽略已有检查点，从头导入
+        progress_every: 进度日志的间隔（秒）
+
+    Returns:
+        导入统计
+    """
+    path = Path(path)
+    if fmt == 'auto':
+        fmt = detect_format(path)
+    if fmt == 'json' and workers > 1:
+        logger.warning('JSON 数组需要顺序解析，--workers 只对 NDJSON 生效')
+    checkpoint_path = Path(checkpoint_path) if checkpoint_path else path.with_name(path.name + '.checkpoint')
+
+    checkpoint = {} if restart else load_checkpoint(checkpoint_path, path)
+    stats = ImportStats(total=checkpoint.get('rows', 0), offset=checkpoint.get('offset', 0))
+    stats.resumed_from = stats.offset
+    if stats.offset:
+        logger.info(f'从检查点继续导入: 偏移 {stats.offset}，已导入 {stats.total} 行')
+
+    start = time.perf_counter()
+    last_log = start
+    for rows, end in iter_row_chunks(path, fmt, stats.offset, chunk_size, workers, stats):
+        write_rows(engine, rows)
+        stats.rows += len(rows)
+        stats.total += len(rows)
+        stats.chunks += 1
+        stats.offset = end
+        save_checkpoint(checkpoint_path, path, stats.offset, stats.total)
+
+        now = time.perf_counter()
+        if now - last_log >= progress_every:
+            last_log = now
+            logger.info(f'已导入 {stats.total} 行，{stats.rows / (now - start):.0f} 行/秒')
+
+    stats.elapsed = time.perf_counter() - start
+    logger.info(
+        f'导入完成: 本次 {stats.rows} 行（累计 {stats.total} 行），跳过 {stats.skipped} 条，'
+        f'{stats.elapsed:.1f} 秒，{stats.rate:.0f} 行/秒'
+    )
+    checkpoint_path.unlink(missing_ok=True)
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', type=Path, help='NDJSON 或 JSON 数组导出文件')
+    parser.add_argument('--format', choices=FORMATS, default='auto', help='文件格式，默认根据内容判断')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='每条 upsert 语句的行数')
+    parser.add_argument('--workers', type=int, default=0, help='NDJSON 解析进程数（0 表示不使用子进程）')
+    parser.add_argument('--checkpoint', type=Path, default=None, help='检查点文件，默认 <导出文件>.checkpoint')
+    parser.add_argument('--restart', action='store_true', help='忽略检查点，从头导入')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s', stream=sys.stderr)
+    if not args.path.exists():
+        parser.error(f'文件不存在: {args.path}')
+
+    init_db()
+    import_file(
+        args.path,
+        get_engine(),
+        fmt=args.format,
+        chunk_size=max(1, args.chunk_size),
+        workers=args.workers,
+        checkpoint_path=args.checkpoint,
+        restart=args.restart,
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,33 @@
-from .database import get_engine, get_session, init_db
+from .database import (
+    get_engine,
+    get_session,
+    init_db,
+    ensure_indexes,
+    get_async_engine,
+    get_async_session,
+    close_async_engine,
+)
+from .upsert import (
+    build_upsert,
+    upsert_statement,
+    upsert_characters,
+    save_character_media,
+    bump_version_statement,
+    bump_table_version,
+)
 
-__all__ = ["get_engine", "get_session", "init_db"]
+__all__ = [
+    "get_engine",
+    "get_session",
+    "init_db",
+    "ensure_indexes",
+    "get_async_engine",
+    "get_async_session",
+    "close_async_engine",
+    "build_upsert",
+    "upsert_statement",
+    "upsert_characters",
+    "save_character_media",
+    "bump_version_statement",
+    "bump_table_version",
+]
@@ -1,11 +1,38 @@
 from sqlmodel import SQLModel, Session, create_engine
-from typing import Generator, Optional
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Any, AsyncGenerator, Dict, Generator, Optional
 from sqlalchemy import Engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
 from app.config import settings
+from app.metrics import instrument_engine, timing_enabled
 
 # 使用懒加载模式，避免导入时立即连接数据库
 _engine: Optional[Engine] = None
+_async_engine: Optional[AsyncEngine] = None
+
+# 同步驱动 -> 异步驱动
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def _pool_options(url: str) -> Dict[str, Any]:
+    """连接池参数（sqlite 使用 SQLAlchemy 默认的连接池，不支持这些参数）"""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_timeout": settings.db_pool_timeout,
+    }
 
 
 def get_engine() -> Engine:
@@ -15,14 +42,65 @@ def get_engine() -> Engine:
         _engine = create_engine(
             settings.database_url,
             echo=False,
-            pool_pre_ping=True
+            pool_pre_ping=True,
+            **_pool_options(settings.database_url)
         )
+        if settings.metrics_enabled or timing_enabled():
+            instrument_engine(_engine)
     return _engine
 
 
+def get_async_database_url() -> str:
+    """异步引擎使用的连接串：优先 async_database_url，否则把 database_url 换成对应的异步驱动"""
+    if settings.async_database_url:
+        return settings.async_database_url
+    url = make_url(settings.database_url)
+    drivername = ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+def get_async_engine() -> AsyncEngine:
+    """获取异步数据库引擎（懒加载）"""
+    global _async_engine
+    if _async_engine is None:
+        url = get_async_database_url()
+        _async_engine = create_async_engine(
+            url,
+            echo=False,
+            pool_pre_ping=True,
+            **_pool_options(url)
+        )
+        if settings.metrics_enabled or timing_enabled():
+            instrument_engine(_async_engine)
+    return _async_engine
+
+
+async def close_async_engine() -> None:
+    """关闭异步引擎的连接池"""
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+
 def init_db() -> None:
-    """初始化数据库，创建所有表"""
-    SQLModel.metadata.create_all(get_engine())
+    """初始化数据库，创建所有表，并为已存在的表补建新增的索引"""
+    engine = get_engine()
+    SQLModel.metadata.create_all(engine)
+    ensure_indexes(engine)
+
+
+def ensure_indexes(engine: Engine) -> None:
+    """
+    创建模型上声明、但数据库里还没有的索引
+
+    create_all 只在建表时创建索引，已有的表新增索引需要单独创建（checkfirst 跳过已存在的）。
+    大表第一次创建索引可能需要一些时间。
+    """
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
 
 
 def get_session() -> Generator[Session, None, None]:
@@ -31,6 +109,12 @@ def get_session() -> Generator[Session, None, None]:
         yield session
 
 
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """异步数据库会话依赖注入"""
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        yield session
+
+
 # 为了向后兼容，提供 engine 属性
 @property
 def engine() -> Engine:
@@ -0,0 +1,174 @@
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import Table, delete, insert
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.sql.dml import Insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.models import Character, CharacterMedia, Media, TableVersionRecord
+
+
+def build_upsert(dialect_name: str, table: Table, rows: Sequence[Dict[str, Any]], key: str = "id") -> Insert:
+    """
+    构造多行 upsert 语句
+
+    - MySQL: INSERT ... ON DUPLICATE KEY UPDATE
+    - SQLite / PostgreSQL: INSERT ... ON CONFLICT (key) DO UPDATE
+
+    Args:
+        dialect_name: 数据库方言名称（engine.dialect.name）
+        table: 目标表
+        rows: 要写入的行，每行的键相同
+        key: 冲突判断的主键列
+
+    Returns:
+        可直接执行的 INSERT 语句
+    """
+    return upsert_statement(dialect_name, table, list(rows[0]), key).values(list(rows))
+
+
+def upsert_statement(dialect_name: str, table: Table, columns: Sequence[str], key: str = "id") -> Insert:
+    """
+    构造不带 VALUES 的 upsert 语句，配合 executemany 使用
+
+    语句只编译一次（命中 SQLAlchemy 编译缓存），大批量写入时比每块构造一条多行
+    VALUES 语句快得多；pymysql 的 executemany 会自动改写为多行 VALUES。
+
+    Args:
+        dialect_name: 数据库方言名称（engine.dialect.name）
+        table: 目标表
+        columns: 写入的列
+        key: 冲突判断的主键列
+
+    Returns:
+        INSERT 语句，执行时传入行列表
+    """
+    updates = [name for name in columns if name != key]
+    if dialect_name == "mysql":
+        statement = mysql.insert(table)
+        return statement.on_duplicate_key_update({name: statement.inserted[name] for name in updates})
+    if dialect_name in ("sqlite", "postgresql"):
+        module = sqlite if dialect_name == "sqlite" else postgresql
+        statement = module.insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=[key],
+            set_={name: statement.excluded[name] for name in updates}
+        )
+    raise NotImplementedError(f"不支持批量 upsert 的数据库: {dialect_name}")
+
+
+def bump_version_statement(dialect_name: str, name: str, now: Optional[float] = None) -> Insert:
+    """
+    构造“表版本加一”的语句（行不存在时插入版本 1），和表的写入放在同一个事务里执行
+
+    Args:
+        dialect_name: 数据库方言名称（engine.dialect.name）
+        name: 表名
+        now: 修改时间（Unix 时间戳），默认当前时间
+
+    Returns:
+        可直接执行的 INSERT 语句
+    """
+    table = TableVersionRecord.__table__
+    values = {'name': name, 'version': 1, 'modified_at': time.time() if now is None else now}
+    if dialect_name == "mysql":
+        statement = mysql.insert(table).values(values)
+        return statement.on_duplicate_key_update(
+            version=table.c.version + 1, modified_at=statement.inserted.modified_at
+        )
+    if dialect_name in ("sqlite", "postgresql"):
+        module = sqlite if dialect_name == "sqlite" else postgresql
+        statement = module.insert(table).values(values)
+        return statement.on_conflict_do_update(
+            index_elements=['name'],
+            set_={'version': table.c.version + 1, 'modified_at': statement.excluded.modified_at}
+        )
+    raise NotImplementedError(f"不支持批量 upsert 的数据库: {dialect_name}")
+
+
+async def bump_table_version(session: AsyncSession, name: str = Character.__tablename__) -> None:
+    """在当前事务里把表版本加一（不提交）"""
+    await session.exec(bump_version_statement(session.bind.dialect.name, name))
+
+
+def character_rows(characters: Sequence[Character]) -> List[Dict[str, Any]]:
+    """把模型转换为 upsert 需要的行（同一 id 只保留最后一次）"""
+    rows: Dict[Any, Dict[str, Any]] = {}
+    for character in characters:
+        rows[character.id] = character.model_dump()
+    return list(rows.values())
+
+
+async def upsert_characters(
+    session: AsyncSession,
+    characters: Sequence[Character],
+    media: Optional[Dict[int, List[Dict[str, Any]]]] = None
+) -> Dict[int, str]:
+    """
+    分块批量写入角色，每块一次查询已有 id + 一条多行 upsert，最后统一提交
+
+    Args:
+        session: 数据库会话
+        characters: 要写入的角色
+        media: 角色 id -> 出现的作品（Media.rows_from_anilist 的结果），和角色在同一个事务里写入
+
+    Returns:
+        id -> 'created' / 'updated'
+    """
+    rows = character_rows(characters)
+    if not rows:
+        return {}
+
+    dialect_name = session.bind.dialect.name
+    size = max(1, settings.bulk_upsert_chunk_size)
+    statuses: Dict[int, str] = {}
+    for start in range(0, len(rows), size):
+        chunk = rows[start:start + size]
+        ids = [row["id"] for row in chunk]
+        existing = set((await session.exec(select(Character.id).where(Character.id.in_(ids)))).all())
+        await session.exec(build_upsert(dialect_name, Character.__table__, chunk))
+        for char_id in ids:
+            statuses[char_id] = "updated" if char_id in existing else "created"
+    if media:
+        await save_character_media(session, media)
+    await bump_table_version(session)
+    await session.commit()
+    return statuses
+
+
+async def save_character_media(session: AsyncSession, media: Dict[int, List[Dict[str, Any]]]) -> None:
+    """
+    批量写入角色出现的作品（不提交）
+
+    作品用一条 executemany upsert 写入 media 表；这些角色原有的关联按块删除后，
+    新关联用一条 executemany INSERT 写入。角色行必须已经写入（或在会话里等待 flush）。
+
+    Args:
+        session: 数据库会话
+        media: 角色 id -> 作品行列表（按 AniList 返回的顺序）
+    """
+    if not media:
+        return
+    await session.flush()
+
+    media_rows: Dict[int, Dict[str, Any]] = {}
+    links: List[Dict[str, Any]] = []
+    for char_id, items in media.items():
+        for position, item in enumerate(items):
+            media_rows[item['id']] = item
+            links.append({'character_id': char_id, 'media_id': item['id'], 'position': position})
+
+    if media_rows:
+        statement = upsert_statement(session.bind.dialect.name, Media.__table__, ['id', 'title', 'type'])
+        await session.exec(statement, params=list(media_rows.values()))
+
+    char_ids = list(media)
+    size = max(1, settings.bulk_upsert_chunk_size)
+    table = CharacterMedia.__table__
+    for start in range(0, len(char_ids), size):
+        await session.exec(delete(table).where(table.c.character_id.in_(char_ids[start:start + size])))
+    if links:
+        await session.exec(insert(table), params=links)
@@ -1,11 +1,29 @@
+import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.config import settings
-from app.database import init_db
-from app.routers import character_router
+from app.database import init_db, close_async_engine, get_async_engine
+from app.metrics import MetricsMiddleware, TimedJSONResponse, TimingMiddleware, timing_enabled
+from app.routers import character_router, characters_router, images_router, media_router, metrics_router
+from app.services import (
+    get_client,
+    close_client,
+    close_search_cache,
+    build_local_index,
+    build_suggest_index,
+    start_sync_worker,
+    stop_sync_worker,
+    close_write_behind,
+    close_change_feed,
+    close_image_cache,
+    thumbnails_available,
+)
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
@@ -13,15 +31,44 @@ async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时初始化数据库
     init_db()
+    # 创建共享的 AniList HTTP 连接池
+    get_client()
+    # 从已保存的角色重建本地搜索索引
+    if settings.local_index_enabled:
+        try:
+            await build_local_index(get_async_engine())
+        except Exception as e:
+            logger.warning(f"本地搜索索引构建失败，先使用空索引: {e}")
+    # 从已保存的角色重建输入联想索引
+    if settings.suggest_enabled:
+        try:
+            await build_suggest_index(get_async_engine())
+        except Exception as e:
+            logger.warning(f"输入联想索引构建失败，先使用空索引: {e}")
+    # 缩略图依赖 Pillow，没有安装时所有 w= 请求都会拿到原图
+    if settings.image_proxy_enabled and settings.image_thumbnail_sizes and not thumbnails_available():
+        logger.warning("未安装 Pillow，图片代理不会生成缩略图，带宽度的请求将返回原图（pip install Pillow）")
+    # 后台同步已保存角色（默认关闭）
+    if settings.sync_enabled:
+        start_sync_worker(get_async_engine())
     yield
-    # 关闭时的清理操作（如需要）
+    # 关闭时先把写后缓冲写完并断开变更推送，再停止后台同步和缓存后台刷新，释放图片下载、AniList 和数据库连接池
+    await close_write_behind()
+    close_change_feed()
+    await stop_sync_worker()
+    await close_search_cache()
+    await close_image_cache()
+    await close_client()
+    await close_async_engine()
 
 
 def create_app() -> FastAPI:
     """创建FastAPI应用工厂函数"""
     app = FastAPI(
         title=settings.app_name,
-        lifespan=lifespan
+        lifespan=lifespan,
+        # 开启监控或请求计时时记录 JSON 响应的编码耗时
+        default_response_class=TimedJSONResponse if settings.metrics_enabled or timing_enabled() else JSONResponse
     )
 
     # 配置CORS
@@ -32,9 +79,19 @@ def create_app() -> FastAPI:
         allow_methods=settings.cors_methods,
         allow_headers=settings.cors_headers,
     )
+    # 请求分阶段计时（Server-Timing、慢请求日志、调试采样）
+    if timing_enabled():
+        app.add_middleware(TimingMiddleware)
+    # 监控指标（最外层，包括 CORS 预检请求）
+    if settings.metrics_enabled:
+        app.add_middleware(MetricsMiddleware)
 
     # 注册路由
     app.include_router(character_router)
+    app.include_router(characters_router)
+    app.include_router(media_router)
+    app.include_router(images_router)
+    app.include_router(metrics_router)
 
     return app
 
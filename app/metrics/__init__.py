@@ -0,0 +1,42 @@
+from .collectors import DEFAULT_BUCKETS, REGISTRY, Counter, Gauge, Histogram, Registry
+from .middleware import MetricsMiddleware, TimedJSONResponse, TimingMiddleware
+from .profiler import SamplingProfiler
+from .series import (
+    ANILIST_DURATION,
+    ANILIST_RESPONSES,
+    DB_DURATION,
+    DB_ERRORS,
+    HTTP_DURATION,
+    HTTP_IN_FLIGHT,
+    HTTP_REQUESTS,
+    HTTP_SERIALIZE,
+    instrument_engine,
+)
+from .timing import RequestTimer, current_timer, record_stage, stage, timing_enabled
+
+__all__ = [
+    "DEFAULT_BUCKETS",
+    "REGISTRY",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "Registry",
+    "MetricsMiddleware",
+    "TimedJSONResponse",
+    "TimingMiddleware",
+    "SamplingProfiler",
+    "RequestTimer",
+    "current_timer",
+    "record_stage",
+    "stage",
+    "timing_enabled",
+    "ANILIST_DURATION",
+    "ANILIST_RESPONSES",
+    "DB_DURATION",
+    "DB_ERRORS",
+    "HTTP_DURATION",
+    "HTTP_IN_FLIGHT",
+    "HTTP_REQUESTS",
+    "HTTP_SERIALIZE",
+    "instrument_engine",
+]
@@ -0,0 +1,244 @@
+import bisect
+import math
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 默认的延迟分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Shards:
+    """
+    按线程分片的计数数组
+
+    每个线程只写自己的分片，热路径不加锁（事件循环线程里的协程不会在一次加法中间切换）；
+    只有线程第一次写入、创建分片时才加锁。读取时把所有分片相加，可能看到正在进行中的
+    一次更新的一半，对监控数据没有影响。
+    """
+
+    __slots__ = ('size', '_shards', '_lock')
+
+    def __init__(self, size: int):
+        self.size = size
+        self._shards: Dict[int, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def local(self) -> List[float]:
+        """当前线程的分片"""
+        shard = self._shards.get(threading.get_ident())
+        if shard is None:
+            with self._lock:
+                shard = self._shards.setdefault(threading.get_ident(), [0.0] * self.size)
+        return shard
+
+    def totals(self) -> List[float]:
+        """所有分片之和"""
+        result = [0.0] * self.size
+        for shard in list(self._shards.values()):
+            for i, value in enumerate(shard):
+                result[i] += value
+        return result
+
+
+class _CounterChild:
+    __slots__ = ('_shards',)
+
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1) -> None:
+        self._shards.local()[0] += amount
+
+    def value(self) -> float:
+        return self._shards.totals()[0]
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1) -> None:
+        self._shards.local()[0] -= amount
+
+
+class _HistogramChild:
+    __slots__ = ('_bounds', '_shards')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        # 每个分桶（含 +Inf）的计数，最后一项是总和
+        self._shards = _Shards(len(bounds) + 2)
+
+    def observe(self, value: float) -> None:
+        shard = self._shards.local()
+        shard[bisect.bisect_left(self._bounds, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self) -> Tuple[List[float], float]:
+        """(各分桶的累计计数（含 +Inf）, 总和)"""
+        totals = self._shards.totals()
+        cumulative, running = [], 0.0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-1]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+class _Metric:
+    """一个指标（可带标签），labels() 按标签值取子项，子项创建后缓存"""
+
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """取标签值对应的子项（标签值必须是字符串，个数与 labelnames 一致）"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要标签 {self.labelnames}，收到 {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _items(self) -> List[Tuple[Tuple[str, ...], object]]:
+        return sorted(self._children.items())
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        """(样本名, 标签, 值)"""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.type}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    type = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def samples(self):
+        for values, child in self._items():
+            yield self.name, dict(zip(self.labelnames, values)), child.value()
+
+
+class Gauge(Counter):
+    """可增可减的当前值（例如进行中的请求数）"""
+
+    type = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def dec(self, amount: float = 1) -> None:
+        self.labels().dec(amount)
+
+
+class Histogram(_Metric):
+    """分桶直方图（Prometheus 的累计分桶 + _sum + _count）"""
+
+    type = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        registry=None
+    ):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets if not math.isinf(bound)))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self):
+        bounds = [_format_value(bound) for bound in self.buckets] + ['+Inf']
+        for values, child in self._items():
+            labels = dict(zip(self.labelnames, values))
+            cumulative, total = child.snapshot()
+            for bound, count in zip(bounds, cumulative):
+                yield f"{self.name}_bucket", {**labels, 'le': bound}, count
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative[-1]
+
+
+class Registry:
+    """指标注册表，render() 输出 Prometheus 文本格式"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标已注册: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def sample(self, name: str, labels: Optional[Dict[str, str]] = None) -> Optional[float]:
+        """
+        取一个样本的当前值（测试和调试用）
+
+        Args:
+            name: 样本名（直方图用 xxx_count / xxx_sum / xxx_bucket）
+            labels: 标签
+
+        Returns:
+            值；没有这个样本时返回 None
+        """
+        labels = labels or {}
+        for metric in self._metrics.values():
+            if not name.startswith(metric.name):
+                continue
+            for sample_name, sample_labels, value in metric.samples():
+                if sample_name == name and sample_labels == labels:
+                    return value
+        return None
+
+
+# 默认注册表
+REGISTRY = Registry()
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+
+from app.config import settings
+from app.metrics.profiler import SamplingProfiler, profile_path
+from app.metrics.series import (
+    HTTP_DURATION,
+    HTTP_IN_FLIGHT,
+    HTTP_REQUESTS,
+    HTTP_SERIALIZE,
+    current_scope,
+    route_label,
+)
+from app.metrics.timing import record_stage, start_timer, stop_timer
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """
+    记录 HTTP 请求数、耗时和进行中请求数的 ASGI 中间件
+
+    纯 ASGI 实现（不用 BaseHTTPMiddleware，不额外创建任务），路由标签在请求结束后
+    从 scope['route'] 读取，每个请求只有几次字典查找和加法。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        method = scope['method']
+        in_flight = HTTP_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        status = 500
+        token = current_scope.set(scope)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.dec()
+            current_scope.reset(token)
+            route = route_label(scope)
+            HTTP_DURATION.labels(method, route).observe(elapsed)
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+
+
+class TimingMiddleware:
+    """
+    请求分阶段计时
+
+    请求开始时创建计时器，各处用 stage() 记录的阶段耗时在响应头发出时写入 Server-Timing；
+    到响应头发出为止的耗时超过 slow_request_ms 的记录一条带阶段明细的慢请求日志。
+    之后发送响应体的时间不计入（SSE 推送、大批量导出这类流式响应会持续很久，不算慢请求）。
+    调试模式（settings.debug）下带 X-Profile: 1 请求头的请求会在处理期间对事件循环线程采样，
+    折叠栈写入 profile_dir，文件路径在 X-Profile-File 响应头里。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timer, token = start_timer()
+        # 响应头发出时的耗时（毫秒）和阶段明细
+        first_byte = None
+        profiler = profile_file = None
+        if settings.debug and (b'x-profile', b'1') in scope.get('headers', ()):
+            profile_file = profile_path(settings.profile_dir, scope['method'], scope['path'])
+            profiler = SamplingProfiler(interval=settings.profile_interval).start()
+
+        async def send_wrapper(message):
+            nonlocal first_byte
+            if message['type'] == 'http.response.start':
+                first_byte = (timer.elapsed() * 1000, timer.summary())
+                headers = MutableHeaders(scope=message)
+                if settings.server_timing_enabled:
+                    headers.append('Server-Timing', timer.server_timing())
+                if profile_file:
+                    headers.append('X-Profile-File', profile_file)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stop_timer(token)
+            # 没有发出响应（处理出错）时按整个请求计
+            elapsed, summary = first_byte or (timer.elapsed() * 1000, timer.summary())
+            if profiler is not None:
+                profiler.stop()
+                await asyncio.to_thread(profiler.write, profile_file)
+                logger.info(f"请求采样已写入 {profile_file}（{sum(profiler.samples.values())} 个样本）")
+            if settings.slow_request_ms and elapsed >= settings.slow_request_ms:
+                logger.warning(
+                    f"慢请求 {scope['method']} {route_label(scope)} {elapsed:.1f}ms: {summary}"
+                )
+
+
+class TimedJSONResponse(JSONResponse):
+    """记录 JSON 编码耗时的响应类（作为应用的 default_response_class），计入监控指标和请求计时"""
+
+    def render(self, content: Any) -> bytes:
+        started = time.perf_counter()
+        body = super().render(content)
+        elapsed = time.perf_counter() - started
+        HTTP_SERIALIZE.labels(route_label(current_scope.get())).observe(elapsed)
+        record_stage('serialize', elapsed)
+        return body
@@ -0,0 +1,66 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+
+def _frame_name(code) -> str:
+    """和 py-spy 一样的帧名：函数名 (文件:行)"""
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    对一个线程定时采样调用栈，输出火焰图工具（flamegraph.pl、speedscope）可读的折叠栈格式
+
+    采样在单独的线程里进行，被采样的线程不需要任何改动。异步请求在事件循环线程上运行，
+    采样到的是事件循环此刻在执行的代码：同时处理的其他请求也会出现在结果里，
+    空闲等待 I/O 时是 select / epoll 的栈。只用于调试。
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.001):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self) -> "SamplingProfiler":
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def collapsed(self) -> str:
+        """折叠栈文本，每行是 帧1;帧2;... 次数"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def write(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.collapsed())
+
+
+def profile_path(directory: str, method: str, path: str) -> str:
+    """采样结果的文件名：时间 + 方法 + 路径"""
+    slug = ''.join(char if char.isalnum() else '_' for char in path.strip('/'))[:80] or 'root'
+    stamp = time.strftime('%Y%m%d-%H%M%S') + f"-{int(time.time() * 1000) % 1000:03d}"
+    return os.path.join(directory, f"{stamp}-{method.lower()}-{slug}.folded")
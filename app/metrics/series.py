@@ -0,0 +1,77 @@
+import time
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from sqlalchemy import Engine, event
+
+from app.metrics.collectors import Counter, Gauge, Histogram
+from app.metrics.timing import record_stage
+
+# HTTP 请求（route 是路由模板，例如 /api/media/{media_id}/characters，未匹配的请求为 unmatched）
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP 请求数', ['method', 'route', 'status'])
+HTTP_DURATION = Histogram('http_request_duration_seconds', 'HTTP 请求耗时（秒，流式响应包含整个连接时长）', ['method', 'route'])
+HTTP_IN_FLIGHT = Gauge('http_requests_in_flight', '正在处理的 HTTP 请求数', ['method'])
+HTTP_SERIALIZE = Histogram(
+    'http_response_serialize_seconds', 'JSON 响应编码耗时（秒）', ['route'],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+
+# AniList 上游（每次 HTTP 请求，包括 429 重试和对冲请求；status 是状态码，连接失败为 error）
+ANILIST_DURATION = Histogram('anilist_request_duration_seconds', 'AniList 请求耗时（秒）')
+ANILIST_RESPONSES = Counter('anilist_responses_total', 'AniList 响应数', ['status'])
+
+# 数据库（operation 是语句的第一个关键字：SELECT / INSERT / UPDATE / DELETE / OTHER）
+DB_DURATION = Histogram(
+    'db_query_duration_seconds', '数据库语句耗时（秒）', ['operation'],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+DB_ERRORS = Counter('db_errors_total', '数据库语句出错次数', ['operation'])
+
+DB_OPERATIONS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+
+# 当前请求的 ASGI scope（路由匹配后 scope['route'] 是匹配到的路由），由 MetricsMiddleware 设置
+current_scope: ContextVar[Optional[dict]] = ContextVar('current_scope', default=None)
+
+
+def route_label(scope: Optional[dict]) -> str:
+    """请求对应的路由模板（用模板而不是实际路径，避免标签数量无限增长）"""
+    route = scope.get('route') if scope else None
+    return getattr(route, 'path', None) or 'unmatched'
+
+
+def _operation(statement: str) -> str:
+    keyword = statement.lstrip()[:6].upper()
+    return keyword if keyword in DB_OPERATIONS else 'OTHER'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = getattr(context, '_metrics_started', None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        DB_DURATION.labels(_operation(statement)).observe(elapsed)
+        record_stage('db', elapsed)
+
+
+def _handle_error(exception_context) -> None:
+    DB_ERRORS.labels(_operation(exception_context.statement or '')).inc()
+
+
+def instrument_engine(engine: Any) -> None:
+    """
+    给数据库引擎加上语句计时（异步引擎传 AsyncEngine 也可以，监听它的 sync_engine）
+
+    耗时计入 db_query_duration_seconds，同时作为 db 阶段计入当前请求的 Server-Timing。
+
+    Args:
+        engine: Engine 或 AsyncEngine
+    """
+    engine: Engine = getattr(engine, 'sync_engine', engine)
+    if event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
@@ -0,0 +1,100 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.config import settings
+
+
+class RequestTimer:
+    """
+    一个请求内各阶段的累计耗时
+
+    同名阶段多次出现时累加（例如一次请求里的多条数据库语句）。由 TimingMiddleware 在请求开始时
+    创建并放进上下文变量；请求中创建的任务会复制上下文，记录到同一个对象里。
+    """
+
+    __slots__ = ('started', 'stages')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # 阶段名 -> [累计秒数, 次数]，按第一次开始的顺序
+        self.stages: Dict[str, List[float]] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        entry = self.stages.get(name)
+        if entry is None:
+            self.stages[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def items(self) -> List[Tuple[str, float, int]]:
+        """(阶段名, 累计毫秒, 次数)"""
+        return [(name, seconds * 1000, int(count)) for name, (seconds, count) in list(self.stages.items())]
+
+    def server_timing(self) -> str:
+        """Server-Timing 响应头（各阶段 + 到目前为止的总耗时）"""
+        parts = [f"{name};dur={ms:.1f}" for name, ms, _ in self.items()]
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ', '.join(parts)
+
+    def summary(self) -> str:
+        """慢请求日志里的阶段明细"""
+        return ', '.join(
+            f"{name}={ms:.1f}ms" + (f"×{count}" if count > 1 else '') for name, ms, count in self.items()
+        ) or '无阶段记录'
+
+
+def timing_enabled() -> bool:
+    """是否启用请求计时（Server-Timing、慢请求日志或调试采样任一开启）；开启时数据库语句也要计时"""
+    return settings.server_timing_enabled or bool(settings.slow_request_ms) or settings.debug
+
+
+# 当前请求的计时器（没有开启计时或不在请求里时为 None）
+_current_timer: ContextVar[Optional[RequestTimer]] = ContextVar('current_timer', default=None)
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return _current_timer.get()
+
+
+def start_timer() -> Tuple[RequestTimer, object]:
+    """开始为当前请求计时，返回 (计时器, 用于 reset 的 token)"""
+    timer = RequestTimer()
+    return timer, _current_timer.set(timer)
+
+
+def stop_timer(token) -> None:
+    _current_timer.reset(token)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """记录一段已经测量好的耗时（不在请求里时什么也不做）"""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add(name, seconds)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    测量一个阶段的耗时，计入当前请求
+
+    Args:
+        name: 阶段名（出现在 Server-Timing 头里，只用字母、数字和下划线）
+    """
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    # 先占位，Server-Timing 里按阶段开始的顺序排列（外层阶段在内层之前）
+    timer.stages.setdefault(name, [0.0, 0])
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - started)
@@ -1,3 +1,5 @@
 from .character import Character
+from .media import CharacterMedia, Media
+from .table_version import TableVersionRecord
 
-__all__ = ["Character"]
+__all__ = ["Character", "Media", "CharacterMedia", "TableVersionRecord"]
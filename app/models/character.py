@@ -1,12 +1,36 @@
-from typing import Optional
-from sqlmodel import SQLModel, Field
-from sqlalchemy import Text
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, Text, column
+
+from .media import CharacterMedia
+
+if TYPE_CHECKING:
+    from .media import Media
+
+
+def _not_sqlite(ddl, target, bind, **kw) -> bool:
+    return kw['dialect'].name != 'sqlite'
 
 
 class Character(SQLModel, table=True):
     """角色数据模型"""
 
     __tablename__ = "characters"
+    __table_args__ = (
+        # 收藏数排行榜（同收藏数按 id 降序）和按收藏数的游标分页
+        Index('ix_characters_favourites_id', 'favourites', 'id'),
+        # 按性别筛选的排行榜（不区分大小写：MySQL 的默认排序规则本来就不区分；SQLite 用 NOCASE 索引）
+        Index('ix_characters_gender_favourites_id', 'gender', 'favourites', 'id').ddl_if(callable_=_not_sqlite),
+        Index(
+            'ix_characters_gender_nocase_favourites_id', column('gender').collate('NOCASE'), 'favourites', 'id'
+        ).ddl_if(dialect='sqlite'),
+        # 名字前缀筛选（LIKE 'xxx%'）。SQLite 的 LIKE 不区分大小写，只有 NOCASE 排序规则的索引才能用上；
+        # PostgreSQL 需要 text_pattern_ops
+        Index(
+            'ix_characters_name_full', 'name_full', postgresql_ops={'name_full': 'text_pattern_ops'}
+        ).ddl_if(callable_=_not_sqlite),
+        Index('ix_characters_name_full_nocase', column('name_full').collate('NOCASE')).ddl_if(dialect='sqlite'),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     name_full: Optional[str] = Field(default=None, max_length=100)
@@ -17,3 +41,73 @@ class Character(SQLModel, table=True):
     image_url: Optional[str] = Field(default=None, max_length=300)
     description: Optional[str] = Field(default=None, sa_column=Field(default=None, sa_column=Text()))
     site_url: Optional[str] = Field(default=None, max_length=300)
+
+    # 出现的作品（只读，关联由 app.database.upsert.save_character_media 批量写入）
+    # 异步会话不能懒加载，查询时用 selectinload(Character.media) 一次 IN 查询批量加载
+    media: List["Media"] = Relationship(
+        link_model=CharacterMedia,
+        sa_relationship_kwargs={'viewonly': True, 'order_by': 'CharacterMedia.position', 'lazy': 'raise'}
+    )
+
+    @classmethod
+    def from_anilist(cls, character: Dict[str, Any]) -> "Character":
+        """
+        把 AniList / 前端提交的角色数据映射为数据库模型
+
+        Args:
+            character: 角色数据（AniList 返回的结构）
+
+        Returns:
+            Character 实例
+        """
+        return cls(**cls.row_from_anilist(character))
+
+    @staticmethod
+    def row_from_anilist(character: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        把 AniList 结构的角色数据映射为 characters 表的一行（不创建模型实例，批量导入时更快）
+
+        Args:
+            character: 角色数据（AniList 返回的结构）
+
+        Returns:
+            列名 -> 值
+        """
+        name = character.get('name') or {}
+        image = character.get('image') or {}
+        return {
+            'id': character.get('id'),
+            'name_full': name.get('full'),
+            'name_native': name.get('native'),
+            'gender': character.get('gender'),
+            'age': character.get('age'),
+            'favourites': character.get('favourites'),
+            'image_url': image.get('medium'),
+            'description': character.get('description'),
+            'site_url': character.get('siteUrl')
+        }
+
+    def to_anilist(self) -> Dict[str, Any]:
+        """
+        转换回 AniList 风格的结构，便于复用 AniListService 的格式化函数
+
+        Returns:
+            角色数据（AniList 返回的结构）
+        """
+        return {
+            'id': self.id,
+            'name': {
+                'full': self.name_full,
+                'native': self.name_native,
+                'alternative': []
+            },
+            'image': {
+                'large': self.image_url,
+                'medium': self.image_url
+            },
+            'description': self.description,
+            'gender': self.gender,
+            'age': self.age,
+            'favourites': self.favourites,
+            'siteUrl': self.site_url
+        }
@@ -0,0 +1,66 @@
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel
+
+
+class Media(SQLModel, table=True):
+    """作品（动画 / 漫画），id 使用 AniList 的作品 id"""
+
+    __tablename__ = "media"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    title: Optional[str] = Field(default=None, max_length=200)
+    type: Optional[str] = Field(default=None, max_length=20)
+
+    @staticmethod
+    def rows_from_anilist(character: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """
+        取出角色数据里的作品列表，映射为 media 表的行
+
+        同时支持 AniList 返回的 media.edges[].node 结构和 format_character 格式化后的
+        [{'id', 'title', 'type'}] 结构。
+
+        Args:
+            character: 角色数据
+
+        Returns:
+            按原顺序（人气降序）的作品行；数据里没有作品信息时返回 None（不应改动已保存的关联）
+        """
+        media = character.get('media')
+        if isinstance(media, dict):
+            items = []
+            for edge in media.get('edges') or []:
+                node = (edge or {}).get('node') or {}
+                title = node.get('title') or {}
+                items.append({
+                    'id': node.get('id'),
+                    'title': title.get('english') or title.get('romaji') or title.get('native'),
+                    'type': node.get('type'),
+                })
+        elif isinstance(media, list):
+            items = [
+                {'id': item.get('id'), 'title': item.get('title'), 'type': item.get('type')}
+                for item in media if isinstance(item, dict)
+            ]
+        else:
+            return None
+        rows: Dict[int, Dict[str, Any]] = {}
+        for item in items:
+            if isinstance(item['id'], int) and not isinstance(item['id'], bool) and item['id'] > 0:
+                rows.setdefault(item['id'], item)
+        return list(rows.values())
+
+
+class CharacterMedia(SQLModel, table=True):
+    """角色出现的作品（多对多关联），position 是 AniList 返回的顺序"""
+
+    __tablename__ = "character_media"
+    __table_args__ = (
+        # 按作品查角色；按角色查作品走主键
+        Index('ix_character_media_media_id', 'media_id', 'character_id'),
+    )
+
+    character_id: int = Field(foreign_key="characters.id", primary_key=True)
+    media_id: int = Field(foreign_key="media.id", primary_key=True)
+    position: int = Field(default=0)
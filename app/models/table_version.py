@@ -0,0 +1,17 @@
+from sqlmodel import Field, SQLModel
+
+
+class TableVersionRecord(SQLModel, table=True):
+    """
+    表版本号（每张表一行）
+
+    写入角色表的事务里同时把对应行的 version 加一，条件请求的 ETag 由这一行决定，
+    多个工作进程、导入脚本直接写库时都能看到同一个版本。
+    """
+
+    __tablename__ = "table_versions"
+
+    name: str = Field(primary_key=True, max_length=50)
+    version: int = Field(default=0)
+    # 最后一次写入的 Unix 时间戳（秒）
+    modified_at: float = Field(default=0)
@@ -1,3 +1,7 @@
 from .character import router as character_router
+from .characters import router as characters_router
+from .images import router as images_router
+from .media import router as media_router
+from .metrics import router as metrics_router
 
-__all__ = ["character_router"]
+__all__ = ["character_router", "characters_router", "images_router", "media_router", "metrics_router"]
@@ -1,25 +1,142 @@
 import logging
-from typing import List, Dict
+import math
+from typing import List, Dict, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.database import get_session
-from app.models import Character
-from app.services import AniListService
+from app.database import (
+    bump_table_version,
+    get_async_engine,
+    get_async_session,
+    save_character_media,
+    upsert_characters,
+)
+from app.database.upsert import character_rows
+from app.metrics import stage
+from app.models import Character, Media
+from app.schemas import BatchSearchRequest, CharacterWithMedia
+from app.config import settings
+from app.services import (
+    AniListService,
+    AniListUnavailableError,
+    LocalSearchIndex,
+    SavedCharacter,
+    TableVersion,
+    WriteBehindBacklogError,
+    cache_headers,
+    content_etag,
+    etag_matches,
+    get_character_version,
+    get_circuit_breaker,
+    get_latency_tracker,
+    get_local_index,
+    get_search_cache,
+    get_suggest_index,
+    get_singleflight,
+    get_scheduler,
+    get_write_behind,
+    notify_characters_saved,
+    peek_write_behind,
+    refresh_local_index,
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api", tags=["character"])
 
 
+def _service_unavailable(e: AniListUnavailableError) -> HTTPException:
+    """把 AniList 暂不可用转换为 503 响应"""
+    logger.warning(f"AniList 暂不可用: {e}")
+    headers = {'Retry-After': str(math.ceil(e.retry_after))} if e.retry_after else None
+    return HTTPException(status_code=503, detail=f"上游服务繁忙: {e}", headers=headers)
+
+
+def _check_fields(fields: str) -> None:
+    """校验字段集名称"""
+    if fields not in AniListService.FIELD_VARIANTS:
+        options = ', '.join(AniListService.FIELD_VARIANTS)
+        raise HTTPException(status_code=400, detail=f"不支持的字段集: {fields}（可选: {options}）")
+
+
+# 搜索来源：local 只查本地索引，remote 只查 AniList，auto 本地结果不足时再查 AniList
+SEARCH_SOURCES = ('local', 'remote', 'auto')
+
+
+async def _current_local_index(session: AsyncSession) -> Tuple[LocalSearchIndex, TableVersion]:
+    """读取角色表版本，索引落后于这个版本（其他进程写了库）时先重建"""
+    version = await get_character_version(session)
+    if settings.local_index_enabled:
+        return await refresh_local_index(session.bind, version.version), version
+    return get_local_index(), version
+
+
+async def _search_local(
+    session: AsyncSession, name: str, fields: str, limit: int
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    从本地索引搜索已保存的角色，按索引排序返回格式化结果
+
+    Returns:
+        (格式化结果, 表版本 ETag)；索引里没有匹配时返回 ([], None)
+    """
+    # 先取版本再查询：查询期间有写入时 ETag 偏旧，下次请求会拿到新数据
+    index, version = await _current_local_index(session)
+    ids = index.search(name, limit)
+    if not ids:
+        return [], None
+    etag = version.etag
+    rows = (await session.exec(select(Character).where(Character.id.in_(ids)))).all()
+    by_id = {row.id: row for row in rows}
+    formatter = AniListService.formatter_for(fields)
+    return [formatter(by_id[char_id].to_anilist()) for char_id in ids if char_id in by_id], etag
+
+
+async def _cached_search_etag(session: AsyncSession, name: str, fields: str, source: str) -> Optional[str]:
+    """
+    不查询角色、不访问 AniList，推算这次搜索结果的 ETag
+
+    本地结果只由角色表决定，用表版本（一次主键查询）；AniList 结果用搜索缓存里的内容哈希。
+    auto 模式按内存索引判断会走哪一边。无法确定时返回 None。
+    """
+    if source == 'auto':
+        per_page = settings.anilist_per_page
+        index, version = await _current_local_index(session)
+        if len(index.search(name, per_page)) >= min(settings.local_search_min_results, per_page):
+            return version.etag
+        source = 'remote'
+    if source == 'local':
+        return (await get_character_version(session)).etag
+    return AniListService.search_etag(name, fields=fields)
+
+
 @router.get("/character/search")
-async def search_character(name: str):
+async def search_character(
+    name: str,
+    response: Response,
+    fields: str = 'full',
+    source: str = 'remote',
+    if_none_match: Optional[str] = Header(default=None),
+    session: AsyncSession = Depends(get_async_session)
+):
     """
-    搜索角色（从AniList API返回多个结果）
+    搜索角色（默认从AniList API返回多个结果，可选从本地已保存的角色中查找）
+
+    本地结果由数据库里的列还原，缺少 AniList 才有的字段（别名、生日、血型、作品等），
+    所以默认来源是 remote，需要更快响应、能接受精简数据的调用方显式传 local 或 auto。
+
+    本地结果的 ETag 是角色表版本，AniList 结果的 ETag 是缓存结果的内容哈希；
+    If-None-Match 命中时返回 304。
 
     Args:
         name: 角色名字（查询参数）
+        fields: 字段集（card 列表卡片 / detail 详情 / full 完整数据）
+        source: 搜索来源（remote AniList，默认 / local 本地 / auto 本地不足时查 AniList）
+        if_none_match: 客户端缓存的 ETag
 
     Returns:
         标准化的角色列表数据
@@ -29,74 +146,319 @@ async def search_character(name: str):
 
         if not name or not name.strip():
             raise HTTPException(status_code=400, detail="角色名字不能为空")
+        _check_fields(fields)
+        if source not in SEARCH_SOURCES:
+            raise HTTPException(status_code=400, detail=f"不支持的搜索来源: {source}")
 
-        # 调用 AniList 服务搜索角色
-        formatted_characters = AniListService.search_and_format(name.strip())
+        if if_none_match:
+            etag = await _cached_search_etag(session, name.strip(), fields, source)
+            if etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers=cache_headers(etag))
+
+        local_etag = None
+        formatted_characters: List[Dict] = []
+        used_source = 'remote'
+        if source != 'remote':
+            per_page = settings.anilist_per_page
+            with stage('local_search'):
+                formatted_characters, local_etag = await _search_local(session, name.strip(), fields, per_page)
+            used_source = 'local'
+            if source == 'auto' and len(formatted_characters) < min(settings.local_search_min_results, per_page):
+                formatted_characters = []
+                used_source = 'remote'
+
+        if used_source == 'remote':
+            # 调用 AniList 服务搜索角色
+            with stage('remote_search'):
+                formatted_characters = await AniListService.search_and_format(name.strip(), fields=fields)
 
         if not formatted_characters:
             raise HTTPException(status_code=404, detail=f"未找到角色: {name}")
 
-        logger.info(f"成功找到 {len(formatted_characters)} 个角色")
+        logger.info(f"成功找到 {len(formatted_characters)} 个角色（{used_source}）")
+
+        if used_source == 'local':
+            etag = local_etag
+        else:
+            etag = AniListService.search_etag(name.strip(), fields=fields) or content_etag(formatted_characters)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=cache_headers(etag))
+        response.headers.update(cache_headers(etag))
 
         return {
             'code': 0,
             'message': 'success',
             'data': {
                 'characters': formatted_characters,
-                'total': len(formatted_characters)
+                'total': len(formatted_characters),
+                'source': used_source
             }
         }
 
     except HTTPException:
         raise
+    except AniListUnavailableError as e:
+        raise _service_unavailable(e)
     except Exception as e:
         logger.error(f"搜索角色失败: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
 
 
-@router.get("/getallcharacters", response_model=List[Character])
-async def get_all_characters(session: Session = Depends(get_session)):
+@router.post("/character/search/batch")
+async def batch_search_characters(request: BatchSearchRequest):
+    """
+    批量搜索多个角色（合并为一到几个带别名的 GraphQL 请求）
+
+    Args:
+        request: 包含名字列表和每个名字的结果数量
+
+    Returns:
+        以名字为键的角色列表
+    """
+    try:
+        # 去掉空白名字并去重，保持原始顺序
+        names = list(dict.fromkeys(name.strip() for name in request.names if name and name.strip()))
+        if not names:
+            raise HTTPException(status_code=400, detail="角色名字不能为空")
+        if len(names) > settings.batch_search_max_names:
+            raise HTTPException(
+                status_code=400,
+                detail=f"一次最多搜索 {settings.batch_search_max_names} 个名字"
+            )
+        _check_fields(request.fields)
+
+        logger.info(f"开始批量搜索角色: {len(names)} 个名字")
+        results = await AniListService.batch_search_and_format(
+            names, request.per_page, request.fields
+        )
+
+        return {
+            'code': 0,
+            'message': 'success',
+            'data': {
+                'results': results,
+                'not_found': [name for name, characters in results.items() if not characters],
+                'total': len(results)
+            }
+        }
+
+    except HTTPException:
+        raise
+    except AniListUnavailableError as e:
+        raise _service_unavailable(e)
+    except Exception as e:
+        logger.error(f"批量搜索角色失败: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
+
+
+@router.get("/character/suggest")
+async def suggest_characters(q: str = '', limit: int = 10):
     """
-    获取数据库中所有已保存的角色
+    输入联想：从内存前缀索引返回名字以输入开头的角色（不访问数据库和 AniList）
+
+    Args:
+        q: 已输入的文本
+        limit: 最多返回的数量
+
+    Returns:
+        按收藏数排序的联想结果
+    """
+    if limit < 1 or limit > settings.suggest_max_limit:
+        raise HTTPException(status_code=400, detail=f"limit 需要在 1 到 {settings.suggest_max_limit} 之间")
+    suggestions = get_suggest_index().suggest(q, limit) if q.strip() else []
+    return {
+        'code': 0,
+        'message': 'success',
+        'data': {
+            'query': q,
+            'suggestions': suggestions
+        }
+    }
+
+
+@router.get("/character/search/stats")
+async def search_stats():
+    """
+    搜索统计：缓存命中/未命中/淘汰次数、合并的并发上游请求数、限流调度状态、熔断器和上游延迟
+
+    Returns:
+        统计信息
+    """
+    return {
+        'code': 0,
+        'message': 'success',
+        'data': {
+            'cache': get_search_cache().stats(),
+            'singleflight': get_singleflight().stats(),
+            'scheduler': get_scheduler().stats(),
+            'breaker': get_circuit_breaker().stats(),
+            'upstream': get_latency_tracker().stats()
+        }
+    }
+
+
+@router.get("/getallcharacters", response_model=List[CharacterWithMedia])
+async def get_all_characters(
+    response: Response,
+    if_none_match: Optional[str] = Header(default=None),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    获取数据库中所有已保存的角色（带出现的作品）
+
+    响应带表版本 ETag；If-None-Match 命中时直接返回 304（只按主键读取表版本，不查询角色）。
+    作品用 selectinload 一次 IN 查询批量加载，查询次数不随角色数增长。
+
+    Args:
+        if_none_match: 客户端缓存的 ETag
+        session: 数据库会话
 
     Returns:
         角色列表
     """
-    results = session.exec(select(Character)).all()
+    # 先取版本再查询：查询期间有写入时 ETag 偏旧，下次请求会拿到新数据
+    version = await get_character_version(session)
+    headers = cache_headers(version.etag, version.last_modified)
+    if etag_matches(if_none_match, version.etag):
+        return Response(status_code=304, headers=headers)
+
+    results = (await session.exec(select(Character).options(selectinload(Character.media)))).all()
+    response.headers.update(headers)
     return results
 
 
 @router.post("/character/save")
-def save_character(character: Dict, session: Session = Depends(get_session)):
+async def save_character(
+    character: Dict,
+    session: AsyncSession = Depends(get_async_session),
+    engine: AsyncEngine = Depends(get_async_engine)
+):
     """
     保存前端选中的角色到数据库
 
+    开启写后缓冲时角色放入缓冲即返回（data.buffered 为 true），由后台批量写入。
+    缓冲积压已满且数据库写入失败时返回 503：角色已排队，之后会自动写入，重试不会重复保存。
+
     Args:
         character: 角色数据
         session: 数据库会话
+        engine: 数据库引擎（写后缓冲使用）
 
     Returns:
         保存结果
     """
+    if settings.write_behind_enabled and isinstance(character.get('id'), int):
+        try:
+            await get_write_behind(engine).add(
+                Character.from_anilist(character),
+                (character.get('name') or {}).get('alternative') or [],
+                Media.rows_from_anilist(character)
+            )
+        except WriteBehindBacklogError as e:
+            logger.warning(f"写后缓冲积压: {e}")
+            headers = {'Retry-After': str(math.ceil(e.retry_after))} if e.retry_after else None
+            raise HTTPException(status_code=503, detail="数据库暂不可用，角色已排队等待写入，请稍后重试", headers=headers)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"保存失败: {e}")
+        return {"code": 0, "message": "角色已保存成功", "data": {"id": character['id'], "buffered": True}}
+
     try:
-        char = Character(
-            id=character.get('id'),
-            name_full=character.get('name', {}).get('full'),
-            name_native=character.get('name', {}).get('native'),
-            gender=character.get('gender'),
-            age=character.get('age'),
-            favourites=character.get('favourites'),
-            image_url=character.get('image', {}).get('medium'),
-            description=character.get('description'),
-            site_url=character.get('siteUrl')
-        )
+        char = Character.from_anilist(character)
+        existing = await session.get(Character, char.id) if char.id is not None else None
 
         # merge() = INSERT or UPDATE
-        session.merge(char)
-        session.commit()
+        await session.merge(char)
+        # 出现的作品在同一个事务里批量写入（数据里没有作品信息时保留原来的关联）
+        media = Media.rows_from_anilist(character)
+        if media is not None and char.id is not None:
+            await save_character_media(session, {char.id: media})
+        await bump_table_version(session)
+        await session.commit()
+
+        notify_characters_saved([SavedCharacter(
+            row=char.model_dump(),
+            status='updated' if existing is not None else 'created',
+            alternative=(character.get('name') or {}).get('alternative') or []
+        )])
 
         return {"code": 0, "message": "角色已保存成功", "data": {"id": char.id}}
 
     except Exception as e:
-        session.rollback()
+        await session.rollback()
+        raise HTTPException(status_code=500, detail=f"保存失败: {e}")
+
+
+@router.get("/character/save/stats")
+async def save_stats():
+    """
+    写后缓冲统计：待写入、已合并的重复保存、批量写入次数等
+
+    Returns:
+        统计信息（未开启或尚未保存过时 data.enabled 为 false）
+    """
+    buffer = peek_write_behind()
+    data = {'enabled': settings.write_behind_enabled}
+    if buffer is not None:
+        data.update(buffer.stats())
+    return {"code": 0, "message": "success", "data": data}
+
+
+@router.post("/character/save/batch")
+async def save_characters_batch(characters: List[Dict], session: AsyncSession = Depends(get_async_session)):
+    """
+    批量保存角色：一次映射全部数据，按块执行多行 upsert，只提交一次
+
+    Args:
+        characters: 角色数据列表（AniList 返回的结构）
+        session: 数据库会话
+
+    Returns:
+        每一项的保存结果（created / updated / error）
+    """
+    if not characters:
+        raise HTTPException(status_code=400, detail="角色列表不能为空")
+    if len(characters) > settings.batch_save_max_items:
+        raise HTTPException(status_code=400, detail=f"一次最多保存 {settings.batch_save_max_items} 个角色")
+
+    items: List[Dict] = []
+    valid: List[Character] = []
+    media: Dict[int, List[Dict]] = {}
+    for index, character in enumerate(characters):
+        char_id = character.get('id') if isinstance(character, dict) else None
+        if not isinstance(char_id, int) or isinstance(char_id, bool):
+            items.append({'index': index, 'id': char_id, 'status': 'error', 'error': '缺少有效的角色 id'})
+            continue
+        valid.append(Character.from_anilist(character))
+        items.append({'index': index, 'id': char_id, 'status': None})
+        rows = Media.rows_from_anilist(character)
+        if rows is not None:
+            media[char_id] = rows
+
+    try:
+        statuses = await upsert_characters(session, valid, media)
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"批量保存失败: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"保存失败: {e}")
+
+    for item in items:
+        if item['status'] is None:
+            item['status'] = statuses[item['id']]
+
+    alternatives = {
+        character['id']: (character.get('name') or {}).get('alternative') or []
+        for character in characters
+        if isinstance(character, dict) and character.get('id') in statuses
+    }
+    notify_characters_saved([
+        SavedCharacter(row=row, status=statuses[row['id']], alternative=alternatives.get(row['id'], []))
+        for row in character_rows(valid)
+    ])
+
+    saved = sum(1 for item in items if item['status'] != 'error')
+    logger.info(f"批量保存角色: 成功 {saved} 个，失败 {len(items) - saved} 个")
+    return {
+        "code": 0,
+        "message": f"已保存 {saved} 个角色",
+        "data": {"items": items, "saved": saved, "failed": len(items) - saved}
+    }
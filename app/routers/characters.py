@@ -0,0 +1,612 @@
+import base64
+import binascii
+import csv
+import io
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import get_async_engine, get_async_session, upsert_characters
+from app.database.upsert import character_rows
+from app.models import Character, Media
+from app.services import (
+    AniListError,
+    AniListService,
+    ChangeFeed,
+    FeedEvent,
+    FeedSubscriber,
+    SavedCharacter,
+    cache_headers,
+    etag_matches,
+    get_character_cache,
+    get_change_feed,
+    get_character_version,
+    get_leaderboard,
+    get_sync_worker,
+    notify_characters_saved,
+    query_top,
+    sse_frame,
+    LEADERBOARD_COLUMNS,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api", tags=["characters"])
+
+# 可以选择返回的列；description 是不限长的 TEXT，默认不返回
+CHARACTER_COLUMNS = [name for name in Character.__table__.columns.keys()]
+DEFAULT_COLUMNS = [name for name in CHARACTER_COLUMNS if name != 'description']
+
+# 排序方式：id 升序 / 收藏数降序（同收藏数按 id 降序）
+ORDERS = ('id', 'favourites')
+
+# 导出格式 -> (Content-Type, 文件扩展名)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+}
+
+
+def encode_cursor(order: str, key: List[Any]) -> str:
+    """把排序键编码为不透明的游标字符串"""
+    raw = json.dumps({'o': order, 'k': key}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor: str, order: str) -> List[Any]:
+    """解析游标，游标无效、与排序方式不匹配或排序键格式不对时返回 400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        key = data['k']
+        if data['o'] != order or not isinstance(key, list):
+            raise ValueError(order)
+        # id 排序的键是 [id]，收藏数排序的键是 [收藏数或 null, id]
+        if len(key) != (1 if order == 'id' else 2) or not _is_int(key[-1]):
+            raise ValueError(key)
+        if order == 'favourites' and key[0] is not None and not _is_int(key[0]):
+            raise ValueError(key)
+        return key
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+def parse_columns(fields: Optional[str], order: str, default: List[str] = DEFAULT_COLUMNS) -> List[str]:
+    """解析 fields 参数为列名列表，id 和排序列总是包含在内"""
+    if not fields:
+        columns = list(default)
+    else:
+        columns = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = [name for name in columns if name not in CHARACTER_COLUMNS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"不支持的字段: {', '.join(unknown)}")
+    for required in ('id', order):
+        if required not in columns:
+            columns.insert(0, required)
+    return list(dict.fromkeys(columns))
+
+
+def keyset_filter(order: str, key: List[Any]):
+    """构造“排在游标之后”的条件（favourites 可能为 NULL，NULL 排在最后）"""
+    if order == 'id':
+        return Character.id > key[0]
+    favourites, last_id = key
+    if favourites is None:
+        return and_(Character.favourites.is_(None), Character.id < last_id)
+    return or_(
+        Character.favourites < favourites,
+        and_(Character.favourites == favourites, Character.id < last_id),
+        Character.favourites.is_(None),
+    )
+
+
+def sort_key(order: str, row: Dict[str, Any]) -> List[Any]:
+    """从一行数据中取出游标的排序键"""
+    if order == 'id':
+        return [row['id']]
+    return [row['favourites'], row['id']]
+
+
+async def fetch_page(
+    session: AsyncSession,
+    limit: int,
+    after: Optional[str],
+    order: str,
+    columns: List[str]
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    按主键或收藏数做游标（keyset）分页
+
+    Args:
+        session: 数据库会话
+        limit: 每页数量
+        after: 上一页返回的游标
+        order: 排序方式（id / favourites）
+        columns: 返回的列
+
+    Returns:
+        (本页数据, 下一页游标)
+    """
+    statement = select(*[getattr(Character, name) for name in columns])
+    if after:
+        statement = statement.where(keyset_filter(order, decode_cursor(after, order)))
+    if order == 'id':
+        statement = statement.order_by(Character.id)
+    else:
+        statement = statement.order_by(Character.favourites.desc(), Character.id.desc())
+
+    # 多取一行判断是否还有下一页
+    rows = (await session.exec(statement.limit(limit + 1))).all()
+    items = [dict(zip(columns, row)) for row in rows[:limit]]
+    next_cursor = encode_cursor(order, sort_key(order, items[-1])) if len(rows) > limit else None
+    return items, next_cursor
+
+
+def parse_ids(ids: str) -> List[int]:
+    """解析逗号分隔的 id 列表（去重并保持顺序），格式错误或数量超限时返回 400"""
+    try:
+        parsed = list(dict.fromkeys(int(part) for part in ids.split(',') if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids 需要是逗号分隔的整数")
+    if not parsed:
+        raise HTTPException(status_code=400, detail="ids 不能为空")
+    if len(parsed) > settings.ids_lookup_max:
+        raise HTTPException(status_code=400, detail=f"一次最多查询 {settings.ids_lookup_max} 个 id")
+    return parsed
+
+
+async def resolve_characters(
+    session: AsyncSession,
+    ids: List[int],
+    remote: bool = True,
+    save: bool = False
+) -> Tuple[Dict[int, Dict[str, Any]], Dict[str, int], bool]:
+    """
+    按 id 解析角色：缓存 -> 一次 IN 查询数据库 -> 一次 AniList id_in 查询
+
+    Args:
+        session: 数据库会话
+        ids: 角色 id 列表
+        remote: 数据库中没有的是否查询 AniList
+        save: AniList 查到的角色是否写入数据库
+
+    Returns:
+        (id -> AniList 结构的角色, 各来源的数量, 是否全部 id 都有确定结果)
+    """
+    cache = get_character_cache()
+    found: Dict[int, Dict[str, Any]] = {}
+    counts = {'cache': 0, 'database': 0, 'anilist': 0}
+    pending: List[int] = []
+    for char_id in ids:
+        cached = cache.get(char_id)
+        if cached is None:
+            pending.append(char_id)
+        elif cached:
+            found[char_id] = cached
+            counts['cache'] += 1
+        # {} 表示最近确认过不存在
+
+    if pending:
+        rows = (await session.exec(select(Character).where(Character.id.in_(pending)))).all()
+        for row in rows:
+            found[row.id] = row.to_anilist()
+            cache.set(row.id, found[row.id])
+        counts['database'] = len(rows)
+        pending = [char_id for char_id in pending if char_id not in found]
+
+    complete = True
+    if pending and remote:
+        try:
+            fetched = await AniListService.get_characters_by_ids(pending)
+        except AniListError as e:
+            logger.warning(f"按 id 查询 AniList 失败: {e}")
+            complete = False
+        else:
+            fetched = [char for char in fetched if char.get('id') in pending]
+            for char in fetched:
+                found[char['id']] = char
+                cache.set(char['id'], char)
+            counts['anilist'] = len(fetched)
+            for char_id in pending:
+                if char_id not in found:
+                    cache.set(char_id, {})
+            if save and fetched:
+                await _write_through(session, fetched)
+    elif pending:
+        complete = False
+
+    return found, counts, complete
+
+
+async def _write_through(session: AsyncSession, fetched: List[Dict[str, Any]]) -> None:
+    """把 AniList 查到的角色写入数据库，失败只记录日志"""
+    models = [Character.from_anilist(char) for char in fetched]
+    media = {char['id']: rows for char in fetched if (rows := Media.rows_from_anilist(char)) is not None}
+    try:
+        statuses = await upsert_characters(session, models, media)
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"按 id 查询结果写入数据库失败: {e}", exc_info=True)
+        return
+    alternatives = {char['id']: (char.get('name') or {}).get('alternative') or [] for char in fetched}
+    notify_characters_saved([
+        SavedCharacter(row=row, status=statuses[row['id']], alternative=alternatives.get(row['id'], []))
+        for row in character_rows(models)
+    ])
+
+
+@router.get("/characters")
+async def get_characters_by_ids(
+    ids: str,
+    fields: str = 'full',
+    remote: bool = True,
+    save: Optional[bool] = None,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    按 id 批量获取角色，按请求顺序返回
+
+    先查按 id 的缓存，其余用一次 IN 查询数据库，数据库中没有的再用一次
+    AniList Page(characters(id_in: ...)) 查询补齐。
+
+    Args:
+        ids: 逗号分隔的角色 id，例如 1,2,3
+        fields: 字段集（card 列表卡片 / detail 详情 / full 完整数据）
+        remote: 数据库中没有的是否查询 AniList
+        save: AniList 查到的角色是否写入数据库，默认使用 ids_write_through 配置
+
+    Returns:
+        角色列表、未找到的 id 和各来源的数量
+    """
+    if fields not in AniListService.FIELD_VARIANTS:
+        options = ', '.join(AniListService.FIELD_VARIANTS)
+        raise HTTPException(status_code=400, detail=f"不支持的字段集: {fields}（可选: {options}）")
+    id_list = parse_ids(ids)
+    write_through = settings.ids_write_through if save is None else save
+
+    found, counts, complete = await resolve_characters(session, id_list, remote, write_through)
+
+    formatter = AniListService.formatter_for(fields)
+    return {
+        'code': 0,
+        'message': 'success',
+        'data': {
+            'characters': [formatter(found[char_id]) for char_id in id_list if char_id in found],
+            'missing': [char_id for char_id in id_list if char_id not in found],
+            'sources': counts,
+            'complete': complete
+        }
+    }
+
+
+@router.get("/characters/sync/stats")
+async def sync_stats():
+    """
+    后台同步进度：当前检查点、已检查/更新/未变化的行数、错误次数
+
+    Returns:
+        同步统计（未启用时 enabled 为 false）
+    """
+    worker = get_sync_worker()
+    return {
+        'code': 0,
+        'message': 'success',
+        'data': {'enabled': worker is not None, **(worker.stats() if worker else {})}
+    }
+
+
+def _subscribe_feed(cursor: Optional[str]) -> Tuple[ChangeFeed, FeedSubscriber, List[FeedEvent], bool]:
+    """注册变更推送订阅者，未开启或订阅者过多时返回 404 / 503"""
+    if not settings.feed_enabled:
+        raise HTTPException(status_code=404, detail="变更推送未开启")
+    feed = get_change_feed()
+    try:
+        subscriber, backlog, reset = feed.subscribe(feed.parse_cursor(cursor))
+    except (OverflowError, RuntimeError) as e:
+        raise HTTPException(status_code=503, detail=f"变更推送暂不可用: {e}", headers={'Retry-After': '5'})
+    return feed, subscriber, backlog, reset
+
+
+async def iter_feed(
+    feed: ChangeFeed,
+    subscriber: FeedSubscriber,
+    backlog: List[FeedEvent],
+    reset: bool,
+    heartbeat: float
+) -> AsyncIterator[bytes]:
+    """
+    生成 SSE 流：先补发历史（或 reset），之后推送新事件，空闲时发心跳注释
+
+    客户端读得太慢导致队列溢出时发送 overflow 事件并结束，EventSource 会带着
+    Last-Event-ID 自动重连，从历史里续传。
+    """
+    try:
+        head = b'retry: 3000\n\n'
+        if reset:
+            head += sse_frame('reset', json.dumps({'last_event_id': feed.last_event_id}), feed.last_event_id)
+        head += b''.join(event.frame for event in backlog)
+        yield head
+        while True:
+            batches = await subscriber.get(timeout=heartbeat)
+            if subscriber.overflowed:
+                yield sse_frame('overflow', json.dumps({'last_seq': subscriber.last_seq}))
+                return
+            if batches:
+                yield batches[0].frames if len(batches) == 1 else b''.join(batch.frames for batch in batches)
+            elif subscriber.closed:
+                return
+            else:
+                yield b': ping\n\n'
+    finally:
+        feed.unsubscribe(subscriber)
+
+
+@router.get("/characters/feed")
+async def character_feed(since: Optional[str] = None, last_event_id: Optional[str] = Header(default=None)):
+    """
+    已保存角色的变更推送（Server-Sent Events）
+
+    每次保存（单个、批量、写后缓冲、按 id 查询写入、后台同步）推送 insert / update / upsert 事件，
+    data 为 {"seq", "id", "type", "character"}。断线重连时浏览器自动带上 Last-Event-ID，
+    从最近 feed_history 条历史里续传；太旧时先收到 reset 事件，需要重新全量加载。
+
+    Args:
+        since: 从这个事件 id 之后开始推送（Last-Event-ID 请求头优先）
+        last_event_id: 浏览器重连时带上的最后事件 id
+
+    Returns:
+        text/event-stream 流式响应
+    """
+    feed, subscriber, backlog, reset = _subscribe_feed(last_event_id or since)
+    return StreamingResponse(
+        iter_feed(feed, subscriber, backlog, reset, settings.feed_heartbeat),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@router.websocket("/characters/feed/ws")
+async def character_feed_ws(websocket: WebSocket, since: Optional[str] = None):
+    """
+    变更推送的 WebSocket 版本：每条事件一个 JSON 文本消息（与 SSE 的 data 相同）
+
+    另外还有 {"type": "reset"}、{"type": "ping"} 和 {"type": "overflow"} 控制消息，
+    溢出后服务端以 1013 关闭连接，客户端用最后收到的 id 作为 since 重连。
+    """
+    try:
+        feed, subscriber, backlog, reset = _subscribe_feed(since)
+    except HTTPException as e:
+        await websocket.close(code=1013 if e.status_code == 503 else 1008, reason=str(e.detail))
+        return
+
+    try:
+        await websocket.accept()
+        if reset:
+            await websocket.send_text(json.dumps({'type': 'reset', 'last_event_id': feed.last_event_id}))
+        for event in backlog:
+            await websocket.send_text(event.data)
+        while True:
+            batches = await subscriber.get(timeout=settings.feed_heartbeat)
+            if subscriber.overflowed:
+                await websocket.send_text(json.dumps({'type': 'overflow', 'last_seq': subscriber.last_seq}))
+                await websocket.close(code=1013)
+                return
+            if not batches:
+                if subscriber.closed:
+                    await websocket.close(code=1001)
+                    return
+                await websocket.send_text('{"type":"ping"}')
+            for batch in batches:
+                for event in batch.events:
+                    await websocket.send_text(event.data)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        feed.unsubscribe(subscriber)
+
+
+@router.get("/characters/feed/stats")
+async def feed_stats():
+    """
+    变更推送统计：当前订阅者数、最新序号、历史条数、溢出断开次数
+
+    Returns:
+        统计信息
+    """
+    data = {'enabled': settings.feed_enabled}
+    if settings.feed_enabled:
+        data.update(get_change_feed().stats())
+    return {'code': 0, 'message': 'success', 'data': data}
+
+
+@router.get("/characters/top")
+async def top_characters(
+    response: Response,
+    limit: int = Query(default=10, ge=1),
+    gender: Optional[str] = None,
+    prefix: Optional[str] = None,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(default=None),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    收藏数排行榜，可按性别和名字前缀筛选
+
+    优先从内存榜单返回（写入时增量更新）；榜单里满足条件的不够、或请求了 description 时
+    走 (favourites, id) / (gender, favourites, id) / name_full 索引查询。
+
+    Args:
+        limit: 返回数量（不超过 top_max_limit）
+        gender: 只返回这个性别，例如 Female
+        prefix: 名字以此开头
+        fields: 逗号分隔的返回列，默认不包含 description
+        if_none_match: 客户端缓存的 ETag
+
+    Returns:
+        按收藏数降序的角色和数据来源（cache / db）
+    """
+    if limit > settings.top_max_limit:
+        raise HTTPException(status_code=400, detail=f"limit 不能超过 {settings.top_max_limit}")
+    columns = parse_columns(fields, 'favourites')
+    gender = gender.strip() if gender and gender.strip() else None
+    prefix = prefix.strip() if prefix and prefix.strip() else None
+
+    version = await get_character_version(session)
+    headers = cache_headers(version.etag, version.last_modified)
+    if etag_matches(if_none_match, version.etag):
+        return Response(status_code=304, headers=headers)
+
+    items = None
+    if settings.leaderboard_cache_enabled and set(columns) <= set(LEADERBOARD_COLUMNS):
+        leaderboard = get_leaderboard()
+        await leaderboard.ensure_loaded(session, version.version)
+        items = leaderboard.top(limit, gender, prefix)
+    source = 'cache'
+    if items is None:
+        items = await query_top(session, limit, gender, prefix, columns)
+        source = 'db'
+
+    response.headers.update(headers)
+    return {
+        'code': 0,
+        'message': 'success',
+        'data': {
+            'items': [{name: row[name] for name in columns} for row in items],
+            'source': source,
+            'limit': limit
+        }
+    }
+
+
+@router.get("/characters/page")
+async def list_characters_page(
+    response: Response,
+    limit: int = Query(default=20, ge=1),
+    after: Optional[str] = None,
+    order: str = 'id',
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(default=None),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    分页获取已保存的角色（游标分页，不做 OFFSET 扫描）
+
+    响应带表版本 ETag；If-None-Match 命中时直接返回 304（只按主键读取表版本，不查询角色）。
+
+    Args:
+        limit: 每页数量（不超过 page_max_limit）
+        after: 上一页返回的 next_cursor
+        order: 排序方式，id（升序）或 favourites（降序）
+        fields: 逗号分隔的返回列，默认不包含 description
+        if_none_match: 客户端缓存的 ETag
+
+    Returns:
+        本页角色和下一页游标（没有下一页时为 null）
+    """
+    if order not in ORDERS:
+        raise HTTPException(status_code=400, detail=f"不支持的排序方式: {order}")
+    limit = min(limit, settings.page_max_limit)
+    columns = parse_columns(fields, order)
+
+    version = await get_character_version(session)
+    headers = cache_headers(version.etag, version.last_modified)
+    if etag_matches(if_none_match, version.etag):
+        return Response(status_code=304, headers=headers)
+
+    items, next_cursor = await fetch_page(session, limit, after, order, columns)
+    response.headers.update(headers)
+
+    return {
+        'code': 0,
+        'message': 'success',
+        'data': {
+            'items': items,
+            'next_cursor': next_cursor,
+            'limit': limit
+        }
+    }
+
+
+async def iter_export(
+    engine: AsyncEngine,
+    fmt: str,
+    columns: List[str],
+    chunk_size: int
+) -> AsyncIterator[bytes]:
+    """
+    用服务端游标按块读取 characters 表并逐块编码为 NDJSON / CSV
+
+    内存占用只和 chunk_size 有关，与表的行数无关。
+
+    Args:
+        engine: 异步数据库引擎
+        fmt: 导出格式（ndjson / csv）
+        columns: 导出的列
+        chunk_size: 每次从游标读取的行数
+
+    Yields:
+        编码后的数据块
+    """
+    statement = (
+        select(*[getattr(Character, name) for name in columns])
+        .order_by(Character.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    async with engine.connect() as conn:
+        result = await conn.stream(statement)
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            yield buffer.getvalue().encode('utf-8')
+
+        async for rows in result.partitions(chunk_size):
+            buffer = io.StringIO()
+            if fmt == 'csv':
+                csv.writer(buffer).writerows(rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+                    buffer.write('\n')
+            yield buffer.getvalue().encode('utf-8')
+
+
+@router.get("/characters/export")
+async def export_characters(
+    format: str = 'ndjson',
+    fields: Optional[str] = None,
+    engine: AsyncEngine = Depends(get_async_engine)
+):
+    """
+    流式导出全部已保存的角色（NDJSON 或 CSV），边读边发送
+
+    Args:
+        format: 导出格式，ndjson 或 csv
+        fields: 逗号分隔的导出列，默认全部列
+
+    Returns:
+        流式响应
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的导出格式: {format}")
+    columns = parse_columns(fields, 'id', default=CHARACTER_COLUMNS)
+    media_type, extension = EXPORT_FORMATS[format]
+
+    logger.info(f"开始导出角色: format={format}")
+    return StreamingResponse(
+        iter_export(engine, format, columns, settings.export_chunk_size),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="characters.{extension}"'}
+    )
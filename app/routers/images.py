@@ -0,0 +1,79 @@
+import logging
+import os
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import FileResponse
+
+from app.config import settings
+from app.services import CachedImage, ImageProxyError, etag_matches, get_image_cache
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api", tags=["image"])
+
+
+async def _cached_file(url: str, width: Optional[int]) -> Tuple[CachedImage, os.stat_result]:
+    """
+    取得图片和它的文件信息
+
+    其他请求写入新文件时可能淘汰掉刚取得的文件，这时重新取一次（会重新下载或生成）。
+    文件信息直接交给 FileResponse，不再单独检查文件是否存在。
+    """
+    for _ in range(2):
+        image = await get_image_cache().get(url, width)
+        try:
+            return image, os.stat(image.path)
+        except FileNotFoundError:
+            logger.info(f"图片在返回前被淘汰，重新获取: {url}")
+    raise ImageProxyError("图片缓存空间不足，请稍后重试", 503)
+
+
+@router.get("/image")
+async def get_image(
+    url: str = Query(..., description="源站图片地址（只允许 image_proxy_hosts 里的主机）"),
+    w: Optional[int] = Query(default=None, description="缩略图宽度，不传返回原图"),
+    if_none_match: Optional[str] = Header(default=None)
+):
+    """
+    代理角色图片：每个地址只从源站下载一次，之后从本地磁盘缓存返回
+
+    传了宽度时返回第一次请求时生成的 WebP 缩略图（未安装 Pillow 时返回原图）。
+    缓存文件按内容寻址，ETag 就是内容摘要，响应可以长期缓存；文件分块从磁盘读取返回。
+    只代理位图（JPEG / PNG / GIF / WebP / AVIF），响应禁止内容类型嗅探并带 sandbox CSP。
+
+    Args:
+        url: 源站图片地址
+        w: 缩略图宽度
+        if_none_match: 客户端缓存的 ETag
+
+    Returns:
+        图片文件
+    """
+    if not settings.image_proxy_enabled:
+        raise HTTPException(status_code=404, detail="图片代理未开启")
+    try:
+        image, stat_result = await _cached_file(url, w)
+    except ImageProxyError as e:
+        if e.status_code >= 500:
+            logger.warning(f"图片代理失败 {url}: {e}")
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    headers = {
+        'ETag': image.etag,
+        'Cache-Control': f"public, max-age={settings.image_max_age}, immutable",
+        'X-Content-Type-Options': 'nosniff',
+        'Content-Security-Policy': 'sandbox',
+    }
+    if etag_matches(if_none_match, image.etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(image.path, media_type=image.content_type, headers=headers, stat_result=stat_result)
+
+
+@router.get("/image/stats")
+async def get_image_stats():
+    """图片缓存统计"""
+    return {"code": 0, "message": "success", "data": {
+        "enabled": settings.image_proxy_enabled,
+        **get_image_cache().stats(),
+    }}
@@ -0,0 +1,62 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import selectinload
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import get_async_session
+from app.models import Character, CharacterMedia, Media
+from app.schemas import CharacterWithMedia, MediaItem
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api", tags=["media"])
+
+
+@router.get("/media/{media_id}/characters")
+async def get_media_characters(
+    media_id: int,
+    limit: int = Query(default=50, ge=1, le=500, description="返回数量"),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    获取出现在某部作品里的已保存角色（按收藏数降序，带各自的作品列表）
+
+    角色通过 character_media 的 (media_id, character_id) 索引查找，
+    作品列表用 selectinload 批量加载，总共固定 4 次查询。
+
+    Args:
+        media_id: AniList 作品 id
+        limit: 返回数量
+        session: 数据库会话
+
+    Returns:
+        作品信息、角色列表和角色总数
+    """
+    media = await session.get(Media, media_id)
+    if media is None:
+        raise HTTPException(status_code=404, detail="未找到作品")
+
+    total = (await session.exec(
+        select(func.count()).select_from(CharacterMedia).where(CharacterMedia.media_id == media_id)
+    )).one()
+    statement = (
+        select(Character)
+        .join(CharacterMedia, CharacterMedia.character_id == Character.id)
+        .where(CharacterMedia.media_id == media_id)
+        .order_by(Character.favourites.desc(), Character.id.desc())
+        .limit(limit)
+        .options(selectinload(Character.media))
+    )
+    characters = (await session.exec(statement)).all()
+
+    return {
+        'code': 0,
+        'message': 'success',
+        'data': {
+            'media': MediaItem.model_validate(media).model_dump(),
+            'characters': [CharacterWithMedia.model_validate(char).model_dump() for char in characters],
+            'total': total,
+        }
+    }
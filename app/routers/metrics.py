@@ -0,0 +1,23 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.metrics import REGISTRY
+
+router = APIRouter(tags=["metrics"])
+
+# Prometheus 文本格式
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    输出所有监控指标（Prometheus 文本格式）
+
+    Returns:
+        指标文本
+    """
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="监控指标未开启")
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
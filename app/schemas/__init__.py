@@ -1,3 +1,4 @@
-from .response import APIResponse, CharacterSearchResponse
+from .request import BatchSearchRequest
+from .response import APIResponse, CharacterSearchResponse, CharacterWithMedia, MediaItem
 
-__all__ = ["APIResponse", "CharacterSearchResponse"]
+__all__ = ["APIResponse", "CharacterSearchResponse", "BatchSearchRequest", "CharacterWithMedia", "MediaItem"]
@@ -0,0 +1,9 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+
+class BatchSearchRequest(BaseModel):
+    """批量搜索请求"""
+    names: List[str]
+    per_page: Optional[int] = Field(default=None, ge=1, le=50)
+    fields: str = 'full'
@@ -1,5 +1,5 @@
 from typing import Any, Optional, List
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class APIResponse(BaseModel):
@@ -18,3 +18,28 @@ class CharacterSearchData(BaseModel):
 class CharacterSearchResponse(APIResponse):
     """角色搜索响应"""
     data: Optional[CharacterSearchData] = None
+
+
+class MediaItem(BaseModel):
+    """角色出现的作品"""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: Optional[str] = None
+    type: Optional[str] = None
+
+
+class CharacterWithMedia(BaseModel):
+    """带作品列表的角色"""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: Optional[int] = None
+    name_full: Optional[str] = None
+    name_native: Optional[str] = None
+    gender: Optional[str] = None
+    age: Optional[str] = None
+    favourites: Optional[int] = 0
+    image_url: Optional[str] = None
+    description: Optional[str] = None
+    site_url: Optional[str] = None
+    media: List[MediaItem] = []
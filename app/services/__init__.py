@@ -1,3 +1,95 @@
-from .anilist import AniListService
+from .anilist import (
+    AniListService,
+    get_client,
+    close_client,
+    get_search_cache,
+    close_search_cache,
+    get_character_cache,
+    get_singleflight,
+    get_scheduler,
+    get_circuit_breaker,
+    get_latency_tracker,
+)
+from .exceptions import (
+    AniListError,
+    AniListUnavailableError,
+    AniListTimeoutError,
+    CircuitOpenError,
+    ImageProxyError,
+    WriteBehindBacklogError,
+)
+from .events import (
+    SavedCharacter,
+    notify_characters_saved,
+    on_characters_saved,
+    notify_characters_fetched,
+    on_characters_fetched,
+)
+from .search_index import LocalSearchIndex, build_local_index, get_local_index, refresh_local_index
+from .suggest import SuggestIndex, build_suggest_index, get_suggest_index
+from .sync import CharacterSyncWorker, get_sync_worker, start_sync_worker, stop_sync_worker
+from .etag import TableVersion, content_etag, etag_matches, cache_headers, get_character_version, get_table_version
+from .feed import ChangeFeed, FeedEvent, FeedSubscriber, sse_frame, get_change_feed, close_change_feed
+from .leaderboard import Leaderboard, LEADERBOARD_COLUMNS, get_leaderboard, query_top
+from .write_behind import WriteBehindBuffer, get_write_behind, peek_write_behind, close_write_behind
+from .images import CachedImage, ImageCache, get_image_cache, close_image_cache, thumbnails_available
 
-__all__ = ["AniListService"]
+__all__ = [
+    "AniListService",
+    "get_client",
+    "close_client",
+    "get_search_cache",
+    "close_search_cache",
+    "get_character_cache",
+    "get_singleflight",
+    "get_scheduler",
+    "get_circuit_breaker",
+    "get_latency_tracker",
+    "AniListError",
+    "AniListUnavailableError",
+    "AniListTimeoutError",
+    "CircuitOpenError",
+    "ImageProxyError",
+    "WriteBehindBacklogError",
+    "SavedCharacter",
+    "notify_characters_saved",
+    "on_characters_saved",
+    "notify_characters_fetched",
+    "on_characters_fetched",
+    "LocalSearchIndex",
+    "build_local_index",
+    "get_local_index",
+    "refresh_local_index",
+    "SuggestIndex",
+    "build_suggest_index",
+    "get_suggest_index",
+    "CharacterSyncWorker",
+    "get_sync_worker",
+    "start_sync_worker",
+    "stop_sync_worker",
+    "TableVersion",
+    "content_etag",
+    "etag_matches",
+    "cache_headers",
+    "get_character_version",
+    "get_table_version",
+    "ChangeFeed",
+    "FeedEvent",
+    "FeedSubscriber",
+    "sse_frame",
+    "get_change_feed",
+    "close_change_feed",
+    "Leaderboard",
+    "LEADERBOARD_COLUMNS",
+    "get_leaderboard",
+    "query_top",
+    "WriteBehindBuffer",
+    "get_write_behind",
+    "peek_write_behind",
+    "close_write_behind",
+    "CachedImage",
+    "ImageCache",
+    "get_image_cache",
+    "close_image_cache",
+    "thumbnails_available",
+]
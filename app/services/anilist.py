@@ -1,19 +1,232 @@
+import asyncio
+import json
 import logging
-import requests
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Dict, Any, Optional
+
+import httpx
 
 from app.config import settings
+from app.metrics import ANILIST_DURATION, ANILIST_RESPONSES, record_stage, stage
+from app.services.cache import TTLCache
+from app.services.events import SavedCharacter, notify_characters_fetched, on_characters_saved
+from app.services.exceptions import AniListError, AniListTimeoutError, AniListUnavailableError
+from app.services.resilience import CircuitBreaker, LatencyTracker
+from app.services.scheduler import UpstreamScheduler, PRIORITY_INTERACTIVE
+from app.services.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+# 共享的 HTTP 客户端（懒加载），由 lifespan 负责创建和关闭
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """获取共享的 AniList 异步 HTTP 客户端（懒加载，带连接池和 keep-alive）"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=settings.anilist_timeout,
+            limits=httpx.Limits(
+                max_connections=settings.anilist_max_connections,
+                max_keepalive_connections=settings.anilist_max_keepalive_connections,
+                keepalive_expiry=settings.anilist_keepalive_expiry,
+            ),
+            headers={
+                'Content-Type': 'application/json',
+                'Accept': 'application/json',
+            },
+        )
+    return _client
+
+
+async def close_client() -> None:
+    """关闭共享的 HTTP 客户端，释放连接池"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+# 角色搜索结果缓存（懒加载）
+_search_cache: Optional[TTLCache] = None
+
+
+def get_search_cache() -> TTLCache:
+    """获取角色搜索结果缓存（懒加载）"""
+    global _search_cache
+    if _search_cache is None:
+        _search_cache = TTLCache(
+            max_size=settings.search_cache_max_size,
+            ttl=settings.search_cache_ttl,
+            negative_ttl=settings.search_cache_negative_ttl,
+            stale_ttl=settings.search_cache_stale_ttl,
+        )
+    return _search_cache
+
+
+async def close_search_cache() -> None:
+    """取消缓存的后台刷新任务并丢弃缓存"""
+    global _search_cache
+    if _search_cache is not None:
+        await _search_cache.aclose()
+        _search_cache = None
+
+
+# 按 id 查询的角色缓存（懒加载），值为 AniList 结构的角色，{} 表示不存在
+_character_cache: Optional[TTLCache] = None
+
+
+def get_character_cache() -> TTLCache:
+    """获取按 id 查询的角色缓存（懒加载）"""
+    global _character_cache
+    if _character_cache is None:
+        _character_cache = TTLCache(
+            max_size=settings.character_cache_max_size,
+            ttl=settings.character_cache_ttl,
+            negative_ttl=settings.character_cache_negative_ttl,
+        )
+    return _character_cache
+
+
+@on_characters_saved
+def _invalidate_saved_characters(saved: List[SavedCharacter]) -> None:
+    """角色写入后删除按 id 缓存的旧数据"""
+    if _character_cache is not None:
+        for item in saved:
+            _character_cache.invalidate(item.row['id'])
+
+
+# 合并并发的相同 GraphQL 请求
+_singleflight: Optional[SingleFlight] = None
+
+
+def get_singleflight() -> SingleFlight:
+    """获取请求合并器（懒加载）"""
+    global _singleflight
+    if _singleflight is None:
+        _singleflight = SingleFlight()
+    return _singleflight
+
+
+# 上游限流调度器
+_scheduler: Optional[UpstreamScheduler] = None
+
+
+def get_scheduler() -> UpstreamScheduler:
+    """获取 AniList 上游调度器（懒加载）"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = UpstreamScheduler(
+            rate_limit=settings.anilist_rate_limit,
+            max_wait=settings.anilist_max_queue_wait,
+        )
+    return _scheduler
+
+
+# 熔断器和上游延迟统计
+_breaker: Optional[CircuitBreaker] = None
+_latency: Optional[LatencyTracker] = None
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """获取 AniList 熔断器（懒加载）"""
+    global _breaker
+    if _breaker is None:
+        _breaker = CircuitBreaker(
+            failure_threshold=settings.anilist_breaker_threshold,
+            reset_timeout=settings.anilist_breaker_reset,
+        )
+    return _breaker
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """获取 AniList 上游延迟统计（懒加载）"""
+    global _latency
+    if _latency is None:
+        _latency = LatencyTracker()
+    return _latency
+
+
+@lru_cache(maxsize=None)
+def build_search_query(fields: str = 'full') -> str:
+    """
+    构造指定字段集的搜索 GraphQL 文档
+
+    Args:
+        fields: 字段集名称（card / detail / full）
+
+    Returns:
+        GraphQL 查询语句（按字段集缓存）
+    """
+    selection = AniListService.FIELD_VARIANTS[fields]
+    return f'''
+    query ($search: String, $page: Int, $perPage: Int) {{
+      Page(page: $page, perPage: $perPage) {{
+        characters(search: $search, sort: FAVOURITES_DESC) {{{selection}    }}
+      }}
+    }}
+    '''
+
+
+@lru_cache(maxsize=None)
+def build_batch_query(count: int, fields: str = 'full') -> str:
+    """
+    构造批量搜索的 GraphQL 文档：每个名字一个带别名的 Page 块（c0, c1, ...）
+
+    Args:
+        count: 名字数量
+        fields: 字段集名称（card / detail / full）
+
+    Returns:
+        GraphQL 查询语句（按数量和字段集缓存）
+    """
+    selection = AniListService.FIELD_VARIANTS[fields]
+    params = ', '.join(f'$s{i}: String' for i in range(count))
+    blocks = ''.join(
+        f'''
+      c{i}: Page(page: 1, perPage: $perPage) {{
+        characters(search: $s{i}, sort: FAVOURITES_DESC) {{{selection}    }}
+      }}'''
+        for i in range(count)
+    )
+    return f'''
+    query ($perPage: Int, {params}) {{{blocks}
+    }}
+    '''
+
+
+@lru_cache(maxsize=None)
+def build_ids_query(fields: str = 'full') -> str:
+    """
+    构造按 id 批量获取角色的 GraphQL 文档（Page(characters(id_in: ...))）
+
+    Args:
+        fields: 字段集名称（card / detail / full）
+
+    Returns:
+        GraphQL 查询语句（按字段集缓存）
+    """
+    selection = AniListService.FIELD_VARIANTS[fields]
+    return f'''
+    query ($ids: [Int], $perPage: Int) {{
+      Page(page: 1, perPage: $perPage) {{
+        characters(id_in: $ids) {{{selection}    }}
+      }}
+    }}
+    '''
+
+
+def search_cache_key(search_name: str, per_page: int, fields: str = 'full') -> tuple:
+    """搜索缓存键：规范化后的名字（合并空白、忽略大小写）+ per_page + 字段集"""
+    return ' '.join(search_name.split()).casefold(), per_page, fields
+
 
 class AniListService:
     """AniList API 服务类"""
 
-    QUERY = '''
-    query ($search: String, $page: Int, $perPage: Int) {
-      Page(page: $page, perPage: $perPage) {
-        characters(search: $search, sort: FAVOURITES_DESC) {
+    # 角色字段选择，单个搜索和批量搜索共用
+    CHARACTER_FIELDS = '''
           id
           name {
             first
@@ -51,19 +264,74 @@ class AniListService:
               }
             }
           }
-        }
+    '''
+
+    # 列表卡片只需要名字、缩略图和收藏数
+    CARD_FIELDS = '''
+          id
+          name {
+            full
+            native
+          }
+          image {
+            medium
+          }
+          favourites
+    '''
+
+    # 详情不需要生日和作品信息
+    DETAIL_FIELDS = '''
+          id
+          name {
+            full
+            native
+            alternative
+          }
+          image {
+            large
+            medium
+          }
+          description
+          gender
+          age
+          favourites
+          siteUrl
+    '''
+
+    # AniList 单页最多返回的数量
+    MAX_PER_PAGE = 50
+
+    # 字段集名称 -> GraphQL 字段选择
+    FIELD_VARIANTS = {
+        'card': CARD_FIELDS,
+        'detail': DETAIL_FIELDS,
+        'full': CHARACTER_FIELDS,
+    }
+
+    QUERY = '''
+    query ($search: String, $page: Int, $perPage: Int) {
+      Page(page: $page, perPage: $perPage) {
+        characters(search: $search, sort: FAVOURITES_DESC) {''' + CHARACTER_FIELDS + '''    }
       }
     }
     '''
 
     @classmethod
-    def search_characters(cls, search_name: str, per_page: int = None) -> List[Dict[str, Any]]:
+    async def search_characters(
+        cls,
+        search_name: str,
+        per_page: int = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        fields: str = 'full'
+    ) -> List[Dict[str, Any]]:
         """
         从 AniList API 搜索角色
 
         Args:
             search_name: 角色名字
             per_page: 返回结果数量，默认使用配置值
+            priority: 上游调度优先级
+            fields: 字段集名称（card / detail / full）
 
         Returns:
             角色信息列表
@@ -77,25 +345,177 @@ class AniListService:
             'perPage': per_page
         }
 
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
-        }
+        query = cls.QUERY if fields == 'full' else build_search_query(fields)
+        data = await cls.execute(query, variables, priority)
+        if 'data' in data and data['data']['Page']['characters']:
+            characters = data['data']['Page']['characters']
+            notify_characters_fetched(characters)
+            return characters
+        return []
 
-        response = requests.post(
-            settings.anilist_api_url,
-            json={'query': cls.QUERY, 'variables': variables},
-            headers=headers,
-            timeout=settings.anilist_timeout
-        )
+    @classmethod
+    async def get_characters_by_ids(
+        cls,
+        ids: List[int],
+        priority: int = PRIORITY_INTERACTIVE,
+        fields: str = 'full'
+    ) -> List[Dict[str, Any]]:
+        """
+        按 id 从 AniList 批量获取角色，每 50 个 id 一个请求
+
+        Args:
+            ids: 角色 id 列表
+            priority: 上游调度优先级
+            fields: 字段集名称（card / detail / full）
+
+        Returns:
+            找到的角色信息列表（顺序不保证，不存在的 id 不返回）
+        """
+        size = cls.MAX_PER_PAGE
+        chunks = [ids[i:i + size] for i in range(0, len(ids), size)]
+        pages = await asyncio.gather(*(
+            cls.execute(build_ids_query(fields), {'ids': chunk, 'perPage': len(chunk)}, priority)
+            for chunk in chunks
+        ))
+        characters = [
+            char
+            for data in pages
+            for char in (((data.get('data') or {}).get('Page') or {}).get('characters') or [])
+        ]
+        notify_characters_fetched(characters)
+        return characters
+
+    @classmethod
+    async def execute(
+        cls,
+        query: str,
+        variables: Dict[str, Any],
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> Dict[str, Any]:
+        """
+        执行 GraphQL 查询，并发的相同 (query, variables) 只发送一次上游请求
+
+        Args:
+            query: GraphQL 查询语句
+            variables: 查询变量
+            priority: 上游调度优先级
+
+        Returns:
+            AniList 返回的 JSON 数据
+
+        Raises:
+            AniListUnavailableError: 限流或排队超时
+            AniListError: 其它上游错误
+        """
+        key = (query, json.dumps(variables, sort_keys=True, ensure_ascii=False))
+        return await get_singleflight().do(key, lambda: cls._post(query, variables, priority))
+
+    @classmethod
+    async def _post(cls, query: str, variables: Dict[str, Any], priority: int) -> Dict[str, Any]:
+        """
+        经过熔断器和限流调度向 AniList 发送 GraphQL 请求
+
+        拿到第一个令牌后开始计算截止时间，连接、读取和 429 重试都必须在
+        anilist_deadline 秒内完成；超时、连接错误和 5xx 计入熔断器。
+        """
+        breaker = get_circuit_breaker()
+        scheduler = get_scheduler()
+        breaker.before_call()
+        try:
+            await scheduler.acquire(priority)
+        except BaseException:
+            breaker.release()
+            raise
+
+        deadline = asyncio.get_running_loop().time() + settings.anilist_deadline
+        try:
+            async with asyncio.timeout_at(deadline):
+                for attempt in range(settings.anilist_max_retries + 1):
+                    if attempt:
+                        await scheduler.acquire(priority)
+                    response = await cls._send(query, variables)
+                    scheduler.update(response.status_code, response.headers)
 
-        if response.status_code == 200:
-            data = response.json()
-            if 'data' in data and data['data']['Page']['characters']:
-                return data['data']['Page']['characters']
-            return []
-        else:
-            raise Exception(f"AniList API 请求失败: {response.status_code}")
+                    if response.status_code == 200:
+                        breaker.record_success()
+                        with stage('decode'):
+                            return response.json()
+                    if response.status_code >= 500:
+                        breaker.record_failure()
+                        raise AniListError(f"AniList API 请求失败: {response.status_code}")
+                    if response.status_code != 429:
+                        breaker.record_success()
+                        raise AniListError(f"AniList API 请求失败: {response.status_code}")
+                    logger.warning("AniList 返回 429，等待 Retry-After 后重试")
+        except TimeoutError:
+            breaker.record_failure()
+            raise AniListTimeoutError(f"AniList 请求超过 {settings.anilist_deadline} 秒未完成")
+        except httpx.TransportError as e:
+            breaker.record_failure()
+            raise AniListUnavailableError(f"AniList 连接失败: {e.__class__.__name__}")
+        except AniListUnavailableError:
+            # 重试时排队超时
+            breaker.release()
+            raise
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+
+        # 一直被限流不代表上游故障
+        breaker.release()
+        raise AniListUnavailableError("AniList 限流，重试次数已用完", retry_after=scheduler.stats()['blocked_for'])
+
+    @classmethod
+    async def _send(cls, query: str, variables: Dict[str, Any]) -> httpx.Response:
+        """
+        发送一次 POST；开启对冲时，超过最近延迟的分位数仍未返回就再发一个，先返回的为准
+
+        对冲请求也要消耗限流令牌，拿不到令牌时不对冲。
+        """
+        client = get_client()
+        payload = {'query': query, 'variables': variables}
+        tracker = get_latency_tracker()
+        loop = asyncio.get_running_loop()
+
+        async def post() -> httpx.Response:
+            started = loop.time()
+            try:
+                response = await client.post(settings.anilist_api_url, json=payload)
+            except httpx.TransportError:
+                ANILIST_RESPONSES.labels('error').inc()
+                raise
+            elapsed = loop.time() - started
+            tracker.record(elapsed)
+            ANILIST_DURATION.observe(elapsed)
+            record_stage('anilist', elapsed)
+            ANILIST_RESPONSES.labels(str(response.status_code)).inc()
+            return response
+
+        delay = tracker.quantile(settings.anilist_hedge_quantile) if settings.anilist_hedge_enabled else None
+        if delay is None:
+            return await post()
+
+        first = asyncio.create_task(post())
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=max(delay, settings.anilist_hedge_min_delay))
+            if not done and get_scheduler().try_acquire():
+                tasks.add(asyncio.create_task(post()))
+                tracker.hedged += 1
+
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            tracker.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
 
     @classmethod
     def format_character(cls, character: Dict[str, Any]) -> Dict[str, Any]:
@@ -147,16 +567,203 @@ class AniListService:
         return formatted
 
     @classmethod
-    def search_and_format(cls, search_name: str, per_page: int = None) -> List[Dict[str, Any]]:
+    def format_card(cls, character: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        格式化为列表卡片需要的精简结构（对应 CARD_FIELDS）
+
+        Args:
+            character: 原始角色数据
+
+        Returns:
+            格式化后的角色数据
+        """
+        name = character.get('name') or {}
+        return {
+            'id': character.get('id', 0),
+            'name': {
+                'full': name.get('full', ''),
+                'native': name.get('native', '')
+            },
+            'image': {
+                'medium': (character.get('image') or {}).get('medium', '')
+            },
+            'favourites': character.get('favourites', 0)
+        }
+
+    @classmethod
+    def format_detail(cls, character: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        格式化为详情结构（对应 DETAIL_FIELDS，不含生日和作品）
+
+        Args:
+            character: 原始角色数据
+
+        Returns:
+            格式化后的角色数据
+        """
+        name = character.get('name') or {}
+        image = character.get('image') or {}
+        return {
+            'id': character.get('id', 0),
+            'name': {
+                'full': name.get('full', ''),
+                'native': name.get('native', ''),
+                'alternative': name.get('alternative', [])
+            },
+            'image': {
+                'large': image.get('large', ''),
+                'medium': image.get('medium', '')
+            },
+            'description': character.get('description', ''),
+            'gender': character.get('gender', ''),
+            'age': character.get('age', ''),
+            'favourites': character.get('favourites', 0),
+            'siteUrl': character.get('siteUrl', '')
+        }
+
+    @classmethod
+    def formatter_for(cls, fields: str):
+        """返回字段集对应的格式化函数"""
+        return {
+            'card': cls.format_card,
+            'detail': cls.format_detail,
+            'full': cls.format_character,
+        }[fields]
+
+    @classmethod
+    async def search_and_format(
+        cls,
+        search_name: str,
+        per_page: int = None,
+        fields: str = 'full'
+    ) -> List[Dict[str, Any]]:
         """
         搜索角色并格式化结果
 
         Args:
             search_name: 角色名字
             per_page: 返回结果数量
+            fields: 字段集名称（card / detail / full）
 
         Returns:
             格式化后的角色列表
         """
-        characters = cls.search_characters(search_name, per_page)
-        return [cls.format_character(char) for char in characters]
+        if per_page is None:
+            per_page = settings.anilist_per_page
+        formatter = cls.formatter_for(fields)
+
+        # 默认字段集保持原来的调用方式
+        options = {} if fields == 'full' else {'fields': fields}
+
+        async def load() -> List[Dict[str, Any]]:
+            characters = await cls.search_characters(search_name, per_page, **options)
+            with stage('format'):
+                return [formatter(char) for char in characters]
+
+        if not settings.search_cache_enabled:
+            return await load()
+
+        key = search_cache_key(search_name, per_page, fields)
+        cache = get_search_cache()
+        try:
+            return await cache.get_or_load(key, load)
+        except AniListUnavailableError:
+            # 熔断、超时或限流时，有旧结果就先返回旧结果
+            stale = cache.peek(key)
+            if stale is None:
+                raise
+            logger.warning(f"AniList 不可用，返回过期的缓存结果: {search_name}")
+            return stale
+
+    @classmethod
+    def search_etag(cls, search_name: str, per_page: int = None, fields: str = 'full') -> Optional[str]:
+        """
+        已缓存搜索结果的内容哈希（不访问 AniList），未缓存或已过期返回 None
+
+        Args:
+            search_name: 角色名字
+            per_page: 返回结果数量
+            fields: 字段集名称
+
+        Returns:
+            ETag
+        """
+        if not settings.search_cache_enabled:
+            return None
+        if per_page is None:
+            per_page = settings.anilist_per_page
+        return get_search_cache().etag(search_cache_key(search_name, per_page, fields))
+
+    @classmethod
+    async def batch_search_and_format(
+        cls,
+        search_names: List[str],
+        per_page: int = None,
+        fields: str = 'full'
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        批量搜索多个角色名，合并成尽量少的 GraphQL 请求
+
+        已缓存的名字直接返回，其余按 anilist_batch_size 分块，
+        每块用一个带别名的 GraphQL 文档一次请求完成。
+
+        Args:
+            search_names: 角色名字列表
+            per_page: 每个名字返回的结果数量
+            fields: 字段集名称（card / detail / full）
+
+        Returns:
+            以名字为键的格式化角色列表
+        """
+        if per_page is None:
+            per_page = settings.anilist_per_page
+        formatter = cls.formatter_for(fields)
+
+        cache = get_search_cache() if settings.search_cache_enabled else None
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        pending: Dict[tuple, List[str]] = {}
+        for name in search_names:
+            key = search_cache_key(name, per_page, fields)
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                results[name] = cached
+            else:
+                pending.setdefault(key, []).append(name)
+
+        keys = list(pending)
+        size = max(1, settings.anilist_batch_size)
+        chunks = [keys[i:i + size] for i in range(0, len(keys), size)]
+        fetched = await asyncio.gather(
+            *(cls._batch_search([pending[key][0] for key in chunk], per_page, fields) for chunk in chunks)
+        )
+
+        for chunk, chunk_results in zip(chunks, fetched):
+            for key, characters in zip(chunk, chunk_results):
+                formatted = [formatter(char) for char in characters]
+                if cache is not None:
+                    cache.set(key, formatted)
+                for name in pending[key]:
+                    results[name] = formatted
+
+        return {name: results[name] for name in search_names}
+
+    @classmethod
+    async def _batch_search(
+        cls,
+        search_names: List[str],
+        per_page: int,
+        fields: str
+    ) -> List[List[Dict[str, Any]]]:
+        """用一个带别名的 GraphQL 请求搜索一组名字，按输入顺序返回原始角色列表"""
+        variables: Dict[str, Any] = {'perPage': per_page}
+        for i, name in enumerate(search_names):
+            variables[f's{i}'] = name
+
+        data = await cls.execute(build_batch_query(len(search_names), fields), variables)
+        pages = data.get('data') or {}
+        results = [
+            ((pages.get(f'c{i}') or {}).get('characters') or [])
+            for i in range(len(search_names))
+        ]
+        notify_characters_fetched([char for characters in results for char in characters])
+        return results
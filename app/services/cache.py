@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from app.services.etag import content_etag
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class _Entry:
+    """缓存条目"""
+    value: Any
+    expires_at: float
+    stale_until: float
+    etag: Optional[str] = None  # 内容哈希，第一次用到时计算
+
+
+class TTLCache:
+    """
+    进程内 TTL + LRU 缓存
+
+    - 超过 max_size 时按最近最少使用淘汰
+    - 空结果（未找到）使用更短的 negative_ttl
+    - 过期后的 stale_ttl 时间内先返回旧值，同时在后台刷新（stale-while-revalidate）
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        negative_ttl: float,
+        stale_ttl: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+
+        # 统计计数器
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.fallbacks = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取未过期的缓存值（不计入统计，不触发刷新），不存在返回 None"""
+        entry = self._entries.get(key)
+        if entry is None or self._clock() >= entry.expires_at:
+            return None
+        return entry.value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """写入缓存，空结果使用 negative_ttl"""
+        now = self._clock()
+        if value:
+            expires_at = now + self.ttl
+            stale_until = expires_at + self.stale_ttl
+        else:
+            expires_at = stale_until = now + self.negative_ttl
+
+        self._entries[key] = _Entry(value, expires_at, stale_until)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def etag(self, key: Hashable) -> Optional[str]:
+        """
+        未过期缓存值的内容哈希（同一个条目只计算一次），不存在或已过期返回 None
+
+        条件请求用它判断客户端手里的结果是否还是最新的，命中时不用再序列化结果。
+        """
+        entry = self._entries.get(key)
+        if entry is None or self._clock() >= entry.expires_at:
+            return None
+        if entry.etag is None:
+            entry.etag = content_etag(entry.value)
+        return entry.etag
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """读取缓存值，不管是否过期（用于上游不可用时兜底），不存在返回 None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self.fallbacks += 1
+        return entry.value
+
+    def invalidate(self, key: Hashable) -> None:
+        """删除指定缓存条目"""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+
+    async def get_or_load(self, key: Hashable, loader: Loader) -> Any:
+        """
+        读取缓存，未命中时调用 loader 加载并写入
+
+        Args:
+            key: 缓存键
+            loader: 无参数的协程函数，返回需要缓存的值
+
+        Returns:
+            缓存值或新加载的值
+        """
+        now = self._clock()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if now < entry.expires_at:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            if now < entry.stale_until:
+                # 先返回旧值，后台刷新
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                self._schedule_refresh(key, loader)
+                return entry.value
+            # 过期的旧值先保留，加载成功后被覆盖；上游不可用时还能用 peek 兜底
+
+        self.misses += 1
+        value = await loader()
+        self.set(key, value)
+        return value
+
+    def _schedule_refresh(self, key: Hashable, loader: Loader) -> None:
+        """为 key 启动后台刷新任务（同一个 key 同时只刷新一次）"""
+        if key in self._refreshing:
+            return
+        task = asyncio.create_task(self._refresh(key, loader))
+        self._refreshing[key] = task
+
+    async def _refresh(self, key: Hashable, loader: Loader) -> None:
+        try:
+            value = await loader()
+            self.set(key, value)
+            self.refreshes += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 刷新失败时保留旧值，等待下次访问再试
+            self.refresh_errors += 1
+            logger.warning(f"缓存后台刷新失败: {key} {e}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def aclose(self) -> None:
+        """取消所有后台刷新任务"""
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._refreshing.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存统计信息"""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'refreshes': self.refreshes,
+            'refresh_errors': self.refresh_errors,
+            'fallbacks': self.fallbacks,
+            'hit_ratio': round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
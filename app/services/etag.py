@@ -0,0 +1,100 @@
+import hashlib
+import json
+from email.utils import formatdate
+from typing import Any, Dict, Optional
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import Character, TableVersionRecord
+
+
+def content_etag(value: Any) -> str:
+    """按内容计算强 ETag（JSON 规范化后取 blake2b 摘要）"""
+    body = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+    return '"' + hashlib.blake2b(body.encode('utf-8'), digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """
+    判断 If-None-Match 是否命中当前 ETag（按弱比较，支持多个值和 *）
+
+    Args:
+        if_none_match: 请求头 If-None-Match 的值
+        etag: 当前表示的 ETag
+
+    Returns:
+        命中时返回 True（应答 304）
+    """
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    current = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == current:
+            return True
+    return False
+
+
+def cache_headers(etag: str, last_modified: Optional[str] = None) -> Dict[str, str]:
+    """条件请求相关的响应头：每次使用前都要向服务端验证（no-cache）"""
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if last_modified:
+        headers['Last-Modified'] = last_modified
+    return headers
+
+
+class TableVersion:
+    """
+    表版本（table_versions 表中一行的快照）
+
+    版本号在写入表的同一个事务里加一（见 app.database.bump_table_version），所有工作进程
+    和 app.cli.import_characters 直接写库时都会更新。条件请求每次按主键读取这一行，
+    不查询角色表本身。ETag 由版本号和最后修改时间组成，数据库重建后版本号从头计数
+    也不会和之前发出的 ETag 冲突。
+    """
+
+    def __init__(self, version: int = 0, modified_at: float = 0):
+        self.version = version
+        self.modified_at = modified_at
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}-{int(self.modified_at * 1000):x}"'
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        """HTTP 日期格式的最后修改时间（表还没有写入过时为 None）"""
+        if not self.modified_at:
+            return None
+        return formatdate(self.modified_at, usegmt=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'version': self.version, 'etag': self.etag, 'last_modified': self.last_modified}
+
+
+async def get_table_version(session: AsyncSession, name: str) -> TableVersion:
+    """
+    读取表的当前版本（一次主键查询）
+
+    Args:
+        session: 数据库会话
+        name: 表名
+
+    Returns:
+        版本快照；表还没有写入过时版本为 0
+    """
+    statement = select(TableVersionRecord.version, TableVersionRecord.modified_at).where(
+        TableVersionRecord.name == name
+    )
+    row = (await session.exec(statement)).first()
+    return TableVersion(*row) if row is not None else TableVersion()
+
+
+async def get_character_version(session: AsyncSession) -> TableVersion:
+    """读取角色表的当前版本，列表、分页、排行榜和本地搜索的 ETag 由它决定"""
+    return await get_table_version(session, Character.__tablename__)
@@ -0,0 +1,62 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SavedCharacter:
+    """一次角色写入事件"""
+    row: Dict[str, Any]
+    status: Optional[str] = None  # created / updated，未知时为 None
+    alternative: List[str] = field(default_factory=list)
+
+
+SavedListener = Callable[[List[SavedCharacter]], None]
+FetchedListener = Callable[[List[Dict[str, Any]]], None]
+
+_saved_listeners: List[SavedListener] = []
+_fetched_listeners: List[FetchedListener] = []
+
+
+def on_characters_saved(listener: SavedListener) -> SavedListener:
+    """注册角色写入事件的监听函数（可用作装饰器）"""
+    _saved_listeners.append(listener)
+    return listener
+
+
+def notify_characters_saved(saved: List[SavedCharacter]) -> None:
+    """
+    通知所有监听者角色已写入数据库（单条保存、批量保存等所有写路径都应调用）
+
+    监听函数出错只记录日志，不影响写入结果。
+    """
+    if not saved:
+        return
+    for listener in _saved_listeners:
+        try:
+            listener(saved)
+        except Exception as e:
+            logger.error(f"角色写入事件处理失败: {listener.__name__} {e}", exc_info=True)
+
+
+def on_characters_fetched(listener: FetchedListener) -> FetchedListener:
+    """注册 AniList 返回角色事件的监听函数（可用作装饰器）"""
+    _fetched_listeners.append(listener)
+    return listener
+
+
+def notify_characters_fetched(characters: List[Dict[str, Any]]) -> None:
+    """
+    通知所有监听者从 AniList 取到了角色（原始 GraphQL 结构）
+
+    监听函数出错只记录日志，不影响搜索结果。
+    """
+    if not characters:
+        return
+    for listener in _fetched_listeners:
+        try:
+            listener(characters)
+        except Exception as e:
+            logger.error(f"角色获取事件处理失败: {listener.__name__} {e}", exc_info=True)
@@ -0,0 +1,37 @@
+from typing import Optional
+
+
+class AniListError(Exception):
+    """AniList 上游请求失败"""
+
+
+class AniListUnavailableError(AniListError):
+    """AniList 暂时不可用（限流、排队超时等），接口应返回 503"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AniListTimeoutError(AniListUnavailableError):
+    """AniList 请求在截止时间内没有完成（包括重试）"""
+
+
+class CircuitOpenError(AniListUnavailableError):
+    """熔断器打开，请求没有发往 AniList"""
+
+
+class WriteBehindBacklogError(Exception):
+    """写后缓冲积压已满且数据库写入失败；角色仍在缓冲里，之后会自动写入，接口应返回 503"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ImageProxyError(Exception):
+    """图片代理无法返回图片（地址不允许、源站出错等），status_code 是接口应返回的状态码"""
+
+    def __init__(self, message: str, status_code: int = 502):
+        super().__init__(message)
+        self.status_code = status_code
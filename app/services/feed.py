@@ -0,0 +1,243 @@
+import asyncio
+import json
+import logging
+import secrets
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.services.events import SavedCharacter, on_characters_saved
+
+logger = logging.getLogger(__name__)
+
+# 写入状态 -> 事件类型（状态未知时为 upsert）
+EVENT_TYPES = {'created': 'insert', 'updated': 'update', None: 'upsert'}
+
+
+@dataclass
+class FeedEvent:
+    """一条变更事件，SSE 帧和 JSON 文本在发布时各编码一次，所有订阅者共用"""
+    seq: int
+    id: str
+    type: str
+    data: str
+    frame: bytes
+
+
+@dataclass
+class FeedBatch:
+    """一次写入产生的一批事件（订阅者队列里的一项）"""
+    events: List[FeedEvent]
+    frames: bytes
+
+
+def sse_frame(event: str, data: str, event_id: Optional[str] = None) -> bytes:
+    """编码一条 SSE 消息"""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {data}\n\n".encode('utf-8')
+
+
+class FeedSubscriber:
+    """
+    一个订阅者的有界队列
+
+    队列按批计数，超过 max_batches 说明客户端读得太慢：丢弃排队的数据并标记 overflowed，
+    由连接层发送 overflow 事件后断开，客户端带着最后收到的事件 id 重连，从历史里补齐。
+    """
+
+    def __init__(self, max_batches: int):
+        self.max_batches = max(1, max_batches)
+        self._queue: Deque[FeedBatch] = deque()
+        self._ready = asyncio.Event()
+        self.overflowed = False
+        self.closed = False
+        self.last_seq = 0
+
+    def push(self, batch: FeedBatch) -> None:
+        if self.overflowed or self.closed:
+            return
+        if len(self._queue) >= self.max_batches:
+            self._queue.clear()
+            self.overflowed = True
+        else:
+            self._queue.append(batch)
+        self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def get(self, timeout: Optional[float] = None) -> List[FeedBatch]:
+        """
+        等待并取出队列里的全部批次
+
+        Args:
+            timeout: 最长等待秒数，超时返回空列表（用于发送心跳）
+
+        Returns:
+            批次列表；溢出或已关闭时返回空列表，调用方检查 overflowed / closed
+        """
+        if not self._queue and not (self.overflowed or self.closed):
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._ready.clear()
+        if self.overflowed:
+            return []
+        batches = list(self._queue)
+        self._queue.clear()
+        if batches:
+            self.last_seq = batches[-1].events[-1].seq
+        return batches
+
+
+class ChangeFeed:
+    """
+    已保存角色的变更推送
+
+    所有写路径都会发出角色写入事件，这里把每次写入编码成一批事件，保存在最近 history 条的
+    环形缓冲里，并放进每个订阅者的队列。事件 id 是 "<启动随机串>-<序号>"，
+    客户端用最后收到的 id 重连即可续传；id 来自重启前的进程或已经滚出历史时，
+    先收到一条 reset 事件，需要重新全量加载。
+    """
+
+    def __init__(self, history: int = 1000, queue_size: int = 256, max_subscribers: int = 1000):
+        self.nonce = secrets.token_hex(4)
+        self.seq = 0
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._history: Deque[FeedEvent] = deque(maxlen=max(1, history))
+        self._subscribers: Set[FeedSubscriber] = set()
+        self.closed = False
+
+        # 统计
+        self.published = 0
+        self.overflows = 0
+
+    def publish(self, saved: List[SavedCharacter]) -> None:
+        """把一次写入编码为事件并分发给所有订阅者"""
+        events = []
+        for item in saved:
+            self.seq += 1
+            event_id = f"{self.nonce}-{self.seq}"
+            event_type = EVENT_TYPES.get(item.status, 'upsert')
+            data = json.dumps(
+                {'seq': self.seq, 'id': event_id, 'type': event_type, 'character': item.row},
+                ensure_ascii=False, separators=(',', ':'), default=str
+            )
+            events.append(FeedEvent(self.seq, event_id, event_type, data, sse_frame(event_type, data, event_id)))
+        if not events:
+            return
+        self._history.extend(events)
+        self.published += len(events)
+
+        batch = FeedBatch(events, b''.join(event.frame for event in events))
+        for subscriber in self._subscribers:
+            was_overflowed = subscriber.overflowed
+            subscriber.push(batch)
+            if subscriber.overflowed and not was_overflowed:
+                self.overflows += 1
+
+    def parse_cursor(self, cursor: Optional[str]) -> Optional[int]:
+        """
+        解析客户端的续传位置
+
+        Args:
+            cursor: Last-Event-ID 或 since 参数（"<随机串>-<序号>"，或当前进程的纯序号）
+
+        Returns:
+            序号；格式不对或来自其他进程时返回 -1（需要重新加载），没有传时返回 None
+        """
+        if cursor is None or cursor == '':
+            return None
+        nonce, _, seq = cursor.rpartition('-')
+        if (nonce and nonce != self.nonce) or not seq.isdigit():
+            return -1
+        seq = int(seq)
+        return seq if seq <= self.seq else -1
+
+    def subscribe(self, since: Optional[int] = None) -> Tuple[FeedSubscriber, List[FeedEvent], bool]:
+        """
+        注册订阅者
+
+        Args:
+            since: 已收到的最后一个序号（parse_cursor 的结果），None 表示只要新事件
+
+        Returns:
+            (订阅者, 需要补发的历史事件, 是否需要客户端重新全量加载)
+        """
+        if self.closed:
+            raise RuntimeError("变更推送已关闭")
+        if len(self._subscribers) >= self.max_subscribers:
+            raise OverflowError(f"订阅者已达上限 {self.max_subscribers}")
+
+        backlog: List[FeedEvent] = []
+        reset = False
+        if since is not None:
+            oldest = self._history[0].seq if self._history else self.seq + 1
+            if since < 0 or since < oldest - 1:
+                reset = True
+            else:
+                backlog = [event for event in self._history if event.seq > since]
+
+        subscriber = FeedSubscriber(self.queue_size)
+        subscriber.last_seq = backlog[-1].seq if backlog else (since if since and since > 0 else self.seq)
+        self._subscribers.add(subscriber)
+        return subscriber, backlog, reset
+
+    def unsubscribe(self, subscriber: FeedSubscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def close(self) -> None:
+        """关闭所有连接（应用关闭时调用）"""
+        self.closed = True
+        for subscriber in self._subscribers:
+            subscriber.close()
+        self._subscribers.clear()
+
+    @property
+    def last_event_id(self) -> str:
+        return f"{self.nonce}-{self.seq}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'subscribers': len(self._subscribers),
+            'seq': self.seq,
+            'last_event_id': self.last_event_id,
+            'history': len(self._history),
+            'published': self.published,
+            'overflows': self.overflows,
+        }
+
+
+# 变更推送（第一次使用时创建）
+_change_feed: Optional[ChangeFeed] = None
+
+
+def get_change_feed() -> ChangeFeed:
+    """获取变更推送单例"""
+    global _change_feed
+    if _change_feed is None:
+        _change_feed = ChangeFeed(
+            history=settings.feed_history,
+            queue_size=settings.feed_queue_size,
+            max_subscribers=settings.feed_max_subscribers,
+        )
+    return _change_feed
+
+
+def close_change_feed() -> None:
+    """断开所有订阅者，让流式响应结束"""
+    global _change_feed
+    if _change_feed is not None:
+        _change_feed.close()
+        _change_feed = None
+
+
+@on_characters_saved
+def _publish_saved(saved: List[SavedCharacter]) -> None:
+    """角色写入后推送给订阅者（没有订阅者时只记录历史）"""
+    if settings.feed_enabled:
+        get_change_feed().publish(saved)
@@ -0,0 +1,394 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.config import settings
+from app.services.exceptions import ImageProxyError
+from app.services.singleflight import SingleFlight
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 在 requirements.txt 里；没有安装时不生成缩略图、直接返回原图，启动时记录警告
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# 下载和写盘的块大小
+CHUNK_SIZE = 64 * 1024
+# 缩略图格式（WebP 支持透明通道，体积比 JPEG 小）
+THUMBNAIL_FORMAT = 'WEBP'
+THUMBNAIL_CONTENT_TYPE = 'image/webp'
+# 只代理位图：SVG 等类型可能带脚本，不能从本站的源返回
+RASTER_CONTENT_TYPES = frozenset({'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/avif'})
+
+
+@dataclass
+class CachedImage:
+    """磁盘缓存里的一张图片"""
+    path: str
+    content_type: str
+    etag: str
+    size: int
+
+
+def thumbnails_available() -> bool:
+    """是否能生成缩略图（安装了 Pillow）"""
+    return Image is not None
+
+
+def _make_thumbnail(source: str, target: str, width: int) -> None:
+    """按宽度等比缩小（不放大），编码为 WebP 写入 target（在线程池里执行）"""
+    with Image.open(source) as image:
+        # JPEG 可以在解码时直接按 1/2、1/4、1/8 缩小，大图省很多时间
+        image.draft('RGB', (width, width * 4))
+        image.thumbnail((width, width * 4))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+        # method=0 编码最快（比默认的 4 快约 5 倍），缩略图体积只大几个百分点
+        image.save(target, format=THUMBNAIL_FORMAT, quality=80, method=0)
+
+
+class ImageCache:
+    """
+    角色图片的磁盘缓存（按内容寻址，按总字节数 LRU 淘汰）
+
+    原图按内容的 sha256 存放在 blobs/ 下，同一张图片不同地址只存一份；urls/ 下的小文件
+    记录地址 -> (内容摘要, Content-Type)，重启后不用重新下载。缩略图第一次请求时由原图生成，
+    存放在 thumbs/ 下。原图和缩略图一起按最近访问顺序计入 max_bytes，超过后淘汰最久未用的。
+
+    每个地址只下载一次（并发请求合并），只代理 allowed_hosts 里的主机，不跟随重定向。
+    下载边读边写临时文件并计算摘要，完成后原子改名，不会把整张图片放在内存里。
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int = 512 * 1024 * 1024,
+        max_image_bytes: int = 10 * 1024 * 1024,
+        allowed_hosts: Optional[List[str]] = None,
+        thumbnail_sizes: Optional[List[int]] = None,
+        timeout: float = 10.0,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_image_bytes = max_image_bytes
+        self.allowed_hosts = {host.lower() for host in (allowed_hosts or [])}
+        self.thumbnail_sizes = set(thumbnail_sizes or [])
+        self.timeout = timeout
+        # 相对路径 -> 字节数，按访问顺序排列（开头最久未用）
+        self._index: 'OrderedDict[str, int]' = OrderedDict()
+        self._bytes = 0
+        # 地址摘要 -> (内容摘要, Content-Type)；内容摘要 -> 指向它的地址摘要
+        self._urls: Dict[str, Tuple[str, str]] = {}
+        self._blob_urls: Dict[str, Set[str]] = {}
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self._flight = SingleFlight()
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # 统计
+        self.hits = 0
+        self.thumbnail_hits = 0
+        self.downloads = 0
+        self.thumbnails = 0
+        self.evictions = 0
+
+    # ---- 路径 ----
+
+    @staticmethod
+    def _blob(digest: str) -> str:
+        return os.path.join('blobs', digest[:2], digest)
+
+    @staticmethod
+    def _thumb(digest: str, width: int) -> str:
+        return os.path.join('thumbs', digest[:2], f"{digest}-{width}.webp")
+
+    @staticmethod
+    def _url_file(url_key: str) -> str:
+        return os.path.join('urls', url_key[:2], url_key)
+
+    def _abs(self, relative: str) -> str:
+        return os.path.join(self.root, relative)
+
+    # ---- 索引 ----
+
+    def _scan(self) -> Tuple[List[Tuple[float, str, int]], Dict[str, Tuple[str, str]]]:
+        """扫描缓存目录（在线程池里执行），返回按修改时间排序的文件和地址映射"""
+        files = []
+        for kind in ('blobs', 'thumbs'):
+            for directory, _, names in os.walk(os.path.join(self.root, kind)):
+                for name in names:
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, os.path.relpath(path, self.root), stat.st_size))
+        files.sort()
+
+        urls = {}
+        for directory, _, names in os.walk(os.path.join(self.root, 'urls')):
+            for name in names:
+                try:
+                    with open(os.path.join(directory, name), encoding='utf-8') as f:
+                        digest, content_type = f.read().split()
+                except (OSError, ValueError):
+                    continue
+                urls[name] = (digest, content_type)
+        # 残留的临时文件（下载中途进程退出）
+        tmp = os.path.join(self.root, 'tmp')
+        if os.path.isdir(tmp):
+            for name in os.listdir(tmp):
+                try:
+                    os.unlink(os.path.join(tmp, name))
+                except OSError:
+                    pass
+        return files, urls
+
+    async def ensure_loaded(self) -> None:
+        """第一次使用时扫描已有的缓存文件，重建索引（按修改时间近似最近访问顺序）"""
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            for kind in ('blobs', 'thumbs', 'urls', 'tmp'):
+                os.makedirs(os.path.join(self.root, kind), exist_ok=True)
+            files, urls = await asyncio.to_thread(self._scan)
+            for _, relative, size in files:
+                self._index[relative] = size
+                self._bytes += size
+            for url_key, (digest, content_type) in urls.items():
+                # 旧版本缓存的非位图地址不再使用（原图之后按 LRU 淘汰）
+                if content_type in RASTER_CONTENT_TYPES:
+                    self._remember_url(url_key, digest, content_type)
+            self._loaded = True
+            self._evict()
+
+    def _remember_url(self, url_key: str, digest: str, content_type: str) -> None:
+        self._urls[url_key] = (digest, content_type)
+        self._blob_urls.setdefault(digest, set()).add(url_key)
+
+    def _touch(self, relative: str) -> bool:
+        """标记为最近使用；文件已被淘汰时返回 False"""
+        if relative not in self._index:
+            return False
+        self._index.move_to_end(relative)
+        return True
+
+    def _add(self, relative: str, size: int) -> None:
+        old = self._index.pop(relative, None)
+        if old is not None:
+            self._bytes -= old
+        self._index[relative] = size
+        self._bytes += size
+        self._evict(keep=relative)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """淘汰最久未用的文件，直到总大小不超过 max_bytes（刚写入的文件保留）"""
+        while self._bytes > self.max_bytes and self._index:
+            relative, size = next(iter(self._index.items()))
+            if relative == keep:
+                if len(self._index) == 1:
+                    break
+                self._index.move_to_end(relative)
+                continue
+            del self._index[relative]
+            self._bytes -= size
+            self.evictions += 1
+            try:
+                os.unlink(self._abs(relative))
+            except FileNotFoundError:
+                pass
+            if relative.startswith('blobs'):
+                # 原图没了，指向它的地址映射也删掉（下次请求重新下载）
+                digest = os.path.basename(relative)
+                for url_key in self._blob_urls.pop(digest, set()):
+                    self._urls.pop(url_key, None)
+                    try:
+                        os.unlink(self._abs(self._url_file(url_key)))
+                    except FileNotFoundError:
+                        pass
+
+    # ---- 对外接口 ----
+
+    def check_url(self, url: str) -> None:
+        """只允许 http(s) 和白名单里的主机"""
+        try:
+            parts = urlsplit(url)
+            host = (parts.hostname or '').lower()
+        except ValueError:
+            raise ImageProxyError("图片地址格式不正确", 400)
+        if parts.scheme not in ('http', 'https') or not host:
+            raise ImageProxyError("图片地址格式不正确", 400)
+        if host not in self.allowed_hosts:
+            raise ImageProxyError(f"不允许代理该主机的图片: {host}", 403)
+
+    async def get(self, url: str, width: Optional[int] = None) -> CachedImage:
+        """
+        取得图片（需要时下载原图、生成缩略图）
+
+        Args:
+            url: 源站图片地址
+            width: 缩略图宽度（必须在 thumbnail_sizes 里），None 返回原图；未安装 Pillow 时忽略
+
+        Returns:
+            磁盘上的图片文件
+        """
+        self.check_url(url)
+        if width is not None and width not in self.thumbnail_sizes:
+            sizes = ', '.join(str(size) for size in sorted(self.thumbnail_sizes))
+            raise ImageProxyError(f"不支持的缩略图宽度: {width}（可选: {sizes}）", 400)
+        await self.ensure_loaded()
+
+        digest, content_type = await self._original(url)
+        if width is None or Image is None:
+            relative = self._blob(digest)
+            return CachedImage(self._abs(relative), content_type, f'"{digest[:32]}"', self._index.get(relative, 0))
+
+        relative = self._thumb(digest, width)
+        if self._touch(relative):
+            self.thumbnail_hits += 1
+        else:
+            try:
+                await self._flight.do(('thumb', digest, width), lambda: self._create_thumbnail(digest, width))
+            except Exception as e:
+                # 源站返回的内容 Pillow 无法解码：返回原图
+                logger.warning(f"缩略图生成失败，返回原图 {url}: {e}")
+                relative = self._blob(digest)
+                return CachedImage(self._abs(relative), content_type, f'"{digest[:32]}"', self._index.get(relative, 0))
+        return CachedImage(
+            self._abs(relative), THUMBNAIL_CONTENT_TYPE, f'"{digest[:32]}-{width}"', self._index.get(relative, 0)
+        )
+
+    async def _original(self, url: str) -> Tuple[str, str]:
+        """返回原图的 (内容摘要, Content-Type)，没有缓存时下载"""
+        url_key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        known = self._urls.get(url_key)
+        if known is not None and self._touch(self._blob(known[0])):
+            self.hits += 1
+            return known
+        return await self._flight.do(('url', url_key), lambda: self._download(url, url_key))
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, follow_redirects=False)
+        return self._client
+
+    async def _download(self, url: str, url_key: str) -> Tuple[str, str]:
+        """流式下载到临时文件，边写边算摘要，完成后改名为内容寻址的路径"""
+        try:
+            async with self._http().stream('GET', url) as response:
+                if response.status_code != 200:
+                    raise ImageProxyError(f"源站返回 HTTP {response.status_code}", 404 if response.status_code == 404 else 502)
+                content_type = response.headers.get('content-type', '').split(';')[0].strip().lower()
+                if content_type not in RASTER_CONTENT_TYPES:
+                    raise ImageProxyError(f"源站返回的不是支持的图片类型: {content_type or '未知类型'}")
+                length = response.headers.get('content-length')
+                if length and length.isdigit() and int(length) > self.max_image_bytes:
+                    raise ImageProxyError("图片过大")
+
+                fd, tmp = tempfile.mkstemp(dir=self._abs('tmp'))
+                hasher = hashlib.sha256()
+                size = 0
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                            size += len(chunk)
+                            if size > self.max_image_bytes:
+                                raise ImageProxyError("图片过大")
+                            hasher.update(chunk)
+                            f.write(chunk)
+                    digest = hasher.hexdigest()
+                    relative = self._blob(digest)
+                    os.makedirs(os.path.dirname(self._abs(relative)), exist_ok=True)
+                    os.replace(tmp, self._abs(relative))
+                except BaseException:
+                    try:
+                        os.unlink(tmp)
+                    except FileNotFoundError:
+                        pass
+                    raise
+        except httpx.HTTPError as e:
+            raise ImageProxyError(f"下载图片失败: {e}")
+
+        self.downloads += 1
+        url_file = self._abs(self._url_file(url_key))
+        os.makedirs(os.path.dirname(url_file), exist_ok=True)
+        with open(url_file, 'w', encoding='utf-8') as f:
+            f.write(f"{digest} {content_type}")
+        self._remember_url(url_key, digest, content_type)
+        self._add(relative, size)
+        return digest, content_type
+
+    async def _create_thumbnail(self, digest: str, width: int) -> None:
+        relative = self._thumb(digest, width)
+        target = self._abs(relative)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self._abs('tmp'))
+        os.close(fd)
+        try:
+            await asyncio.to_thread(_make_thumbnail, self._abs(self._blob(digest)), tmp, width)
+            os.replace(tmp, target)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        self.thumbnails += 1
+        self._add(relative, os.path.getsize(target))
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'files': len(self._index),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'urls': len(self._urls),
+            'hits': self.hits,
+            'thumbnail_hits': self.thumbnail_hits,
+            'downloads': self.downloads,
+            'thumbnails': self.thumbnails,
+            'evictions': self.evictions,
+            'thumbnails_available': thumbnails_available(),
+        }
+
+
+# 图片缓存（第一次使用时创建，由 lifespan 关闭）
+_image_cache: Optional[ImageCache] = None
+
+
+def get_image_cache() -> ImageCache:
+    """获取图片缓存单例"""
+    global _image_cache
+    if _image_cache is None:
+        _image_cache = ImageCache(
+            settings.image_cache_dir,
+            max_bytes=settings.image_cache_max_bytes,
+            max_image_bytes=settings.image_max_bytes,
+            allowed_hosts=settings.image_proxy_hosts,
+            thumbnail_sizes=settings.image_thumbnail_sizes,
+            timeout=settings.image_fetch_timeout,
+        )
+    return _image_cache
+
+
+async def close_image_cache() -> None:
+    """关闭下载图片用的 HTTP 客户端"""
+    global _image_cache
+    if _image_cache is not None:
+        cache, _image_cache = _image_cache, None
+        await cache.close()
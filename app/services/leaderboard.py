@@ -0,0 +1,258 @@
+import asyncio
+import bisect
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import ColumnElement, and_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.models import Character
+from app.services.events import SavedCharacter, on_characters_saved
+
+# 排行榜缓存的列（description 是大字段，不缓存）
+LEADERBOARD_COLUMNS = [name for name in Character.__table__.columns.keys() if name != 'description']
+
+
+def rank_key(row: Dict[str, Any]) -> Tuple[bool, int, int]:
+    """排行顺序：收藏数降序、同收藏数 id 降序，收藏数为 NULL 的排在最后（与数据库的 DESC 排序一致）"""
+    favourites = row.get('favourites')
+    return (favourites is not None, favourites or 0, row['id'])
+
+
+def escape_like(prefix: str, escape: str = '/') -> str:
+    """转义 LIKE 通配符，得到“以 prefix 开头”的模式（模式作为一个绑定参数，SQLite 才能用索引）"""
+    for char in (escape, '%', '_'):
+        prefix = prefix.replace(char, escape + char)
+    return prefix + '%'
+
+
+def top_filters(gender: Optional[str], prefix: Optional[str], dialect_name: str) -> List[ColumnElement]:
+    """排行榜的筛选条件（性别不区分大小写：SQLite 比较时指定 NOCASE，其他数据库取决于排序规则）"""
+    conditions = []
+    if gender:
+        column = Character.gender.collate('NOCASE') if dialect_name == 'sqlite' else Character.gender
+        conditions.append(column == gender)
+    if prefix:
+        conditions.append(Character.name_full.like(escape_like(prefix), escape='/'))
+    return conditions
+
+
+async def query_top(
+    session: AsyncSession,
+    limit: int,
+    gender: Optional[str] = None,
+    prefix: Optional[str] = None,
+    columns: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    用索引查询收藏数前 limit 的角色
+
+    (favourites, id) 和 (gender, favourites, id) 索引按顺序读取，读到 limit 行就停，
+    不需要排序整张表；名字前缀走 name_full 索引的范围扫描。
+
+    Args:
+        session: 数据库会话
+        limit: 返回数量
+        gender: 只返回这个性别（不区分大小写，取决于数据库排序规则）
+        prefix: 名字以此开头（不区分大小写，取决于数据库排序规则）
+        columns: 返回的列，默认 LEADERBOARD_COLUMNS
+
+    Returns:
+        行列表，按收藏数降序
+    """
+    columns = columns or LEADERBOARD_COLUMNS
+    statement = select(*[getattr(Character, name) for name in columns])
+    conditions = top_filters(gender, prefix, session.bind.dialect.name)
+    if conditions:
+        statement = statement.where(and_(*conditions))
+    statement = statement.order_by(Character.favourites.desc(), Character.id.desc()).limit(limit)
+    rows = (await session.exec(statement)).all()
+    return [dict(zip(columns, row)) for row in rows]
+
+
+class Leaderboard:
+    """
+    内存中的收藏数排行榜（前 size 名）
+
+    第一次使用时用索引查询加载，之后由角色写入事件增量维护：新角色或收藏数变化的角色
+    按排序键二分插入，超过 size 的截掉。榜上角色的收藏数下降到其余角色之下时，
+    无法知道榜外谁应该补上，就把它移出，榜单深度减一（仍然是精确的前 N 名）。
+
+    因为榜单是全表的前 N 名，按性别或名字前缀筛选榜单得到的也是对应筛选条件下的精确前几名；
+    筛选后不足请求数量、且榜单不是全表时返回 None，由调用方查询数据库。深度降到 size / 2
+    以下或超过 ttl 秒时重新加载。
+
+    榜单记录加载时角色表的版本号，本进程的每次写入事务（一次写入事件）把它加一；
+    请求时数据库里的版本号与之不同，说明有其他进程直接写了库，重新加载。
+    """
+
+    def __init__(self, size: int = 200, ttl: float = 300, clock=time.monotonic):
+        self.size = max(1, size)
+        self.ttl = ttl
+        self._clock = clock
+        self._keys: List[Tuple[bool, int, int]] = []  # 升序，末尾是第一名
+        self._rows: Dict[int, Dict[str, Any]] = {}
+        self._complete = False  # 榜单是否包含了全表（表里不足 size 行）
+        self._loaded_at: Optional[float] = None
+        self.version: Optional[int] = None  # 榜单对应的角色表版本
+        self._loading: Optional[asyncio.Future] = None
+        self._pending: List[Dict[str, Any]] = []  # 加载期间收到的写入
+
+        # 统计
+        self.loads = 0
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def _stale(self, version: Optional[int] = None) -> bool:
+        if self._loaded_at is None:
+            return True
+        if version is not None and version != self.version:
+            return True
+        if self.ttl and self._clock() - self._loaded_at >= self.ttl:
+            return True
+        return not self._complete and len(self._keys) < self.size // 2
+
+    async def ensure_loaded(self, session: AsyncSession, version: Optional[int] = None) -> None:
+        """
+        未加载、已过期、深度太浅或与数据库版本不一致时重新加载（并发请求只加载一次）
+
+        Args:
+            session: 数据库会话
+            version: 查询前读到的角色表版本号（None 表示不比较版本）
+        """
+        if not self._stale(version):
+            return
+        if self._loading is not None:
+            await asyncio.shield(self._loading)
+            return
+        loading = self._loading = asyncio.get_running_loop().create_future()
+        self._pending = []
+        try:
+            rows = await query_top(session, self.size)
+        except BaseException as e:
+            self._loading = None
+            loading.set_exception(e)
+            loading.exception()  # 已在这里处理，避免“未获取的异常”警告
+            raise
+        self._loading = None
+
+        self._keys = [rank_key(row) for row in reversed(rows)]
+        self._rows = {row['id']: row for row in rows}
+        self._complete = len(rows) < self.size
+        self._loaded_at = self._clock()
+        # 版本号在查询前读取：查询期间的写入会让下一次请求再加载一次，不会漏掉
+        self.version = version
+        self.loads += 1
+        # 查询期间收到的写入（都是整行的最新状态，重复应用没有影响）
+        pending, self._pending = self._pending, []
+        for row in pending:
+            self.apply(row)
+        loading.set_result(None)
+
+    def apply(self, row: Dict[str, Any]) -> None:
+        """把一次写入合并进榜单"""
+        if self._loading is not None:
+            self._pending.append(row)
+            return
+        if not self.loaded:
+            return
+        row = {name: row.get(name) for name in LEADERBOARD_COLUMNS}
+        key = rank_key(row)
+        old = self._rows.pop(row['id'], None)
+        if old is not None:
+            del self._keys[bisect.bisect_left(self._keys, rank_key(old))]
+        if not self._complete and (not self._keys or key < self._keys[0]):
+            # 排在榜单末尾之下：榜外可能有更靠前的角色，不能放进榜单（原来在榜上的就此移出）
+            if old is not None:
+                self.updates += 1
+            return
+
+        bisect.insort(self._keys, key)
+        self._rows[row['id']] = row
+        self.updates += 1
+        if len(self._keys) > self.size:
+            dropped = self._keys.pop(0)
+            del self._rows[dropped[2]]
+            self._complete = False
+
+    def committed(self) -> None:
+        """本进程的一个写入事务已提交（数据库里的版本号加了一）"""
+        if self.version is not None:
+            self.version += 1
+
+    def top(self, limit: int, gender: Optional[str] = None, prefix: Optional[str] = None) -> Optional[List[Dict]]:
+        """
+        从榜单取前 limit 名
+
+        Args:
+            limit: 返回数量
+            gender: 只返回这个性别（不区分大小写，与数据库查询一致）
+            prefix: 名字以此开头（不区分大小写）
+
+        Returns:
+            行列表；榜单里满足条件的不足 limit 个且榜单不是全表时返回 None
+        """
+        if not self.loaded:
+            return None
+        folded = prefix.casefold() if prefix else None
+        folded_gender = gender.casefold() if gender else None
+        result = []
+        for key in reversed(self._keys):
+            row = self._rows[key[2]]
+            if folded_gender and (row['gender'] or '').casefold() != folded_gender:
+                continue
+            if folded and not (row['name_full'] or '').casefold().startswith(folded):
+                continue
+            result.append(row)
+            if len(result) >= limit:
+                break
+        if len(result) < limit and not self._complete:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'size': self.size,
+            'depth': len(self._keys),
+            'version': self.version,
+            'complete': self._complete,
+            'loads': self.loads,
+            'hits': self.hits,
+            'misses': self.misses,
+            'updates': self.updates,
+        }
+
+
+# 排行榜缓存（第一次使用时创建）
+_leaderboard: Optional[Leaderboard] = None
+
+
+def get_leaderboard() -> Leaderboard:
+    """获取排行榜缓存单例"""
+    global _leaderboard
+    if _leaderboard is None:
+        _leaderboard = Leaderboard(size=settings.leaderboard_size, ttl=settings.leaderboard_ttl)
+    return _leaderboard
+
+
+@on_characters_saved
+def _update_leaderboard(saved: List[SavedCharacter]) -> None:
+    """角色写入后增量更新排行榜"""
+    if _leaderboard is None:
+        return
+    for item in saved:
+        _leaderboard.apply(item.row)
+    # 每个写入事件对应一个提交的事务，版本号同步加一，本进程自己的写入不会触发重新加载
+    _leaderboard.committed()
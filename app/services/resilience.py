@@ -0,0 +1,120 @@
+import math
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+from app.services.exceptions import CircuitOpenError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    上游熔断器
+
+    - closed：正常放行，连续失败（超时、连接错误、5xx）达到 failure_threshold 次后打开
+    - open：直接失败，不再等待上游；reset_timeout 秒后进入 half_open
+    - half_open：只放行一个探测请求，成功则关闭，失败则重新打开
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+        # 统计计数器
+        self.opened = 0
+        self.rejected = 0
+
+    def retry_after(self) -> float:
+        """距离允许探测请求的秒数"""
+        return max(0.0, self.opened_at + self.reset_timeout - self._clock())
+
+    def before_call(self) -> None:
+        """
+        请求上游之前调用
+
+        Raises:
+            CircuitOpenError: 熔断器打开，或半开状态下已有探测请求在进行
+        """
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                self.rejected += 1
+                raise CircuitOpenError("AniList 连续失败，熔断中", retry_after=self.retry_after())
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN:
+            if self._probing:
+                self.rejected += 1
+                raise CircuitOpenError("AniList 熔断恢复中，等待探测请求结果", retry_after=1.0)
+            self._probing = True
+
+    def record_success(self) -> None:
+        """上游正常返回"""
+        self.failures = 0
+        self.state = CLOSED
+        self._probing = False
+
+    def record_failure(self) -> None:
+        """上游超时、连接失败或返回 5xx"""
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opened += 1
+            self.state = OPEN
+            self.opened_at = self._clock()
+            self._probing = False
+
+    def release(self) -> None:
+        """请求既不算成功也不算失败（例如被取消）时释放探测名额"""
+        self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        """返回熔断器状态"""
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'opened': self.opened,
+            'rejected': self.rejected,
+            'retry_after': round(self.retry_after(), 3) if self.state == OPEN else 0.0,
+        }
+
+
+class LatencyTracker:
+    """最近 window 次上游请求的延迟，用于计算对冲请求的等待时间"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+
+        # 对冲统计：发出的对冲请求数、对冲请求先返回的次数
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """延迟的 q 分位数，样本不足时返回 None"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+    def stats(self) -> Dict[str, Any]:
+        """返回延迟统计（毫秒）"""
+        p50 = self.quantile(0.5)
+        p95 = self.quantile(0.95)
+        return {
+            'samples': len(self._samples),
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'hedged': self.hedged,
+            'hedge_wins': self.hedge_wins,
+        }
@@ -0,0 +1,193 @@
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from app.services.exceptions import AniListUnavailableError
+
+# 优先级：数值越小越先执行
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+
+def parse_retry_after(value: Optional[str], now: Optional[datetime] = None) -> Optional[float]:
+    """解析 Retry-After 头（秒数或 HTTP 日期），返回需要等待的秒数"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (when - now).total_seconds())
+
+
+class UpstreamScheduler:
+    """
+    AniList 上游请求调度器
+
+    - 令牌桶：容量和补充速率取配置的 rate_limit 与 X-RateLimit-Limit（每分钟）中较小的一个，
+      剩余额度以 X-RateLimit-Remaining 校准
+    - 优先级队列：交互式搜索优先于后台任务
+    - 收到 429 时按 Retry-After 暂停发放令牌
+    - 等待超过 max_wait 直接失败（AniListUnavailableError → 503）
+    """
+
+    def __init__(self, rate_limit: int, max_wait: float, clock: Callable[[], float] = time.monotonic):
+        # 配置的每分钟上限：上游声明的额度更大时也不超过它
+        self.limit = rate_limit
+        self.capacity = float(rate_limit)
+        self.rate = rate_limit / 60.0
+        self.tokens = self.capacity
+        self.max_wait = max_wait
+        self.blocked_until = 0.0
+        self._clock = clock
+        self._updated = clock()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        # 统计计数器
+        self.granted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.throttled = 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self._updated = now
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE, max_wait: Optional[float] = None) -> None:
+        """
+        获取一次上游请求的令牌
+
+        Args:
+            priority: 请求优先级，数值越小越优先
+            max_wait: 最长等待秒数，默认使用 self.max_wait
+
+        Raises:
+            AniListUnavailableError: 预计或实际等待超过 max_wait
+        """
+        if max_wait is None:
+            max_wait = self.max_wait
+        now = self._clock()
+        self._refill(now)
+
+        blocked_for = self.blocked_until - now
+        if blocked_for > max_wait:
+            # Retry-After 超出可等待时间，直接失败
+            self.rejected += 1
+            raise AniListUnavailableError("AniList 限流中，请稍后重试", retry_after=blocked_for)
+
+        if not self._waiters and blocked_for <= 0 and self.tokens >= 1:
+            self.tokens -= 1
+            self.granted += 1
+            return
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self.queued += 1
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise AniListUnavailableError("AniList 请求排队超时", retry_after=self._next_available_in())
+
+    def try_acquire(self) -> bool:
+        """不等待地获取一个令牌（没有排队者且有剩余令牌时），用于可有可无的请求"""
+        now = self._clock()
+        self._refill(now)
+        if self._waiters or now < self.blocked_until or self.tokens < 1:
+            return False
+        self.tokens -= 1
+        self.granted += 1
+        return True
+
+    def _next_available_in(self) -> float:
+        """距离下一个令牌可用的秒数"""
+        now = self._clock()
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1 and self.rate > 0:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def _dispatch(self) -> None:
+        """按优先级把可用令牌发给等待者，令牌不足时定时再次调度"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        now = self._clock()
+        self._refill(now)
+        while self._waiters:
+            _, _, future = self._waiters[0]
+            if future.done():
+                # 等待者已超时或被取消
+                heapq.heappop(self._waiters)
+                continue
+            if now < self.blocked_until or self.tokens < 1:
+                break
+            heapq.heappop(self._waiters)
+            self.tokens -= 1
+            self.granted += 1
+            future.set_result(None)
+
+        if self._waiters:
+            loop = self._waiters[0][2].get_loop()
+            self._timer = loop.call_later(max(self._next_available_in(), 0.001), self._dispatch)
+
+    def update(self, status_code: int, headers: Mapping[str, str]) -> None:
+        """
+        根据上游响应头校准令牌桶
+
+        Args:
+            status_code: 响应状态码
+            headers: 响应头
+        """
+        now = self._clock()
+        self._refill(now)
+
+        limit = headers.get('X-RateLimit-Limit')
+        if limit and limit.isdigit() and int(limit) > 0:
+            self.capacity = float(min(int(limit), self.limit) if self.limit > 0 else int(limit))
+            self.rate = self.capacity / 60.0
+            self.tokens = min(self.tokens, self.capacity)
+
+        remaining = headers.get('X-RateLimit-Remaining')
+        if remaining is not None and remaining.isdigit():
+            self.tokens = min(self.tokens, float(remaining))
+
+        if status_code == 429:
+            self.throttled += 1
+            retry_after = parse_retry_after(headers.get('Retry-After'))
+            if retry_after is None:
+                retry_after = 60.0 / max(self.capacity, 1.0)
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+            self.tokens = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """返回调度统计信息"""
+        now = self._clock()
+        self._refill(now)
+        return {
+            'capacity': self.capacity,
+            'tokens': round(self.tokens, 2),
+            'waiting': sum(1 for _, _, f in self._waiters if not f.done()),
+            'blocked_for': round(max(0.0, self.blocked_until - now), 3),
+            'granted': self.granted,
+            'queued': self.queued,
+            'rejected': self.rejected,
+            'throttled': self.throttled,
+        }
@@ -0,0 +1,401 @@
+import asyncio
+import heapq
+import logging
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import count
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.models import Character
+from app.services.etag import get_character_version
+from app.services.events import SavedCharacter, on_characters_saved
+
+logger = logging.getLogger(__name__)
+
+# ---- 假名 -> 罗马字（平文式），用于让 "asuna" 和 "アスナ" 互相匹配 ----
+_VOWELS = 'aiueo'
+_KANA_ROWS = {
+    '': 'あいうえお', 'k': 'かきくけこ', 's': 'さしすせそ', 't': 'たちつてと', 'n': 'なにぬねの',
+    'h': 'はひふへほ', 'm': 'まみむめも', 'r': 'らりるれろ', 'g': 'がぎぐげご', 'z': 'ざじずぜぞ',
+    'd': 'だぢづでど', 'b': 'ばびぶべぼ', 'p': 'ぱぴぷぺぽ',
+}
+_ROMAJI = {kana: consonant + vowel for consonant, row in _KANA_ROWS.items() for kana, vowel in zip(row, _VOWELS)}
+_ROMAJI.update({
+    'し': 'shi', 'ち': 'chi', 'つ': 'tsu', 'ふ': 'fu', 'じ': 'ji', 'ぢ': 'ji', 'づ': 'zu',
+    'や': 'ya', 'ゆ': 'yu', 'よ': 'yo', 'わ': 'wa', 'を': 'o', 'ん': 'n', 'ゔ': 'vu',
+    'ぁ': 'a', 'ぃ': 'i', 'ぅ': 'u', 'ぇ': 'e', 'ぉ': 'o',
+})
+_SMALL_Y = {'ゃ': 'a', 'ゅ': 'u', 'ょ': 'o'}
+
+_KANA_RE = re.compile(r'[ぁ-ゖ]')
+_CJK_RE = re.compile(r'[⺀-鿿가-힯豈-﫿]')
+_SEPARATOR_RE = re.compile(r'[\W_]+')
+
+
+def normalize(text: str) -> str:
+    """规范化名字：NFKC、忽略大小写、片假名转平假名、标点和空白合并为一个空格"""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    text = ''.join(chr(ord(ch) - 0x60) if 'ァ' <= ch <= 'ヶ' else ch for ch in text)
+    return _SEPARATOR_RE.sub(' ', text).strip()
+
+
+def kana_to_romaji(text: str) -> str:
+    """把（已规范化为平假名的）假名转为罗马字，非假名字符原样保留"""
+    out: List[str] = []
+    double = False
+    for ch in text:
+        if ch == 'っ':
+            double = True
+            continue
+        if ch == 'ー':
+            continue
+        if ch in _SMALL_Y and out and out[-1].endswith('i'):
+            prev = out[-1]
+            # しゃ -> sha, きゃ -> kya
+            out[-1] = prev[:-1] + _SMALL_Y[ch] if prev.endswith(('shi', 'chi', 'ji')) else prev[:-1] + 'y' + _SMALL_Y[ch]
+            continue
+        romaji = _ROMAJI.get(ch, ch)
+        if double and romaji[:1].isascii() and romaji[:1].isalpha():
+            romaji = ('t' if romaji.startswith('ch') else romaji[0]) + romaji
+        double = False
+        out.append(romaji)
+    return ''.join(out)
+
+
+def name_forms(name: Optional[str]) -> List[str]:
+    """名字的所有索引形式：规范化文本，含假名时再加一份罗马字"""
+    if not name:
+        return []
+    text = normalize(name)
+    if not text:
+        return []
+    forms = [text]
+    if _KANA_RE.search(text):
+        romaji = kana_to_romaji(text)
+        if romaji != text:
+            forms.append(romaji)
+    return forms
+
+
+def grams(text: str) -> Set[str]:
+    """中日韩文本用二元组（字符级），其它用按词补空格的三元组"""
+    if _CJK_RE.search(text):
+        compact = text.replace(' ', '')
+        if len(compact) < 2:
+            return {compact}
+        return {compact[i:i + 2] for i in range(len(compact) - 1)}
+    result: Set[str] = set()
+    for word in text.split():
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def prefix_keys(text: str) -> List[str]:
+    """
+    前缀索引的键：拉丁文本取从每个词开始的后缀（支持按任意一个词的前缀查找），
+    中日韩文本取全部后缀（等价于子串查找）
+    """
+    if _CJK_RE.search(text):
+        compact = text.replace(' ', '')
+        return [compact[i:] for i in range(len(compact))]
+    words = text.split(' ')
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+def prefix_query(text: str) -> str:
+    """与 prefix_keys 对应的查询键"""
+    return text.replace(' ', '') if _CJK_RE.search(text) else text
+
+
+@dataclass
+class _Form:
+    doc_id: int
+    text: str
+    grams: Set[str]
+
+
+@dataclass
+class _Doc:
+    favourites: int
+    form_ids: List[int] = field(default_factory=list)
+
+
+class LocalSearchIndex:
+    """
+    已保存角色的内存搜索索引
+
+    - 有序数组 + 二分查找做前缀匹配（词前缀；中日文为子串）
+    - n-gram 倒排索引做拼写容错，只对共同 n-gram 最多的候选计算相似度
+    - 支持中日文、假名与罗马字互查，结果按收藏数排序
+
+    只索引 characters 表里的全名和原名（别名没有存进数据库，重建后无法还原）。
+    version 是索引对应的角色表版本：从数据库重建时记录，本进程的每次写入事件加一。
+    """
+
+    # 前缀数组里待合并的键少于该数量时逐个二分插入，否则追加后整体排序
+    INSORT_THRESHOLD = 64
+
+    def __init__(self, min_score: float = 0.35, max_candidates: int = 200, max_postings: int = 20000):
+        self.min_score = min_score
+        self.max_candidates = max_candidates
+        self.max_postings = max_postings
+        self._docs: Dict[int, _Doc] = {}
+        self._forms: Dict[int, _Form] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._keys: List[Tuple[str, int]] = []
+        self._pending: List[Tuple[str, int]] = []
+        self._dead_keys = 0
+        self._form_ids = count()
+        self.version: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(
+        self,
+        char_id: int,
+        names: Iterable[Optional[str]],
+        favourites: Optional[int] = 0
+    ) -> None:
+        """
+        添加或更新一个角色（更新时替换原有的名字）
+
+        Args:
+            char_id: 角色 id
+            names: 名字列表（全名、原名、别名）
+            favourites: 收藏数，用于排序
+        """
+        self.remove(char_id)
+        doc = _Doc(favourites=favourites or 0)
+        seen: Set[str] = set()
+        for name in names:
+            for text in name_forms(name):
+                if text in seen:
+                    continue
+                seen.add(text)
+                form_id = next(self._form_ids)
+                form = _Form(char_id, text, grams(text))
+                self._forms[form_id] = form
+                doc.form_ids.append(form_id)
+                for gram in form.grams:
+                    self._postings.setdefault(gram, set()).add(form_id)
+                self._pending.extend((key, form_id) for key in prefix_keys(text))
+        self._docs[char_id] = doc
+
+    def names_of(self, char_id: int) -> List[str]:
+        """返回角色已索引的名字形式"""
+        doc = self._docs.get(char_id)
+        return [self._forms[form_id].text for form_id in doc.form_ids] if doc else []
+
+    def remove(self, char_id: int) -> None:
+        """从索引中删除角色（前缀数组中的键延迟清理）"""
+        doc = self._docs.pop(char_id, None)
+        if doc is None:
+            return
+        for form_id in doc.form_ids:
+            form = self._forms.pop(form_id)
+            self._dead_keys += len(prefix_keys(form.text))
+            for gram in form.grams:
+                postings = self._postings.get(gram)
+                if postings is not None:
+                    postings.discard(form_id)
+                    if not postings:
+                        del self._postings[gram]
+
+    def _flush(self) -> None:
+        """把待合并的键并入有序数组，失效键过多时压缩"""
+        if self._dead_keys > len(self._keys) // 4 + self.INSORT_THRESHOLD:
+            self._keys = [key for key in self._keys if key[1] in self._forms]
+            self._pending = [key for key in self._pending if key[1] in self._forms]
+            self._dead_keys = 0
+        if not self._pending:
+            return
+        if len(self._pending) <= self.INSORT_THRESHOLD:
+            for key in self._pending:
+                insort(self._keys, key)
+        else:
+            self._keys.extend(self._pending)
+            self._keys.sort()
+        self._pending = []
+
+    def _prefix_docs(self, text: str) -> Set[int]:
+        """名字中某个词以 text 开头（中日文为包含 text）的角色"""
+        key = prefix_query(text)
+        docs: Set[int] = set()
+        keys = self._keys
+        i = bisect_left(keys, (key,))
+        while i < len(keys) and keys[i][0].startswith(key):
+            form = self._forms.get(keys[i][1])
+            if form is not None:
+                docs.add(form.doc_id)
+            i += 1
+        return docs
+
+    def _fuzzy_docs(self, text: str) -> Dict[int, float]:
+        """按 n-gram 的 Dice 相似度查找近似匹配，返回 角色 id -> 相似度"""
+        query_grams = grams(text)
+        # 从最稀有的 n-gram 开始收集候选，常见 n-gram 的倒排表超过预算后不再展开
+        postings = sorted(
+            (self._postings[gram] for gram in query_grams if gram in self._postings),
+            key=len
+        )
+        counts: Counter = Counter()
+        budget = self.max_postings
+        for i, form_ids in enumerate(postings):
+            if i and len(form_ids) > budget:
+                break
+            counts.update(form_ids)
+            budget -= len(form_ids)
+
+        scores: Dict[int, float] = {}
+        for form_id, _ in heapq.nlargest(self.max_candidates, counts.items(), key=itemgetter(1)):
+            form = self._forms[form_id]
+            score = 2 * len(query_grams & form.grams) / (len(query_grams) + len(form.grams))
+            if score >= self.min_score and score > scores.get(form.doc_id, 0.0):
+                scores[form.doc_id] = score
+        return scores
+
+    def search(self, query: str, limit: int) -> List[int]:
+        """
+        搜索角色
+
+        有前缀匹配时按收藏数返回前缀匹配的结果；没有时按拼写相近程度查找，
+        按相似度（精确到 0.1）和收藏数排序。
+
+        Args:
+            query: 查询文本
+            limit: 最多返回的数量
+
+        Returns:
+            角色 id 列表
+        """
+        self._flush()
+        forms = name_forms(query)
+        favourites = lambda doc_id: self._docs[doc_id].favourites  # noqa: E731
+
+        prefix: Set[int] = set()
+        for text in forms:
+            prefix |= self._prefix_docs(text)
+        ranked = heapq.nlargest(limit, prefix, key=favourites)
+        if ranked:
+            return ranked
+
+        fuzzy: Dict[int, float] = {}
+        for text in forms:
+            for doc_id, score in self._fuzzy_docs(text).items():
+                if doc_id not in prefix and score > fuzzy.get(doc_id, 0.0):
+                    fuzzy[doc_id] = score
+        ranked += heapq.nlargest(
+            limit - len(ranked),
+            fuzzy,
+            key=lambda doc_id: (round(fuzzy[doc_id], 1), favourites(doc_id))
+        )
+        return ranked
+
+    def committed(self) -> None:
+        """本进程的一个写入事务已提交（数据库里的版本号加了一）"""
+        if self.version is not None:
+            self.version += 1
+
+    def stats(self) -> Dict[str, int]:
+        """返回索引规模"""
+        return {
+            'characters': len(self._docs),
+            'names': len(self._forms),
+            'grams': len(self._postings),
+            'prefix_keys': len(self._keys) + len(self._pending) - self._dead_keys,
+        }
+
+
+# 本地搜索索引（懒加载，启动时从数据库重建）
+_local_index: Optional[LocalSearchIndex] = None
+# 正在进行的重建（并发请求等待同一次重建）
+_rebuilding: Optional[asyncio.Future] = None
+
+
+def get_local_index() -> LocalSearchIndex:
+    """获取本地搜索索引"""
+    global _local_index
+    if _local_index is None:
+        _local_index = LocalSearchIndex(min_score=settings.local_search_min_score)
+    return _local_index
+
+
+async def build_local_index(engine: AsyncEngine) -> LocalSearchIndex:
+    """
+    从 characters 表流式读取名字，重建本地搜索索引
+
+    Args:
+        engine: 异步数据库引擎
+
+    Returns:
+        新建的索引（同时替换当前索引）
+    """
+    global _local_index
+    index = LocalSearchIndex(min_score=settings.local_search_min_score)
+    # 版本号在读取前获取：读取期间的写入会让下一次请求再重建一次，不会漏掉
+    async with AsyncSession(engine) as session:
+        index.version = (await get_character_version(session)).version
+    statement = (
+        select(Character.id, Character.name_full, Character.name_native, Character.favourites)
+        .execution_options(yield_per=5000)
+    )
+    async with engine.connect() as conn:
+        result = await conn.stream(statement)
+        async for rows in result.partitions():
+            for char_id, name_full, name_native, favourites in rows:
+                index.add(char_id, (name_full, name_native), favourites)
+    _local_index = index
+    logger.info(f"本地搜索索引已重建: {index.stats()}")
+    return index
+
+
+async def refresh_local_index(engine: AsyncEngine, version: int) -> LocalSearchIndex:
+    """
+    索引对应的版本与数据库里的角色表版本不同（其他进程直接写了库）时从数据库重建
+
+    并发请求只重建一次；重建失败时记录日志，继续使用当前索引。
+
+    Args:
+        engine: 异步数据库引擎
+        version: 刚读到的角色表版本号
+
+    Returns:
+        当前索引
+    """
+    global _rebuilding
+    index = get_local_index()
+    if index.version == version:
+        return index
+    if _rebuilding is not None:
+        return await asyncio.shield(_rebuilding)
+    rebuilding = _rebuilding = asyncio.get_running_loop().create_future()
+    try:
+        index = await build_local_index(engine)
+    except Exception as e:
+        logger.warning(f"本地搜索索引重建失败，继续使用当前索引: {e}")
+    finally:
+        _rebuilding = None
+    rebuilding.set_result(index)
+    return index
+
+
+@on_characters_saved
+def _index_saved_characters(saved: List[SavedCharacter]) -> None:
+    """保存角色后增量更新本地索引（与重建时一样只索引全名和原名）"""
+    index = get_local_index()
+    for item in saved:
+        row = item.row
+        index.add(row['id'], [row.get('name_full'), row.get('name_native')], row.get('favourites'))
+    # 每个写入事件对应一个提交的事务，本进程自己的写入不会触发重建
+    index.committed()
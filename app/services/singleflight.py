@@ -0,0 +1,57 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    合并并发的相同请求（single-flight）
+
+    同一个 key 同时只执行一次 fn，其它并发调用方等待同一个结果或异常。
+    某个调用方被取消不会影响正在进行的共享调用。
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+        # 统计计数器
+        self.calls = 0
+        self.executions = 0
+        self.merged = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行 fn，若相同 key 已在执行中则等待其结果
+
+        Args:
+            key: 请求标识
+            fn: 无参数的协程函数
+
+        Returns:
+            fn 的返回值（与其它并发调用方共享）
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.merged += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 所有调用方都取消时，避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回合并统计信息"""
+        return {
+            'calls': self.calls,
+            'executions': self.executions,
+            'merged': self.merged,
+            'inflight': len(self._inflight),
+        }
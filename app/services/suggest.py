@@ -0,0 +1,343 @@
+import heapq
+import logging
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+
+from app.config import settings
+from app.models import Character
+from app.services.events import SavedCharacter, on_characters_fetched, on_characters_saved
+from app.services.search_index import name_forms, prefix_keys, prefix_query
+
+logger = logging.getLogger(__name__)
+
+
+class _SortedKeys:
+    """
+    分块有序列表：键按顺序分成若干小块，插入只移动一个小块内的元素，
+    避免在几十万个键的大数组上做整体移动或重新排序
+    """
+
+    CHUNK = 1000
+
+    def __init__(self):
+        self._chunks: List[List[Tuple[str, int]]] = []
+        self._maxes: List[Tuple[str, int]] = []
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def add(self, key: Tuple[str, int]) -> None:
+        self._len += 1
+        if not self._chunks:
+            self._chunks.append([key])
+            self._maxes.append(key)
+            return
+        i = min(bisect_left(self._maxes, key), len(self._maxes) - 1)
+        chunk = self._chunks[i]
+        insort(chunk, key)
+        self._maxes[i] = chunk[-1]
+        if len(chunk) > 2 * self.CHUNK:
+            self._chunks[i:i + 1] = [chunk[:self.CHUNK], chunk[self.CHUNK:]]
+            self._maxes[i:i + 1] = [chunk[self.CHUNK - 1], chunk[-1]]
+
+    def prefix(self, prefix: str) -> Iterator[Tuple[str, int]]:
+        """按顺序返回以 prefix 开头的键"""
+        start = (prefix,)
+        for i in range(bisect_left(self._maxes, start), len(self._chunks)):
+            chunk = self._chunks[i]
+            for j in range(bisect_left(chunk, start), len(chunk)):
+                key = chunk[j]
+                if not key[0].startswith(prefix):
+                    return
+                yield key
+
+    def retain(self, keep: Callable[[Tuple[str, int]], bool]) -> None:
+        """只保留 keep 返回真的键"""
+        chunks = [[key for key in chunk if keep(key)] for chunk in self._chunks]
+        self._chunks = [chunk for chunk in chunks if chunk]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._len = sum(len(chunk) for chunk in self._chunks)
+
+
+@dataclass
+class _Entry:
+    char_id: int
+    full: str
+    native: Optional[str]
+    image: Optional[str]
+    favourites: int
+    saved: bool
+    token: int
+    keys: List[str] = field(default_factory=list)
+
+    def rank(self) -> Tuple[int, int]:
+        """排序键：收藏数，其次 id（保证结果稳定）"""
+        return self.favourites, -self.char_id
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.char_id,
+            'name': {'full': self.full, 'native': self.native},
+            'image': {'medium': self.image},
+            'favourites': self.favourites,
+            'saved': self.saved,
+        }
+
+
+class SuggestIndex:
+    """
+    输入联想用的内存前缀索引
+
+    名字的所有词前缀（中日文为子串）放在一个分块有序列表里，用二分查找定位范围，
+    插入直接进入对应的小块。很短的前缀命中范围太大，单独缓存收藏数最高的 top_k 个结果并在插入时增量维护
+    （只缓存有结果的前缀，最多 max_cached_prefixes 个，按最近使用淘汰）。
+    条目数超过 max_entries 时，先淘汰只在 AniList 结果中出现过的角色，再按收藏数从低到高淘汰。
+    更新和删除留下的失效键在写入时按比例清理，没有查询时内存也不会增长。
+    """
+
+    # 不超过该长度的前缀使用 top_k 缓存
+    SHORT_PREFIX = 3
+    # 失效键（淘汰堆中的失效项）超过有效数量且不少于该值时清理
+    COMPACT_MIN = 1000
+
+    def __init__(self, max_entries: int = 50000, top_k: int = 20, max_cached_prefixes: int = 10000):
+        self.max_entries = max_entries
+        self.top_k = top_k
+        self.max_cached_prefixes = max(1, max_cached_prefixes)
+        self._entries: Dict[int, _Entry] = {}
+        self._by_token: Dict[int, _Entry] = {}
+        self._keys = _SortedKeys()
+        self._dead_keys = 0
+        self._top: OrderedDict[str, List[_Entry]] = OrderedDict()
+        self._evict_heap: List[Tuple[bool, int, int, int]] = []
+        self._tokens = count()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(
+        self,
+        char_id: int,
+        full: Optional[str],
+        native: Optional[str] = None,
+        favourites: Optional[int] = 0,
+        image: Optional[str] = None,
+        saved: bool = False,
+        alternative: Iterable[Optional[str]] = ()
+    ) -> None:
+        """
+        添加或更新一个角色
+
+        Args:
+            char_id: 角色 id
+            full: 全名（联想结果显示的名字）
+            native: 原名
+            favourites: 收藏数，用于排序
+            image: 缩略图地址
+            saved: 是否已保存到数据库（已保存的角色最后淘汰）
+            alternative: 别名，只参与匹配
+        """
+        old = self._entries.get(char_id)
+        if old is not None:
+            saved = saved or old.saved
+            self.remove(char_id)
+
+        entry = _Entry(
+            char_id=char_id,
+            full=full or native or '',
+            native=native,
+            image=image,
+            favourites=favourites or 0,
+            saved=saved,
+            token=next(self._tokens),
+        )
+        keys = dict.fromkeys(
+            key
+            for name in (full, native, *alternative)
+            for text in name_forms(name)
+            for key in prefix_keys(text)
+        )
+        entry.keys = list(keys)
+        if not entry.keys:
+            return
+
+        self._entries[char_id] = entry
+        self._by_token[entry.token] = entry
+        for key in entry.keys:
+            self._keys.add((key, entry.token))
+        heapq.heappush(self._evict_heap, (entry.saved, entry.favourites, entry.char_id, entry.token))
+
+        # 增量维护已缓存的短前缀结果
+        for prefix in {key[:n] for key in entry.keys for n in range(1, self.SHORT_PREFIX + 1)}:
+            top = self._top.get(prefix)
+            if top is not None:
+                top.append(entry)
+                top.sort(key=_Entry.rank, reverse=True)
+                del top[self.top_k:]
+
+        while len(self._entries) > self.max_entries:
+            self._evict()
+        self._compact()
+
+    def remove(self, char_id: int) -> None:
+        """删除角色（有序列表中的键延迟清理，见 _compact）"""
+        entry = self._entries.pop(char_id, None)
+        if entry is None:
+            return
+        del self._by_token[entry.token]
+        self._dead_keys += len(entry.keys)
+        # 删除的角色在某个短前缀的 top_k 里时，该缓存需要重新计算
+        for prefix in {key[:n] for key in entry.keys for n in range(1, self.SHORT_PREFIX + 1)}:
+            top = self._top.get(prefix)
+            if top is not None and any(item is entry for item in top):
+                del self._top[prefix]
+        self._compact()
+
+    def _evict(self) -> None:
+        """淘汰一个条目：先淘汰未保存的，再按收藏数从低到高"""
+        while self._evict_heap:
+            _, _, char_id, token = heapq.heappop(self._evict_heap)
+            if token in self._by_token:
+                self.remove(char_id)
+                self.evictions += 1
+                return
+
+    def _compact(self) -> None:
+        """
+        失效键多于有效键时清理有序列表，淘汰堆中的失效项多于有效条目时重建淘汰堆
+
+        每次清理前至少积累了与有效数据同样多的失效项，清理的开销均摊到每次写入是常数
+        """
+        if self._dead_keys >= max(len(self._keys) - self._dead_keys, self.COMPACT_MIN):
+            self._keys.retain(lambda key: key[1] in self._by_token)
+            self._dead_keys = 0
+        if len(self._evict_heap) - len(self._entries) >= max(len(self._entries), self.COMPACT_MIN):
+            self._evict_heap = [item for item in self._evict_heap if item[3] in self._by_token]
+            heapq.heapify(self._evict_heap)
+
+    def _scan(self, prefix: str) -> List[_Entry]:
+        """以 prefix 开头的所有键对应的角色"""
+        entries: Dict[int, _Entry] = {}
+        for _, token in self._keys.prefix(prefix):
+            entry = self._by_token.get(token)
+            if entry is not None:
+                entries[entry.char_id] = entry
+        return list(entries.values())
+
+    def _matches(self, prefix: str, limit: int) -> List[_Entry]:
+        """以 prefix 开头的收藏数最高的 limit 个角色"""
+        if len(prefix) > self.SHORT_PREFIX or limit > self.top_k:
+            return heapq.nlargest(limit, self._scan(prefix), key=_Entry.rank)
+        top = self._top.get(prefix)
+        if top is not None:
+            self._top.move_to_end(prefix)
+            return top[:limit]
+        top = heapq.nlargest(self.top_k, self._scan(prefix), key=_Entry.rank)
+        # 没有结果的前缀不缓存（任意输入不会撑大缓存；之后插入的角色会让它有结果）
+        if top:
+            self._top[prefix] = top
+            if len(self._top) > self.max_cached_prefixes:
+                self._top.popitem(last=False)
+        return top[:limit]
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        返回名字中某个词以 query 开头的角色，按收藏数排序
+
+        Args:
+            query: 已输入的文本（假名输入也会按罗马字匹配）
+            limit: 最多返回的数量
+
+        Returns:
+            联想结果列表
+        """
+        matches: Dict[int, _Entry] = {}
+        for text in name_forms(query):
+            for entry in self._matches(prefix_query(text), limit):
+                matches[entry.char_id] = entry
+        ranked = heapq.nlargest(limit, matches.values(), key=_Entry.rank)
+        return [entry.to_dict() for entry in ranked]
+
+    def stats(self) -> Dict[str, int]:
+        """返回索引规模"""
+        return {
+            'entries': len(self._entries),
+            'saved': sum(entry.saved for entry in self._entries.values()),
+            'keys': len(self._keys) - self._dead_keys,
+            'cached_prefixes': len(self._top),
+            'evictions': self.evictions,
+        }
+
+
+# 输入联想索引（懒加载，启动时从数据库重建）
+_suggest_index: Optional[SuggestIndex] = None
+
+
+def get_suggest_index() -> SuggestIndex:
+    """获取输入联想索引"""
+    global _suggest_index
+    if _suggest_index is None:
+        _suggest_index = SuggestIndex(max_entries=settings.suggest_max_entries, top_k=settings.suggest_max_limit)
+    return _suggest_index
+
+
+async def build_suggest_index(engine: AsyncEngine) -> SuggestIndex:
+    """
+    从 characters 表流式读取角色，重建输入联想索引
+
+    Args:
+        engine: 异步数据库引擎
+
+    Returns:
+        新建的索引（同时替换当前索引）
+    """
+    global _suggest_index
+    index = SuggestIndex(max_entries=settings.suggest_max_entries, top_k=settings.suggest_max_limit)
+    statement = (
+        select(Character.id, Character.name_full, Character.name_native, Character.favourites, Character.image_url)
+        .order_by(Character.favourites.desc())
+        .limit(settings.suggest_max_entries)
+        .execution_options(yield_per=5000)
+    )
+    async with engine.connect() as conn:
+        result = await conn.stream(statement)
+        async for rows in result.partitions():
+            for char_id, name_full, name_native, favourites, image_url in rows:
+                index.add(char_id, name_full, name_native, favourites, image_url, saved=True)
+    _suggest_index = index
+    logger.info(f"输入联想索引已重建: {index.stats()}")
+    return index
+
+
+@on_characters_saved
+def _suggest_saved_characters(saved: List[SavedCharacter]) -> None:
+    """保存角色后增量更新联想索引"""
+    index = get_suggest_index()
+    for item in saved:
+        row = item.row
+        index.add(
+            row['id'], row.get('name_full'), row.get('name_native'), row.get('favourites'),
+            row.get('image_url'), saved=True, alternative=item.alternative
+        )
+
+
+@on_characters_fetched
+def _suggest_fetched_characters(characters: List[Dict[str, Any]]) -> None:
+    """AniList 返回的角色也加入联想索引（未保存，优先淘汰）"""
+    index = get_suggest_index()
+    for character in characters:
+        if not character.get('id'):
+            continue
+        name = character.get('name') or {}
+        index.add(
+            character['id'], name.get('full'), name.get('native'), character.get('favourites'),
+            (character.get('image') or {}).get('medium'), alternative=name.get('alternative') or ()
+        )
@@ -0,0 +1,260 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+
+from app.config import settings
+from app.database import bump_version_statement
+from app.models import Character
+from app.services.anilist import AniListService
+from app.services.events import SavedCharacter, notify_characters_saved
+from app.services.exceptions import AniListError
+from app.services.scheduler import PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# 同步时比较和更新的列
+SYNC_COLUMNS = [name for name in Character.__table__.columns.keys() if name != 'id']
+
+
+class CharacterSyncWorker:
+    """
+    后台同步已保存的角色
+
+    按 id 顺序（keyset）遍历 characters 表，每批最多 50 个 id 用一个 id_in 查询向 AniList
+    刷新，只把有变化的行用一条批量 UPDATE 写回。每批之后记录检查点（最后处理的 id），
+    重启后从检查点继续。上游请求以后台优先级排队，并受 rate_limit（每分钟请求数）限制。
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        batch_size: int = 50,
+        rate_limit: float = 30,
+        interval: float = 3600,
+        checkpoint_path: Optional[str] = None,
+        retry_delay: float = 60,
+    ):
+        self.engine = engine
+        self.batch_size = max(1, min(batch_size, AniListService.MAX_PER_PAGE))
+        self.rate_limit = rate_limit
+        self.interval = interval
+        self.retry_delay = retry_delay
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        self._task: Optional[asyncio.Task] = None
+        self._last_request = 0.0
+
+        checkpoint = self._load_checkpoint()
+        self.last_id = checkpoint.get('last_id', 0)
+        self.passes = checkpoint.get('passes', 0)
+
+        # 进度统计
+        self.batches = 0
+        self.checked = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.missing = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_pass_finished: Optional[float] = None
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        """读取检查点文件，不存在或损坏时从头开始"""
+        if self.checkpoint_path is None or not self.checkpoint_path.exists():
+            return {}
+        try:
+            return json.loads(self.checkpoint_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            logger.warning(f"同步检查点读取失败，从头开始: {e}")
+            return {}
+
+    def _save_checkpoint(self) -> None:
+        """原子地写入检查点（先写临时文件再替换）"""
+        if self.checkpoint_path is None:
+            return
+        data = {'last_id': self.last_id, 'passes': self.passes, 'updated_at': time.time()}
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint_path.with_name(self.checkpoint_path.name + '.tmp')
+        tmp.write_text(json.dumps(data), encoding='utf-8')
+        os.replace(tmp, self.checkpoint_path)
+
+    async def _pace(self) -> None:
+        """按 rate_limit 控制两次上游请求的最小间隔"""
+        if self.rate_limit <= 0:
+            return
+        wait = self._last_request + 60 / self.rate_limit - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._last_request = time.monotonic()
+
+    async def _read_batch(self) -> List[Dict[str, Any]]:
+        """读取检查点之后的下一批行"""
+        statement = (
+            select(Character.id, *[getattr(Character, name) for name in SYNC_COLUMNS])
+            .where(Character.id > self.last_id)
+            .order_by(Character.id)
+            .limit(self.batch_size)
+        )
+        async with self.engine.connect() as conn:
+            rows = (await conn.execute(statement)).all()
+        return [dict(zip(['id', *SYNC_COLUMNS], row)) for row in rows]
+
+    async def _write_changes(self, changed: List[Dict[str, Any]]) -> None:
+        """一条批量 UPDATE（executemany）写回有变化的行，同一个事务里更新角色表版本"""
+        table = Character.__table__
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam('_id'))
+            .values({name: bindparam(name) for name in SYNC_COLUMNS})
+        )
+        params = [{'_id': row['id'], **{name: row[name] for name in SYNC_COLUMNS}} for row in changed]
+        async with self.engine.begin() as conn:
+            await conn.execute(statement, params)
+            await conn.execute(bump_version_statement(self.engine.dialect.name, Character.__tablename__))
+
+    async def sync_batch(self) -> bool:
+        """
+        同步下一批角色
+
+        Returns:
+            本轮是否还有剩余的行（False 表示已遍历到表尾，检查点回到开头）
+        """
+        rows = await self._read_batch()
+        if not rows:
+            self.last_id = 0
+            self.passes += 1
+            self.last_pass_finished = time.time()
+            self._save_checkpoint()
+            return False
+
+        await self._pace()
+        # detail 字段集已包含表里的所有列，不需要生日和作品信息
+        fetched = await AniListService.get_characters_by_ids(
+            [row['id'] for row in rows], PRIORITY_BACKGROUND, fields='detail'
+        )
+        latest = {char['id']: Character.from_anilist(char).model_dump() for char in fetched if char.get('id')}
+
+        changed = []
+        alternatives = {}
+        for row in rows:
+            new = latest.get(row['id'])
+            if new is None:
+                self.missing += 1
+            elif any(new[name] != row[name] for name in SYNC_COLUMNS):
+                changed.append(new)
+            else:
+                self.unchanged += 1
+        for char in fetched:
+            alternatives[char.get('id')] = (char.get('name') or {}).get('alternative') or []
+
+        if changed:
+            await self._write_changes(changed)
+            notify_characters_saved([
+                SavedCharacter(row=row, status='updated', alternative=alternatives.get(row['id'], []))
+                for row in changed
+            ])
+
+        self.batches += 1
+        self.checked += len(rows)
+        self.updated += len(changed)
+        self.last_id = rows[-1]['id']
+        self._save_checkpoint()
+        return True
+
+    async def run_pass(self) -> None:
+        """从检查点开始同步到表尾"""
+        while await self.sync_batch():
+            pass
+
+    async def run(self) -> None:
+        """循环同步：每轮结束后等待 interval 秒，出错时等待 retry_delay 秒后从检查点继续"""
+        logger.info(f"角色后台同步启动，从 id>{self.last_id} 开始")
+        while True:
+            try:
+                await self.run_pass()
+                logger.info(f"角色同步完成一轮: {self.stats()}")
+                await asyncio.sleep(self.interval)
+            except asyncio.CancelledError:
+                raise
+            except AniListError as e:
+                self._record_error(e)
+                await asyncio.sleep(self.retry_delay)
+            except Exception as e:
+                self._record_error(e)
+                logger.error("角色同步出错", exc_info=True)
+                await asyncio.sleep(self.retry_delay)
+
+    def _record_error(self, error: Exception) -> None:
+        self.errors += 1
+        self.last_error = str(error)
+        logger.warning(f"角色同步失败，稍后从 id>{self.last_id} 继续: {error}")
+
+    def start(self) -> None:
+        """在后台任务中启动同步"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """停止后台同步（检查点已在每批后保存）"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """同步进度"""
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'last_id': self.last_id,
+            'passes': self.passes,
+            'batches': self.batches,
+            'checked': self.checked,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'missing': self.missing,
+            'errors': self.errors,
+            'last_error': self.last_error,
+            'last_pass_finished': self.last_pass_finished,
+        }
+
+
+# 后台同步任务（由 lifespan 启动和停止）
+_sync_worker: Optional[CharacterSyncWorker] = None
+
+
+def get_sync_worker() -> Optional[CharacterSyncWorker]:
+    """获取后台同步任务，未启动时返回 None"""
+    return _sync_worker
+
+
+def start_sync_worker(engine: AsyncEngine) -> CharacterSyncWorker:
+    """按配置创建并启动后台同步任务"""
+    global _sync_worker
+    if _sync_worker is None:
+        _sync_worker = CharacterSyncWorker(
+            engine,
+            batch_size=settings.sync_batch_size,
+            rate_limit=settings.sync_rate_limit,
+            interval=settings.sync_interval,
+            checkpoint_path=settings.sync_checkpoint_path,
+        )
+    _sync_worker.start()
+    return _sync_worker
+
+
+async def stop_sync_worker() -> None:
+    """停止后台同步任务"""
+    global _sync_worker
+    if _sync_worker is not None:
+        await _sync_worker.stop()
+        _sync_worker = None
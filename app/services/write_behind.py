@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import upsert_characters
+from app.database.upsert import character_rows
+from app.models import Character
+from app.services.events import SavedCharacter, notify_characters_saved
+from app.services.exceptions import WriteBehindBacklogError
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    角色保存的写后缓冲
+
+    保存请求只把角色放进内存缓冲（按 id 去重，同一个角色后写覆盖先写）就返回，
+    后台任务在缓冲达到 max_items 个角色或距上次写入超过 flush_interval 秒时，
+    用一次批量 upsert 把整个缓冲写入数据库。写入失败的角色放回缓冲等待下次重试
+    （期间又被保存过的以新数据为准）；积压达到 max_pending 个时 add() 会等待写入完成，
+    避免数据库不可用时内存无限增长，这次写入失败时抛出 WriteBehindBacklogError
+    （角色已在缓冲里，之后仍会写入）。
+
+    写入在锁内串行进行，旧的一批不会在新的一批之后提交。
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        max_items: int = 200,
+        flush_interval: float = 0.5,
+        max_pending: int = 5000,
+    ):
+        self.engine = engine
+        self.max_items = max(1, max_items)
+        self.flush_interval = flush_interval
+        self.max_pending = max(self.max_items, max_pending)
+        self._pending: Dict[int, Tuple[Character, List[str], Optional[List[Dict[str, Any]]]]] = {}
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        # 统计
+        self.accepted = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.written = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_flush: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def add(
+        self,
+        character: Character,
+        alternative: Optional[List[str]] = None,
+        media: Optional[List[Dict[str, Any]]] = None
+    ) -> None:
+        """
+        放入一个待保存的角色
+
+        Args:
+            character: 角色（必须有 id）
+            alternative: 别名列表（写入事件里使用）
+            media: 出现的作品（None 表示数据里没有作品信息）
+
+        Raises:
+            WriteBehindBacklogError: 积压已满且同步写入失败（角色留在缓冲里等待重试）
+        """
+        previous = self._pending.get(character.id)
+        if previous is not None:
+            self.coalesced += 1
+            # 后一次保存没有带作品信息时沿用前一次的
+            if media is None:
+                media = previous[2]
+        self._pending[character.id] = (character, alternative or [], media)
+        self.accepted += 1
+        self._ensure_task()
+        if len(self._pending) >= self.max_pending:
+            # 积压过多（通常是数据库写入一直失败），同步等待这一批写完
+            try:
+                await self.flush(raise_errors=True)
+            except Exception as e:
+                raise WriteBehindBacklogError(
+                    f"写后缓冲积压 {len(self._pending)} 个角色，数据库写入失败: {e}",
+                    retry_after=self.flush_interval
+                ) from e
+        elif len(self._pending) >= self.max_items:
+            self._wakeup.set()
+
+    async def flush(self, raise_errors: bool = False) -> int:
+        """
+        把当前缓冲写入数据库
+
+        Args:
+            raise_errors: 写入失败时是否抛出异常（默认只记录日志，角色放回缓冲）
+
+        Returns:
+            写入的角色数
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            characters = [character for character, _, _ in batch.values()]
+            media = {char_id: item[2] for char_id, item in batch.items() if item[2] is not None}
+            try:
+                async with AsyncSession(self.engine) as session:
+                    statuses = await upsert_characters(session, characters, media)
+            except Exception as e:
+                # 放回缓冲：期间新保存的角色和别名优先，新数据没有作品信息时保留失败批次里的
+                for char_id, item in batch.items():
+                    newer = self._pending.get(char_id)
+                    if newer is None:
+                        self._pending[char_id] = item
+                    elif newer[2] is None:
+                        self._pending[char_id] = (newer[0], newer[1], item[2])
+                self.errors += 1
+                self.last_error = str(e)
+                logger.error(f"写后缓冲写入失败，{len(batch)} 个角色等待重试: {e}")
+                if raise_errors:
+                    raise
+                return 0
+
+            self.flushes += 1
+            self.written += len(characters)
+            self.last_flush = time.time()
+
+        notify_characters_saved([
+            SavedCharacter(row=row, status=statuses.get(row['id']), alternative=batch[row['id']][1])
+            for row in character_rows(characters)
+        ])
+        return len(characters)
+
+    async def run(self) -> None:
+        """后台写入循环：达到数量阈值时立即写，否则每 flush_interval 秒写一次"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.error("写后缓冲后台写入出错", exc_info=True)
+
+    def _ensure_task(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def close(self) -> None:
+        """停止后台任务并把缓冲中剩余的角色全部写入"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pending:
+            await self.flush(raise_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓冲统计"""
+        return {
+            'pending': len(self._pending),
+            'accepted': self.accepted,
+            'coalesced': self.coalesced,
+            'flushes': self.flushes,
+            'written': self.written,
+            'errors': self.errors,
+            'last_error': self.last_error,
+            'last_flush': self.last_flush,
+        }
+
+
+# 写后缓冲（第一次保存时按请求使用的数据库引擎创建，由 lifespan 关闭）
+_write_behind: Optional[WriteBehindBuffer] = None
+
+
+def get_write_behind(engine: AsyncEngine) -> WriteBehindBuffer:
+    """获取写后缓冲单例"""
+    global _write_behind
+    if _write_behind is None:
+        _write_behind = WriteBehindBuffer(
+            engine,
+            max_items=settings.write_behind_max_items,
+            flush_interval=settings.write_behind_flush_interval,
+            max_pending=settings.write_behind_max_pending,
+        )
+    return _write_behind
+
+
+def peek_write_behind() -> Optional[WriteBehindBuffer]:
+    """获取写后缓冲，未创建时返回 None"""
+    return _write_behind
+
+
+async def close_write_behind() -> None:
+    """把缓冲写完并释放（应用关闭时调用）"""
+    global _write_behind
+    if _write_behind is not None:
+        buffer, _write_behind = _write_behind, None
+        try:
+            await buffer.close()
+        except Exception as e:
+            logger.error(f"写后缓冲关闭时写入失败，丢失 {len(buffer)} 个角色: {e}")
@@ -0,0 +1,81 @@
+"""
+批量保存基准：逐条 merge + commit vs 分块多行 upsert
+
+在临时 sqlite 文件库上分别写入 N 个角色（先插入、再全部更新一遍），报告每秒写入行数。
+
+运行方式:
+    python benchmarks/bench_bulk_save.py --rows 5000
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+from app.database import upsert_characters  # noqa: E402
+from app.models import Character  # noqa: E402
+
+
+def payloads(rows: int, favourites: int):
+    return [
+        {
+            "id": i,
+            "name": {"full": f"Character {i}", "native": "キャラクター"},
+            "image": {"medium": f"https://s4.anilist.co/character/medium/b{i}.png"},
+            "description": "Lorem ipsum dolor sit amet. " * 8,
+            "gender": "Female", "age": "17", "favourites": favourites,
+            "siteUrl": f"https://anilist.co/character/{i}",
+        }
+        for i in range(1, rows + 1)
+    ]
+
+
+async def per_row(engine, items) -> None:
+    """旧路径：每个角色一次 merge（SELECT + INSERT/UPDATE）和一次提交"""
+    for item in items:
+        async with AsyncSession(engine) as session:
+            await session.merge(Character.from_anilist(item))
+            await session.commit()
+
+
+async def batched(engine, items) -> None:
+    async with AsyncSession(engine) as session:
+        await upsert_characters(session, [Character.from_anilist(item) for item in items])
+
+
+async def run(path: Path, rows: int, fn) -> float:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    start = time.perf_counter()
+    await fn(engine, payloads(rows, 1))    # 全部插入
+    await fn(engine, payloads(rows, 2))    # 全部更新
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return elapsed
+
+
+def main(rows: int) -> None:
+    print(f"rows={rows} (insert pass + update pass)")
+    results = {}
+    for name, fn in (("per-row merge", per_row), ("batch upsert", batched)):
+        with tempfile.TemporaryDirectory() as tmp:
+            elapsed = asyncio.run(run(Path(tmp) / "bench.db", rows, fn))
+        results[name] = elapsed
+        print(f"{name:14} {elapsed:7.2f}s  {2 * rows / elapsed:10.0f} rows/s")
+    print(f"speedup: x{results['per-row merge'] / results['batch upsert']:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+    main(args.rows)
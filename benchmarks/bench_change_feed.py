@@ -0,0 +1,95 @@
+"""
+变更推送基准：数百个订阅者时的分发开销和推送延迟
+
+启动 N 个订阅者（每个都通过 iter_feed 生成 SSE 数据，和真实连接走同一条路径，只是不经过网络），
+发布 M 批角色写入事件，报告每批 publish() 的耗时、从发布到每个订阅者收到的延迟 p50 / p99，
+并和“每个订阅者各自编码一次”的做法对比编码耗时。
+
+运行方式:
+    python benchmarks/bench_change_feed.py --subscribers 500 --batches 200 --batch-size 5
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app.routers.characters import iter_feed  # noqa: E402
+from app.services import ChangeFeed, SavedCharacter  # noqa: E402
+
+
+def rows(batch: int, size: int):
+    return [
+        SavedCharacter(row={
+            "id": batch * size + i, "name_full": f"Character {batch * size + i}", "name_native": "キャラクター",
+            "gender": "Female", "age": "17", "favourites": i, "description": "Lorem ipsum dolor sit amet. " * 8,
+            "image_url": "https://s4.anilist.co/character/medium/b1.png", "site_url": "https://anilist.co/character/1",
+        }, status="created")
+        for i in range(size)
+    ]
+
+
+async def run(subscribers: int, batches: int, batch_size: int, interval: float) -> None:
+    feed = ChangeFeed(history=1000, queue_size=64, max_subscribers=subscribers)
+    published_at = {}
+    latencies = []
+    received = [0]
+
+    async def consume() -> None:
+        subscriber, backlog, reset = feed.subscribe()
+        async for chunk in iter_feed(feed, subscriber, backlog, reset, heartbeat=5):
+            now = time.perf_counter()
+            for line in chunk.split(b"\n"):
+                if line.startswith(b"id: "):
+                    seq = int(line.rsplit(b"-", 1)[1])
+                    latencies.append((now - published_at[seq]) * 1000)
+                    received[0] += 1
+
+    consumers = [asyncio.create_task(consume()) for _ in range(subscribers)]
+    await asyncio.sleep(0.1)
+
+    publish_times = []
+    for batch in range(batches):
+        saved = rows(batch, batch_size)
+        start = time.perf_counter()
+        for offset in range(1, batch_size + 1):
+            published_at[feed.seq + offset] = start
+        feed.publish(saved)
+        publish_times.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+
+    await asyncio.sleep(0.2)
+    feed.close()
+    await asyncio.gather(*consumers)
+
+    # 对比：每个订阅者各自编码
+    saved = rows(0, batch_size)
+    start = time.perf_counter()
+    for _ in range(subscribers):
+        for item in saved:
+            json.dumps({"type": "insert", "character": item.row}, ensure_ascii=False).encode("utf-8")
+    naive = (time.perf_counter() - start) * 1000
+
+    latencies.sort()
+    expected = subscribers * batches * batch_size
+    print(f"subscribers={subscribers} batches={batches} batch_size={batch_size}")
+    print(f"delivered {received[0]}/{expected} events, overflows={feed.overflows}")
+    print(f"publish per batch: p50={statistics.median(publish_times):.3f}ms max={max(publish_times):.3f}ms "
+          f"(encoding per subscriber would cost {naive:.3f}ms per batch)")
+    print(f"delivery latency: p50={statistics.median(latencies):.3f}ms "
+          f"p99={latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]:.3f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=500)
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=0.005, help="两批之间的间隔（秒）")
+    args = parser.parse_args()
+    asyncio.run(run(args.subscribers, args.batches, args.batch_size, args.interval))
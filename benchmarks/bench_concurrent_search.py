@@ -0,0 +1,65 @@
+"""
+并发搜索基准：阻塞 requests.post vs 共享连接池的异步客户端
+
+启动本地 GraphQL 桩服务（每个请求固定延迟），分别用旧的阻塞方式和新的
+AniListService 异步客户端并发发起 N 个搜索，比较总耗时。
+
+运行方式:
+    python benchmarks/bench_concurrent_search.py --requests 20 --delay 0.2
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tests"))
+
+import requests  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.services import AniListService, close_client  # noqa: E402
+from stub_server import AniListStub  # noqa: E402
+
+
+async def blocking_search(name: str):
+    """旧实现：在 async 函数里直接调用阻塞的 requests.post"""
+    response = requests.post(
+        settings.anilist_api_url,
+        json={'query': AniListService.QUERY, 'variables': {'search': name, 'page': 1, 'perPage': 5}},
+        timeout=settings.anilist_timeout,
+    )
+    return response.json()['data']['Page']['characters']
+
+
+async def run_batch(search, count: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(search(f"name-{i}") for i in range(count)))
+    return time.perf_counter() - start
+
+
+async def main(count: int, delay: float) -> None:
+    with AniListStub(delay=delay) as stub:
+        settings.anilist_api_url = stub.url
+
+        blocking = await run_batch(blocking_search, count)
+        blocking_connections = stub.connections
+        try:
+            pooled = await run_batch(AniListService.search_characters, count)
+        finally:
+            await close_client()
+
+        print(f"requests={count} upstream_delay={delay:.3f}s")
+        print(f"blocking requests.post : {blocking:.3f}s")
+        print(f"async pooled client    : {pooled:.3f}s  (x{blocking / pooled:.1f})")
+        print(f"connections opened     : blocking={blocking_connections} pooled={stub.connections - blocking_connections}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.2)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.delay))
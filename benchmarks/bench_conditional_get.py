@@ -0,0 +1,101 @@
+"""
+条件请求基准：/api/getallcharacters 和本地搜索的完整响应 vs If-None-Match 命中的 304
+
+在临时 sqlite 文件库里写入 N 个角色，通过 ASGI 直接调用应用（不经过网络），
+报告两种请求的 p50 / p99 延迟、每秒请求数和响应体大小。
+
+运行方式:
+    python benchmarks/bench_conditional_get.py --rows 2000 --requests 300
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import httpx  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+from app.database import get_async_engine, get_async_session, upsert_characters  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Character  # noqa: E402
+from app.services import build_local_index  # noqa: E402
+
+
+def payload(char_id: int) -> dict:
+    return {
+        "id": char_id,
+        "name": {"full": f"Character {char_id}", "native": "キャラクター"},
+        "image": {"medium": f"https://s4.anilist.co/character/medium/b{char_id}.png"},
+        "description": "Lorem ipsum dolor sit amet. " * 8,
+        "gender": "Female", "age": "17", "favourites": char_id,
+        "siteUrl": f"https://anilist.co/character/{char_id}",
+    }
+
+
+async def measure(client: httpx.AsyncClient, url: str, params: dict, requests: int, etag: str = None):
+    headers = {"If-None-Match": etag} if etag else {}
+    timings = []
+    size = 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get(url, params=params, headers=headers)
+        timings.append((time.perf_counter() - start) * 1000)
+        size = len(response.content)
+        assert response.status_code == (304 if etag else 200), response.status_code
+    timings.sort()
+    return statistics.median(timings), timings[min(len(timings) - 1, int(0.99 * len(timings)))], size
+
+
+async def run(path: Path, rows: int, requests: int) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    models = [Character.from_anilist(payload(i)) for i in range(1, rows + 1)]
+    async with AsyncSession(engine) as session:
+        await upsert_characters(session, models)
+    await build_local_index(engine)
+
+    async def session_override():
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = session_override
+    app.dependency_overrides[get_async_engine] = lambda: engine
+    cases = [
+        ("getallcharacters", "/api/getallcharacters", {}),
+        ("local search", "/api/character/search", {"name": "Character 1", "source": "local"}),
+    ]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, url, params in cases:
+            etag = (await client.get(url, params=params)).headers["etag"]
+            full = await measure(client, url, params, requests)
+            cached = await measure(client, url, params, requests, etag)
+            for label, (p50, p99, size) in (("200", full), ("304", cached)):
+                print(f"{name:17} {label}  p50={p50:8.3f}ms p99={p99:8.3f}ms "
+                      f"{1000 / p50:8.0f} req/s  body={size} bytes")
+            print(f"{name:17} speedup x{full[0] / cached[0]:.1f}")
+    app.dependency_overrides.clear()
+    await engine.dispose()
+
+
+def main(rows: int, requests: int) -> None:
+    print(f"rows={rows} requests={requests}")
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp) / "bench.db", rows, requests))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+    main(args.rows, args.requests)
@@ -0,0 +1,124 @@
+"""
+流式导出基准：1M 行 sqlite 表，比较服务端游标流式导出和一次性加载
+
+每种方式在独立子进程中运行，分别报告峰值 RSS 和吞吐量。
+
+运行方式:
+    python benchmarks/bench_export.py --rows 1000000
+"""
+import argparse
+import asyncio
+import json
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def peak_rss_mb() -> float:
+    # Linux 上 ru_maxrss 单位是 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def generate(path: Path, rows: int) -> None:
+    from sqlmodel import SQLModel, create_engine
+    from app.models import Character  # noqa: F401
+
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    engine.dispose()
+
+    conn = sqlite3.connect(path)
+    batch = 50000
+    for start in range(0, rows, batch):
+        conn.executemany(
+            "INSERT INTO characters (id, name_full, name_native, gender, age, favourites, image_url, description, site_url) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (i, f"Character {i}", "キャラクター", "Female", "17", i % 50000,
+                 f"https://s4.anilist.co/file/anilistcdn/character/medium/b{i}.png",
+                 "Lorem ipsum dolor sit amet. " * 8, f"https://anilist.co/character/{i}")
+                for i in range(start + 1, min(start + batch, rows) + 1)
+            ),
+        )
+    conn.commit()
+    conn.close()
+
+
+async def run_stream(path: Path, fmt: str, chunk_size: int) -> int:
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.routers.characters import CHARACTER_COLUMNS, iter_export
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    total = 0
+    async for chunk in iter_export(engine, fmt, CHARACTER_COLUMNS, chunk_size):
+        total += len(chunk)
+    await engine.dispose()
+    return total
+
+
+async def run_all(path: Path) -> int:
+    """旧方式：select(Character).all() 后整体序列化为一个 JSON 数组"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlmodel import select
+    from sqlmodel.ext.asyncio.session import AsyncSession
+    from app.models import Character
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with AsyncSession(engine) as session:
+        rows = (await session.exec(select(Character))).all()
+        body = json.dumps([row.model_dump() for row in rows], ensure_ascii=False).encode("utf-8")
+    await engine.dispose()
+    return len(body)
+
+
+def child(path: Path, mode: str, fmt: str, chunk_size: int, rows: int) -> None:
+    start = time.perf_counter()
+    if mode == "stream":
+        size = asyncio.run(run_stream(path, fmt, chunk_size))
+    else:
+        size = asyncio.run(run_all(path))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"mode": mode, "bytes": size, "seconds": elapsed,
+                      "rows_per_sec": rows / elapsed, "peak_rss_mb": peak_rss_mb()}))
+
+
+def main(rows: int, fmt: str, chunk_size: int, skip_all: bool) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "characters.db"
+        start = time.perf_counter()
+        generate(path, rows)
+        print(f"generated {rows} rows in {time.perf_counter() - start:.1f}s ({path.stat().st_size / 1e6:.0f} MB)")
+
+        modes = ["stream"] if skip_all else ["stream", "all"]
+        for mode in modes:
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", mode, "--db", str(path), "--rows", str(rows),
+                 "--format", fmt, "--chunk-size", str(chunk_size)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output)
+            label = f"stream {fmt} (chunk={chunk_size})" if mode == "stream" else "load all + JSON array"
+            print(f"{label:28} {result['seconds']:7.1f}s  {result['rows_per_sec']:10.0f} rows/s  "
+                  f"{result['bytes'] / 1e6:8.1f} MB out  peak RSS {result['peak_rss_mb']:7.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--skip-all", action="store_true", help="不运行一次性加载的对照组")
+    parser.add_argument("--child", choices=["stream", "all"], help=argparse.SUPPRESS)
+    parser.add_argument("--db", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.db, args.child, args.format, args.chunk_size, args.rows)
+    else:
+        main(args.rows, args.format, args.chunk_size, args.skip_all)
@@ -0,0 +1,123 @@
+"""
+字段集（card / detail / full）基准：上游 payload 大小、解析耗时、格式化耗时、响应大小
+
+用与真实 AniList 相近的合成数据（长描述、3 条作品），按每个字段集的 GraphQL
+选择裁剪出上游实际会返回的 payload，然后分别测量 json 解析、格式化和响应序列化。
+
+运行方式:
+    python benchmarks/bench_field_variants.py --characters 50 --rounds 200
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app.services import AniListService  # noqa: E402
+
+
+def parse_selection(selection: str) -> dict:
+    """把 GraphQL 字段选择解析为嵌套 dict（忽略参数）"""
+    tokens = re.findall(r"[{}]|\w+", re.sub(r"\([^)]*\)", "", selection))
+    root: dict = {}
+    stack = [root]
+    last = None
+    for token in tokens:
+        if token == "{":
+            stack[-1][last] = {}
+            stack.append(stack[-1][last])
+        elif token == "}":
+            stack.pop()
+        else:
+            stack[-1][token] = None
+            last = token
+    return root
+
+
+def project(value, spec):
+    """按字段选择裁剪数据，模拟上游只返回选中的字段"""
+    if spec is None or value is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, spec) for item in value]
+    return {key: project(value.get(key), sub) for key, sub in spec.items() if key in value}
+
+
+def make_character(i: int) -> dict:
+    return {
+        "id": i,
+        "name": {
+            "first": "Asuna", "middle": None, "last": "Yuuki", "full": f"Asuna Yuuki {i}",
+            "native": "結城明日奈", "alternative": ["Asuna", "Lightning Flash", "Flash"],
+        },
+        "image": {
+            "large": f"https://s4.anilist.co/file/anilistcdn/character/large/b{i}-abcdef.png",
+            "medium": f"https://s4.anilist.co/file/anilistcdn/character/medium/b{i}-abcdef.png",
+        },
+        "description": ("__Height:__ 168 cm\n" + "Asuna is the sub-leader of the Knights of the Blood. " * 30),
+        "gender": "Female",
+        "dateOfBirth": {"year": None, "month": 9, "day": 30},
+        "age": "17",
+        "bloodType": "O",
+        "favourites": 30000 - i,
+        "siteUrl": f"https://anilist.co/character/{i}",
+        "media": {"edges": [
+            {"node": {"id": 11757 + k, "title": {"romaji": "Sword Art Online", "english": "Sword Art Online",
+                                                   "native": "ソードアート・オンライン"}, "type": "ANIME"}}
+            for k in range(3)
+        ]},
+    }
+
+
+def measure(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main(count: int, rounds: int) -> None:
+    full = [make_character(i) for i in range(count)]
+    print(f"characters={count} rounds={rounds}")
+    print(f"{'variant':8} {'upstream B':>11} {'parse ms':>9} {'format ms':>10} {'response B':>11} {'serialize ms':>13}")
+
+    rows = {}
+    for fields, selection in AniListService.FIELD_VARIANTS.items():
+        raw = json.dumps({"data": {"Page": {"characters": project(full, parse_selection(selection))}}})
+        formatter = AniListService.formatter_for(fields)
+        characters = json.loads(raw)["data"]["Page"]["characters"]
+        formatted = [formatter(c) for c in characters]
+        body = json.dumps({"code": 0, "message": "success",
+                           "data": {"characters": formatted, "total": len(formatted)}}, ensure_ascii=False)
+
+        row = (
+            len(raw.encode()),
+            measure(lambda: json.loads(raw), rounds),
+            measure(lambda: [formatter(c) for c in characters], rounds),
+            len(body.encode()),
+            measure(lambda: json.dumps({"data": {"characters": formatted}}, ensure_ascii=False), rounds),
+        )
+        rows[fields] = row
+        print(f"{fields:8} {row[0]:>11} {row[1]:>9.3f} {row[2]:>10.3f} {row[3]:>11} {row[4]:>13.3f}")
+
+    baseline = rows["full"]
+    print()
+    for fields, row in rows.items():
+        if fields == "full":
+            continue
+        print(f"{fields}: upstream bytes -{1 - row[0] / baseline[0]:.0%}, "
+              f"parse -{1 - row[1] / baseline[1]:.0%}, "
+              f"format -{1 - row[2] / baseline[2]:.0%}, "
+              f"response bytes -{1 - row[3] / baseline[3]:.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--characters", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    main(args.characters, args.rounds)
@@ -0,0 +1,78 @@
+"""
+对冲请求基准：本地桩服务的延迟有长尾（默认 5% 的请求慢 500ms），
+对比关闭和开启对冲请求时的 p50 / p95 / p99 延迟和额外请求数。
+
+运行方式:
+    python benchmarks/bench_hedging.py --requests 400 --tail-ratio 0.05
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tests"))
+
+from app.config import settings  # noqa: E402
+from app.services import anilist  # noqa: E402
+from app.services import AniListService, close_client, get_latency_tracker  # noqa: E402
+from stub_server import AniListStub, default_handler  # noqa: E402
+
+
+def make_handler(base: float, tail: float, tail_ratio: float, seed: int):
+    rng = random.Random(seed)
+
+    def handler(payload, stub):
+        time.sleep(tail if rng.random() < tail_ratio else base * (0.5 + rng.random()))
+        return default_handler(payload, stub)
+
+    return handler
+
+
+async def run(requests: int, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await AniListService.search_characters(f"name-{i}")
+            timings.append((time.perf_counter() - start) * 1000)
+
+    try:
+        await asyncio.gather(*(one(i) for i in range(requests)))
+    finally:
+        await close_client()
+    return sorted(timings)
+
+
+def main(requests: int, concurrency: int, base: float, tail: float, tail_ratio: float) -> None:
+    settings.anilist_rate_limit = 100_000
+    for hedge in (False, True):
+        # 每轮使用全新的调度器和延迟统计
+        anilist._scheduler = None
+        anilist._latency = None
+        settings.anilist_hedge_enabled = hedge
+        with AniListStub(handler=make_handler(base, tail, tail_ratio, seed=1)) as stub:
+            settings.anilist_api_url = stub.url
+            timings = asyncio.run(run(requests, concurrency))
+            upstream = stub.request_count
+        p = lambda q: timings[min(len(timings) - 1, int(q * len(timings)))]  # noqa: E731
+        print(f"hedge={'on ' if hedge else 'off'} p50={statistics.median(timings):6.1f}ms "
+              f"p95={p(0.95):6.1f}ms p99={p(0.99):6.1f}ms upstream_requests={upstream} "
+              f"hedged={get_latency_tracker().hedged} hedge_wins={get_latency_tracker().hedge_wins}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--base", type=float, default=0.02, help="正常请求的平均延迟（秒）")
+    parser.add_argument("--tail", type=float, default=0.5, help="慢请求的延迟（秒）")
+    parser.add_argument("--tail-ratio", type=float, default=0.05)
+    args = parser.parse_args()
+    main(args.requests, args.concurrency, args.base, args.tail, args.tail_ratio)
@@ -0,0 +1,102 @@
+"""
+图片代理基准：模拟角色列表页加载 N 张角色图片
+
+本地图片源站每个请求延迟 --origin-delay 毫秒（模拟公网 CDN），图片是 460x690 的 JPEG
+（AniList large 尺寸）。像浏览器一样最多 --concurrency 个并发请求，对比：
+    direct     直接从源站下载原图（改造前）
+    proxy-cold 第一次经代理请求 w=240 缩略图（下载原图 + 生成缩略图）
+    proxy-warm 之后的请求（从磁盘缓存返回）
+    revalidate 浏览器带 If-None-Match 验证缓存（304）
+报告总耗时和传输字节数。需要安装 Pillow。
+
+运行方式:
+    python benchmarks/bench_image_proxy.py --images 60 --origin-delay 80
+"""
+import argparse
+import asyncio
+import io
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tests"))
+
+import httpx  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import close_image_cache  # noqa: E402
+from stub_server import ImageOrigin  # noqa: E402
+
+
+def artwork(seed: int) -> bytes:
+    """随机噪点 + 色块，压缩率接近真实插画"""
+    rng = random.Random(seed)
+    image = Image.effect_noise((460, 690), 40).convert("RGB")
+    overlay = Image.new("RGB", (460, 690), tuple(rng.randrange(256) for _ in range(3)))
+    buffer = io.BytesIO()
+    Image.blend(image, overlay, 0.6).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+async def render(client: httpx.AsyncClient, urls: list, concurrency: int, etags: dict = None, collect: dict = None):
+    semaphore = asyncio.Semaphore(concurrency)
+    transferred = 0
+
+    async def one(url: str) -> None:
+        nonlocal transferred
+        async with semaphore:
+            headers = {"If-None-Match": etags[url]} if etags else {}
+            response = await client.get(url, headers=headers)
+            assert response.status_code == (304 if etags else 200), response.status_code
+            transferred += len(response.content)
+            if collect is not None:
+                collect[url] = response.headers.get("etag")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(url) for url in urls))
+    return (time.perf_counter() - start) * 1000, transferred
+
+
+async def run(origin: ImageOrigin, images: int, concurrency: int) -> None:
+    sources = [origin.add(f"/character/large/b{i}.jpg", artwork(i), "image/jpeg") for i in range(images)]
+    proxied = [str(httpx.URL("/api/image", params={"url": url, "w": 240})) for url in sources]
+
+    async with httpx.AsyncClient() as direct_client:
+        results = [("direct", await render(direct_client, sources, concurrency))]
+
+    etags = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results.append(("proxy-cold", await render(client, proxied, concurrency, collect=etags)))
+        results.append(("proxy-warm", await render(client, proxied, concurrency)))
+        results.append(("revalidate", await render(client, proxied, concurrency, etags)))
+        stats = (await client.get("/api/image/stats")).json()["data"]
+    await close_image_cache()
+
+    for name, (elapsed, transferred) in results:
+        print(f"{name:11} {elapsed:9.1f}ms  {transferred / 1024:9.1f} KiB  {elapsed / images:7.2f}ms/image")
+    print(f"origin requests={len(origin.requests)} (direct {images} + proxy {len(origin.requests) - images}) "
+          f"cache files={stats['files']} bytes={stats['bytes']}")
+
+
+def main(images: int, delay: float, concurrency: int) -> None:
+    print(f"images={images} origin_delay={delay}ms concurrency={concurrency}")
+    with ImageOrigin(delay=delay / 1000) as origin, tempfile.TemporaryDirectory() as tmp:
+        settings.image_proxy_hosts = [origin.host]
+        settings.image_cache_dir = tmp
+        asyncio.run(run(origin, images, concurrency))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=60)
+    parser.add_argument("--origin-delay", type=float, default=80, help="源站每个请求的延迟（毫秒）")
+    parser.add_argument("--concurrency", type=int, default=6, help="浏览器对同一主机的并发连接数")
+    args = parser.parse_args()
+    main(args.images, args.origin_delay, args.concurrency)
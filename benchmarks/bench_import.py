@@ -0,0 +1,68 @@
+"""
+批量导入基准：生成 AniList 结构的导出文件，导入到临时 SQLite 库，统计吞吐量
+
+对比 NDJSON 单进程解析、NDJSON 多进程解析和 JSON 数组三种情况。
+
+运行方式:
+    python benchmarks/bench_import.py --rows 1000000 --workers 4
+"""
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tests"))
+
+from sqlmodel import SQLModel, create_engine  # noqa: E402
+
+from app.cli.import_characters import import_file  # noqa: E402
+from stub_server import make_character  # noqa: E402
+
+
+def write_dump(path: Path, rows: int, array: bool) -> None:
+    with path.open("w", encoding="utf-8") as f:
+        if array:
+            f.write("[\n")
+        for i in range(1, rows + 1):
+            line = json.dumps(make_character(i, f"Character {i}", i % 100000), ensure_ascii=False)
+            if array:
+                f.write(line + (",\n" if i < rows else "\n"))
+            else:
+                f.write(line + "\n")
+        if array:
+            f.write("]\n")
+
+
+def run(label: str, path: Path, workdir: Path, chunk_size: int, workers: int) -> None:
+    db = workdir / f"{label}.db"
+    engine = create_engine(f"sqlite:///{db}")
+    SQLModel.metadata.create_all(engine)
+    stats = import_file(path, engine, chunk_size=chunk_size, workers=workers, progress_every=1e9)
+    engine.dispose()
+    print(f"{label:22} rows={stats.rows} elapsed={stats.elapsed:6.1f}s rate={stats.rate:9.0f} rows/s")
+
+
+def main(rows: int, chunk_size: int, workers: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        ndjson = workdir / "dump.ndjson"
+        array = workdir / "dump.json"
+        write_dump(ndjson, rows, array=False)
+        write_dump(array, rows, array=True)
+        print(f"dump size: {ndjson.stat().st_size / 1e6:.0f} MB")
+
+        run("ndjson", ndjson, workdir, chunk_size, 0)
+        run(f"ndjson workers={workers}", ndjson, workdir, chunk_size, workers)
+        run("json array", array, workdir, chunk_size, 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    main(args.rows, args.chunk_size, args.workers)
@@ -0,0 +1,158 @@
+"""
+排行榜基准：全表读取后在 Python 里排序筛选 vs 索引查询 vs 内存榜单
+
+在临时 sqlite 文件库里写入 N 个角色（默认 100 万），依次测量：
+1. 现在的做法：读取全表（和 /api/getallcharacters 一样的 SELECT），在 Python 里筛选并排序取前 10
+2. 没有索引时的 ORDER BY ... LIMIT 查询（查询计划和耗时）
+3. 创建索引（ensure_indexes）后的同样查询：收藏数前 10、按性别、按名字前缀
+4. 内存榜单（Leaderboard）
+
+运行方式:
+    python benchmarks/bench_leaderboard.py --rows 1000000
+"""
+import argparse
+import asyncio
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.dialects import sqlite  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlmodel import SQLModel, select  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+from app.database import ensure_indexes  # noqa: E402
+from app.models import Character  # noqa: E402
+from app.services import LEADERBOARD_COLUMNS, Leaderboard, query_top  # noqa: E402
+from app.services.leaderboard import rank_key, top_filters  # noqa: E402
+
+SYLLABLES = ["a", "su", "na", "mi", "ka", "sa", "re", "mu", "ri", "to", "yu", "ki", "ha", "ru", "ko"]
+CASES = [("top 10", None, None), ("Female top 10", "Female", None), ("prefix 'asu' top 10", None, "asu")]
+
+
+def populate(path: Path, rows: int) -> None:
+    """用 sqlite3 直接批量写入（只建表，不建索引，相当于现在的表结构）"""
+    rng = random.Random(1)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE characters (id INTEGER PRIMARY KEY, name_full VARCHAR(100), name_native VARCHAR(100), "
+        "gender VARCHAR(20), age VARCHAR(20), favourites INTEGER, image_url VARCHAR(300), description TEXT, "
+        "site_url VARCHAR(300))"
+    )
+
+    def generate():
+        for i in range(1, rows + 1):
+            name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+            yield (
+                i, f"{name} {i}", None, rng.choice(("Female", "Male", None)), "17",
+                int(rng.paretovariate(1.2) * 10), f"https://s4.anilist.co/character/medium/b{i}.png",
+                "Lorem ipsum dolor sit amet.", f"https://anilist.co/character/{i}",
+            )
+
+    conn.executemany("INSERT INTO characters VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", generate())
+    conn.commit()
+    conn.close()
+
+
+def plan(path: Path, gender, prefix) -> str:
+    columns = [getattr(Character, name) for name in LEADERBOARD_COLUMNS]
+    statement = select(*columns).order_by(Character.favourites.desc(), Character.id.desc()).limit(10)
+    for condition in top_filters(gender, prefix, "sqlite"):
+        statement = statement.where(condition)
+    compiled = statement.compile(dialect=sqlite.dialect())
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {compiled}", tuple(compiled.params.values())).fetchall()
+    return " / ".join(row[3] for row in rows)
+
+
+async def timed(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+async def run(path: Path, repeat: int) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+    async def fetch_everything(gender=None, prefix=None):
+        """现在的做法：读取整张表，在 Python 里筛选排序"""
+        async with AsyncSession(engine) as session:
+            rows = (await session.exec(select(Character))).all()
+        folded = prefix.casefold() if prefix else None
+        matching = [
+            r for r in rows
+            if (not gender or r.gender == gender) and (not folded or (r.name_full or "").casefold().startswith(folded))
+        ]
+        return sorted(matching, key=lambda r: rank_key(r.model_dump()), reverse=True)[:10]
+
+    async def indexed(gender=None, prefix=None):
+        async with AsyncSession(engine) as session:
+            return await query_top(session, 10, gender, prefix)
+
+    print("\n[1] fetch everything + sort in Python (ORM objects, as /api/getallcharacters)")
+    print(f"    top 10: {await timed(fetch_everything, 1):10.1f} ms")
+
+    print("\n[2] ORDER BY favourites DESC LIMIT 10 without indexes")
+    for name, gender, prefix in CASES:
+        ms = await timed(lambda: indexed(gender, prefix), repeat)
+        print(f"    {name:20} {ms:10.2f} ms  plan: {plan(path, gender, prefix)}")
+
+    start = time.perf_counter()
+    sync_engine = create_engine(f"sqlite:///{path}")
+    # 先补建其他表（已有的 characters 表不动），ensure_indexes 会给所有表建索引
+    SQLModel.metadata.create_all(sync_engine)
+    ensure_indexes(sync_engine)
+    sync_engine.dispose()
+    print(f"\n[3] with indexes (ensure_indexes took {time.perf_counter() - start:.1f}s)")
+    for name, gender, prefix in CASES:
+        ms = await timed(lambda: indexed(gender, prefix), repeat)
+        print(f"    {name:20} {ms:10.3f} ms  plan: {plan(path, gender, prefix)}")
+
+    board = Leaderboard(size=200, ttl=0)
+    async with AsyncSession(engine) as session:
+        start = time.perf_counter()
+        await board.ensure_loaded(session)
+        load_ms = (time.perf_counter() - start) * 1000
+    print(f"\n[4] in-memory leaderboard (size 200, load {load_ms:.2f} ms)")
+    for name, gender, prefix in CASES:
+        async def cached():
+            return board.top(10, gender, prefix)
+        result = board.top(10, gender, prefix)
+        ms = await timed(cached, repeat)
+        source = "board" if result is not None else "board miss -> indexed query"
+        print(f"    {name:20} {ms:10.4f} ms  ({source})")
+    row = {"id": 10 ** 7, "name_full": "Asuna New", "gender": "Female", "favourites": 10 ** 6}
+    start = time.perf_counter()
+    for i in range(1000):
+        board.apply(dict(row, id=row["id"] + i, favourites=row["favourites"] + i))
+    print(f"    incremental update: {(time.perf_counter() - start):.4f} ms per save")
+
+    await engine.dispose()
+
+
+def main(rows: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        start = time.perf_counter()
+        populate(path, rows)
+        print(f"rows={rows} (populated in {time.perf_counter() - start:.1f}s)")
+        asyncio.run(run(path, repeat))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -0,0 +1,103 @@
+"""
+本地搜索索引基准：100k+ 角色的建索引耗时、内存和查询延迟
+
+名字由随机假名音节组合而成（原名为片假名，全名为对应罗马字），
+查询包含精确名、前缀、拼写错误、假名和汉字几类。
+
+运行方式:
+    python benchmarks/bench_local_search.py --characters 100000
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app.services.search_index import LocalSearchIndex, kana_to_romaji  # noqa: E402
+
+SYLLABLES = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわん"
+KANJI = "結城明日奈桐谷和人御坂美琴高坂桐乃宮園薫五条悟釘崎野薔薇"
+
+
+def make_names(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    names = []
+    for i in range(count):
+        given = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        family = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        romaji = f"{kana_to_romaji(given).title()} {kana_to_romaji(family).title()}"
+        katakana = "".join(chr(ord(ch) + 0x60) for ch in family + given)
+        kanji = "".join(rng.choice(KANJI) for _ in range(4)) if i % 4 == 0 else None
+        names.append((i + 1, romaji, katakana, kanji, rng.randint(0, 100000)))
+    return names
+
+
+def typo(text: str, rng: random.Random) -> str:
+    i = rng.randrange(1, len(text) - 1)
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def main(count: int, queries: int) -> None:
+    names = make_names(count)
+    rng = random.Random(7)
+
+    start = time.perf_counter()
+    index = LocalSearchIndex()
+    for char_id, romaji, katakana, kanji, favourites in names:
+        index.add(char_id, (romaji, katakana, kanji), favourites)
+    index.search("a", 1)  # 首次查询时合并前缀数组
+    build = time.perf_counter() - start
+
+    # tracemalloc 会显著拖慢建索引，内存用 1/10 的数据量估算
+    tracemalloc.start()
+    sample_index = LocalSearchIndex()
+    for char_id, romaji, katakana, kanji, favourites in names[:count // 10]:
+        sample_index.add(char_id, (romaji, katakana, kanji), favourites)
+    sample_index.search("a", 1)
+    memory = tracemalloc.get_traced_memory()[0] / 1e6 * 10
+    tracemalloc.stop()
+    del sample_index
+    print(f"characters={count} build={build:.2f}s memory≈{memory:.0f} MB stats={index.stats()}")
+
+    samples = [rng.choice(names) for _ in range(queries)]
+    kinds = {
+        "exact romaji": lambda n: n[1],
+        "prefix": lambda n: n[1][:4],
+        "typo": lambda n: typo(n[1], rng),
+        "katakana": lambda n: n[2],
+        "kanji": lambda n: n[3] or n[2],
+    }
+    for kind, make_query in kinds.items():
+        timings = []
+        hits = 0
+        for sample in samples:
+            query = make_query(sample)
+            start = time.perf_counter()
+            result = index.search(query, 5)
+            timings.append((time.perf_counter() - start) * 1000)
+            if kind == "prefix":
+                # 前缀查询命中很多角色，只检查返回的角色都有以该前缀开头的词
+                prefix = query.lower().strip()
+                hits += bool(result) and all(
+                    any(f" {prefix}" in f" {form}" for form in index.names_of(i))
+                    for i in result
+                )
+            else:
+                hits += sample[0] in result
+        timings.sort()
+        metric = "precision" if kind == "prefix" else "recall@5"
+        print(f"{kind:13} p50={statistics.median(timings):6.3f}ms "
+              f"p99={timings[int(len(timings) * 0.99) - 1]:6.3f}ms {metric}={hits / len(samples):.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--characters", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+    main(args.characters, args.queries)
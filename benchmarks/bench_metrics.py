@@ -0,0 +1,168 @@
+"""
+监控指标开销基准
+
+1. 采集器单次操作的耗时：分片计数器 / 直方图 vs 加锁实现，单线程和多线程
+2. 端到端：通过 ASGI 直接调用应用（不经过网络），对比关闭、只开监控指标、再加上请求分阶段计时时
+   /api/character/save/stats（几乎不做事，最坏情况）和 /api/getallcharacters
+   （临时 sqlite 文件库里 N 个角色，包含数据库语句计时）的每请求耗时
+
+运行方式:
+    python benchmarks/bench_metrics.py --ops 200000 --requests 2000 --rows 200
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import httpx  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.database import get_async_engine, get_async_session, upsert_characters  # noqa: E402
+from app.main import create_app  # noqa: E402
+from app.metrics import Counter, Histogram, Registry, instrument_engine  # noqa: E402
+from app.models import Character  # noqa: E402
+
+
+URLS = ("/api/character/save/stats", "/api/getallcharacters")
+# 对比的配置：全部关闭、只开监控指标、监控指标 + 请求分阶段计时（Server-Timing、慢请求日志）
+CONFIGS = {
+    "off": {"metrics_enabled": False, "server_timing_enabled": False, "slow_request_ms": 0},
+    "metrics": {"metrics_enabled": True, "server_timing_enabled": False, "slow_request_ms": 0},
+    "timing": {"metrics_enabled": True, "server_timing_enabled": True, "slow_request_ms": 1000},
+}
+
+
+class LockedCounter:
+    """对照组：每次加一都加锁"""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self):
+        with self._lock:
+            self.value += 1
+
+
+def per_op(fn, ops: int, threads: int) -> float:
+    """每次操作的平均耗时（纳秒，所有线程合计的吞吐量换算）"""
+    def work():
+        for _ in range(ops):
+            fn()
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (ops * threads) * 1e9
+
+
+def bench_collectors(ops: int) -> None:
+    registry = Registry()
+    counter = Counter("bench_total", "", ["route"], registry=registry)
+    histogram = Histogram("bench_seconds", "", ["route"], registry=registry)
+    child_counter = counter.labels("/api")
+    child_histogram = histogram.labels("/api")
+    locked = LockedCounter()
+    cases = [
+        ("counter.labels().inc()", lambda: counter.labels("/api").inc()),
+        ("counter child inc()", child_counter.inc),
+        ("histogram.labels().observe()", lambda: histogram.labels("/api").observe(0.0123)),
+        ("histogram child observe()", lambda: child_histogram.observe(0.0123)),
+        ("locked counter inc()", locked.inc),
+    ]
+    for threads in (1, 4):
+        for name, fn in cases:
+            print(f"{name:30} threads={threads}  {per_op(fn, ops // threads, threads):7.0f} ns/op")
+    print(f"render: {len(registry.render())} bytes")
+
+
+async def measure(client: httpx.AsyncClient, url: str, requests: int) -> float:
+    for _ in range(min(20, requests)):
+        await client.get(url)
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get(url)
+        timings.append((time.perf_counter() - start) * 1e6)
+        assert response.status_code == 200
+    return statistics.median(timings)
+
+
+async def bench_requests(path: Path, rows: int, requests: int, rounds: int = 5) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        await upsert_characters(session, [
+            Character(id=i, name_full=f"Character {i}", favourites=i) for i in range(1, rows + 1)
+        ])
+
+    # 每个配置一个引擎，开启监控的挂上语句计时监听
+    engines = {}
+    clients = {}
+    for name, options in CONFIGS.items():
+        for key, value in options.items():
+            setattr(settings, key, value)
+        engines[name] = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        if name != "off":
+            instrument_engine(engines[name])
+
+        def session_override(bound=engines[name]):
+            async def override():
+                async with AsyncSession(bound, expire_on_commit=False) as session:
+                    yield session
+            return override
+
+        app = create_app()
+        app.dependency_overrides[get_async_session] = session_override()
+        app.dependency_overrides[get_async_engine] = lambda bound=engines[name]: bound
+        clients[name] = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    # 各组交替测量多轮，取中位数，减少机器负载波动的影响
+    results = {(url, name): [] for url in URLS for name in CONFIGS}
+    for url in URLS:
+        for _ in range(rounds):
+            for name in CONFIGS:
+                results[(url, name)].append(await measure(clients[name], url, requests // rounds))
+    for client in clients.values():
+        await client.aclose()
+    for bound in (engine, *engines.values()):
+        await bound.dispose()
+    results = {key: statistics.median(values) for key, values in results.items()}
+
+    for url in URLS:
+        off = results[(url, "off")]
+        line = f"{url:28} off={off:8.1f}us"
+        for name in list(CONFIGS)[1:]:
+            on = results[(url, name)]
+            line += f"  {name}={on:8.1f}us ({on - off:+6.1f}us {(on - off) / off:+.1%})"
+        print(line)
+
+
+def main(ops: int, requests: int, rows: int) -> None:
+    print(f"ops={ops} requests={requests} rows={rows}")
+    bench_collectors(ops)
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(bench_requests(Path(tmp) / "bench.db", rows, requests))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=200)
+    args = parser.parse_args()
+    main(args.ops, args.requests, args.rows)
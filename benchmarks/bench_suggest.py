@@ -0,0 +1,90 @@
+"""
+输入联想索引微基准：建索引耗时、内存、不同前缀长度的联想延迟和增量插入延迟
+
+运行方式:
+    python benchmarks/bench_suggest.py --characters 50000
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app.services.search_index import kana_to_romaji  # noqa: E402
+from app.services.suggest import SuggestIndex  # noqa: E402
+
+SYLLABLES = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわん"
+
+
+def make_names(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    names = []
+    for i in range(count):
+        given = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        family = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        full = f"{kana_to_romaji(given).title()} {kana_to_romaji(family).title()}"
+        native = "".join(chr(ord(ch) + 0x60) for ch in family + given)
+        names.append((i + 1, full, native, rng.randint(0, 100000)))
+    return names
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def main(count: int, queries: int) -> None:
+    names = make_names(count)
+    rng = random.Random(7)
+
+    def build():
+        index = SuggestIndex(max_entries=count)
+        for char_id, full, native, favourites in names:
+            index.add(char_id, full, native, favourites, saved=True)
+        return index
+
+    tracemalloc.start()
+    sample = build()
+    memory = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+    del sample
+
+    start = time.perf_counter()
+    index = build()
+    build_time = time.perf_counter() - start
+    print(f"characters={count} build={build_time:.2f}s memory={memory:.0f} MB stats={index.stats()}")
+
+    samples = [rng.choice(names) for _ in range(queries)]
+    for length in (1, 2, 3, 5):
+        timings = []
+        for _, full, _, _ in samples:
+            query = full[:length]
+            start = time.perf_counter()
+            index.suggest(query, 10)
+            timings.append((time.perf_counter() - start) * 1000)
+        p50, p99 = percentiles(timings)
+        print(f"prefix len={length}  p50={p50:6.3f}ms p99={p99:6.3f}ms")
+
+    # 增量插入（更新收藏数）后立即查询
+    timings = []
+    for i in range(queries):
+        char_id, full, native, favourites = names[rng.randrange(count)]
+        start = time.perf_counter()
+        index.add(char_id, full, native, favourites + 1, saved=True)
+        index.suggest(full[:3], 10)
+        timings.append((time.perf_counter() - start) * 1000)
+    p50, p99 = percentiles(timings)
+    print(f"insert+query  p50={p50:6.3f}ms p99={p99:6.3f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--characters", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+    main(args.characters, args.queries)
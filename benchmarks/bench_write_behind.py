@@ -0,0 +1,114 @@
+"""
+写后缓冲基准：/api/character/save 直接写库 vs 写后缓冲
+
+在临时 sqlite 文件库上并发发送保存请求（热门角色被反复保存，id 按 Zipf 分布），
+分别报告每秒保存数、数据库提交次数和每秒提交次数、保存请求的 p50 / p99 延迟。
+
+运行方式:
+    python benchmarks/bench_write_behind.py --requests 3000 --concurrency 32
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.database import get_async_engine, get_async_session  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import close_write_behind  # noqa: E402
+
+
+def payload(char_id: int, favourites: int) -> dict:
+    return {
+        "id": char_id,
+        "name": {"full": f"Character {char_id}", "native": "キャラクター"},
+        "image": {"medium": f"https://s4.anilist.co/character/medium/b{char_id}.png"},
+        "description": "Lorem ipsum dolor sit amet. " * 8,
+        "gender": "Female", "age": "17", "favourites": favourites,
+        "siteUrl": f"https://anilist.co/character/{char_id}",
+    }
+
+
+async def run(path: Path, ids: list, concurrency: int) -> dict:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    commits = [0]
+    event.listen(engine.sync_engine, "commit", lambda conn: commits.__setitem__(0, commits[0] + 1))
+
+    async def session_override():
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = session_override
+    app.dependency_overrides[get_async_engine] = lambda: engine
+    pending = iter(enumerate(ids))
+    timings = []
+    errors = [0]
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        for i, char_id in pending:
+            start = time.perf_counter()
+            response = await client.post("/api/character/save", json=payload(char_id, i))
+            timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                # 直接写库时同一个新角色的并发保存会冲突（merge 先查后插）
+                errors[0] += 1
+
+    transport = httpx.ASGITransport(app=app)
+    start = time.perf_counter()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    # 关闭时写完缓冲，计入总耗时
+    await close_write_behind()
+    elapsed = time.perf_counter() - start
+    app.dependency_overrides.clear()
+    await engine.dispose()
+
+    timings.sort()
+    return {
+        "elapsed": elapsed,
+        "commits": commits[0],
+        "errors": errors[0],
+        "p50": statistics.median(timings),
+        "p99": timings[min(len(timings) - 1, int(0.99 * len(timings)))],
+    }
+
+
+def main(requests: int, concurrency: int, characters: int, seed: int) -> None:
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, characters + 1)]
+    ids = rng.choices(range(1, characters + 1), weights=weights, k=requests)
+    print(f"requests={requests} concurrency={concurrency} distinct_ids={len(set(ids))}")
+    for enabled in (False, True):
+        settings.write_behind_enabled = enabled
+        with tempfile.TemporaryDirectory() as tmp:
+            result = asyncio.run(run(Path(tmp) / "bench.db", ids, concurrency))
+        print(
+            f"write_behind={'on ' if enabled else 'off'} {requests / result['elapsed']:8.0f} saves/s  "
+            f"commits={result['commits']:6d} ({result['commits'] / result['elapsed']:7.0f}/s)  "
+            f"p50={result['p50']:6.2f}ms p99={result['p99']:6.2f}ms errors={result['errors']}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--characters", type=int, default=500, help="不同角色的数量")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    main(args.requests, args.concurrency, args.characters, args.seed)
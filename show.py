@@ -1,59 +1,33 @@
-import requests
+"""
+AniList 角色搜索命令行工具
+
+运行方式:
+    python show.py                          交互式搜索一个名字
+    python show.py --batch names.txt        批量搜索文件中的名字（每行一个）
+    cat names.txt | python show.py --batch -
+
+批量模式并发搜索（共享 HTTP 连接池，按 --rate 限流），每个名字搜索完成后
+立即向标准输出写一行 NDJSON，最后在标准错误输出汇总信息。
+"""
+import argparse
+import asyncio
 import json
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO
+
+import requests
 
-ANILIST_API_URL = "https://graphql.anilist.co"
+from app.config import settings
+from app.services import AniListService, close_client
+
+ANILIST_API_URL = settings.anilist_api_url
 
 
 def search_characters_from_anilist(search_name: str, per_page: int = 5):
     """
     从 AniList API 搜索角色（返回多个结果）
     """
-    query = '''
-    query ($search: String, $page: Int, $perPage: Int) {
-      Page(page: $page, perPage: $perPage) {
-        characters(search: $search, sort: FAVOURITES_DESC) {
-          id
-          name {
-            first
-            middle
-            last
-            full
-            native
-            alternative
-          }
-          image {
-            large
-            medium
-          }
-          description
-          gender
-          dateOfBirth {
-            year
-            month
-            day
-          }
-          age
-          bloodType
-          favourites
-          siteUrl
-          media(page: 1, perPage: 3, sort: POPULARITY_DESC) {
-            edges {
-              node {
-                id
-                title {
-                  romaji
-                  english
-                  native
-                }
-                type
-              }
-            }
-          }
-        }
-      }
-    }
-    '''
-
     variables = {
         'search': search_name,
         'page': 1,
@@ -67,7 +41,7 @@ def search_characters_from_anilist(search_name: str, per_page: int = 5):
 
     response = requests.post(
         ANILIST_API_URL,
-        json={'query': query, 'variables': variables},
+        json={'query': AniListService.QUERY, 'variables': variables},
         headers=headers,
         timeout=10
     )
@@ -82,13 +56,92 @@ def search_characters_from_anilist(search_name: str, per_page: int = 5):
         raise Exception(f"AniList API 请求失败: {response.status_code}")
 
 
-if __name__ == "__main__":
-    # 交互式输入搜索角色名
+def read_names(lines: Iterable[str]) -> Iterator[str]:
+    """逐行读取名字，跳过空行和 # 开头的注释"""
+    for line in lines:
+        name = line.strip()
+        if name and not name.startswith('#'):
+            yield name
+
+
+async def run_batch(
+    names: Iterable[str],
+    workers: int = 8,
+    per_page: int = 5,
+    out: TextIO = sys.stdout
+) -> Dict[str, Any]:
+    """
+    并发搜索一组名字，每完成一个就写出一行 NDJSON
+
+    Args:
+        names: 名字（可以是惰性迭代器，按需读取）
+        workers: 同时进行的搜索数量
+        per_page: 每个名字返回的结果数量
+        out: NDJSON 输出流
+
+    Returns:
+        汇总信息（总数、成功、无结果、失败、耗时、吞吐量）
+    """
+    summary = {'total': 0, 'ok': 0, 'empty': 0, 'errors': 0}
+    pending = iter(names)
+    start = time.perf_counter()
+
+    async def worker() -> None:
+        # 所有 worker 共享同一个迭代器，名字不会一次全部读入内存
+        for name in pending:
+            summary['total'] += 1
+            started = time.perf_counter()
+            try:
+                characters = await AniListService.search_characters(name, per_page)
+            except Exception as e:
+                summary['errors'] += 1
+                record = {'name': name, 'error': str(e)}
+            else:
+                summary['ok' if characters else 'empty'] += 1
+                record = {'name': name, 'count': len(characters), 'characters': characters}
+            record['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+
+    await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+
+    elapsed = time.perf_counter() - start
+    summary['elapsed'] = round(elapsed, 3)
+    summary['names_per_second'] = round(summary['total'] / elapsed, 2) if elapsed else 0.0
+    return summary
+
+
+async def batch_main(source: TextIO, workers: int, per_page: int) -> Dict[str, Any]:
+    """批量模式入口：搜索完成后关闭共享连接池"""
+    try:
+        return await run_batch(read_names(source), workers, per_page)
+    finally:
+        await close_client()
+
+
+def configure_batch(rate: int, max_wait: float) -> None:
+    """
+    批量模式的上游设置：宁可排队等待也不要因为限流直接失败
+
+    AniList 请求的截止时间包含 429 之后的排队重试，按 --max-wait 放宽，
+    否则排队超过 anilist_deadline 就会超时失败并计入熔断器。
+
+    Args:
+        rate: 每分钟最多请求数（上游声明的额度更大时也不超过它）
+        max_wait: 单次排队等待的最长秒数
+    """
+    settings.anilist_rate_limit = rate
+    settings.anilist_max_queue_wait = max_wait
+    settings.anilist_deadline = settings.anilist_deadline + max_wait * settings.anilist_max_retries
+
+
+def interactive(per_page: int) -> None:
+    """交互式输入搜索角色名"""
     name = input("请输入要搜索的角色名字: ").strip() or "Asuna"
     print(f"正在搜索: {name}\n")
 
     try:
-        results = search_characters_from_anilist(name, per_page=5)
+        results = search_characters_from_anilist(name, per_page=per_page)
         print(f"共找到 {len(results)} 个角色\n")
 
         for i, char in enumerate(results, 1):
@@ -109,3 +162,36 @@ if __name__ == "__main__":
 
     except Exception as e:
         print("请求出错:", e)
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch', metavar='FILE', help='批量模式：名字文件，- 表示标准输入')
+    parser.add_argument('--workers', type=int, default=8, help='同时进行的搜索数量')
+    parser.add_argument('--per-page', type=int, default=5, help='每个名字返回的结果数量')
+    parser.add_argument('--rate', type=int, default=settings.anilist_rate_limit, help='每分钟最多请求数')
+    parser.add_argument('--max-wait', type=float, default=600, help='单个请求排队等待限流的最长时间（秒）')
+    args = parser.parse_args(argv)
+
+    if args.batch is None:
+        interactive(args.per_page)
+        return 0
+
+    configure_batch(args.rate, args.max_wait)
+
+    if args.batch == '-':
+        summary = asyncio.run(batch_main(sys.stdin, args.workers, args.per_page))
+    else:
+        with open(args.batch, encoding='utf-8') as source:
+            summary = asyncio.run(batch_main(source, args.workers, args.per_page))
+
+    print(
+        f"完成 {summary['total']} 个名字：成功 {summary['ok']}，无结果 {summary['empty']}，"
+        f"失败 {summary['errors']}，耗时 {summary['elapsed']} 秒，{summary['names_per_second']} 个/秒",
+        file=sys.stderr
+    )
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
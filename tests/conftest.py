@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import get_async_engine, get_async_session
+from app.services import anilist, feed, images, leaderboard, search_index, suggest, write_behind
+from stub_server import AniListStub
+
+
+@pytest.fixture(autouse=True)
+def reset_anilist_state(monkeypatch):
+    """每个测试使用全新的连接池、缓存、请求合并器、限流调度器、本地索引、写后缓冲、变更推送、排行榜和图片缓存"""
+    # httpx 连接池绑定在创建它的事件循环上，不同测试的事件循环不能共用
+    monkeypatch.setattr(anilist, "_client", None)
+    monkeypatch.setattr(anilist, "_search_cache", None)
+    monkeypatch.setattr(anilist, "_character_cache", None)
+    monkeypatch.setattr(anilist, "_singleflight", None)
+    monkeypatch.setattr(anilist, "_scheduler", None)
+    monkeypatch.setattr(anilist, "_breaker", None)
+    monkeypatch.setattr(anilist, "_latency", None)
+    monkeypatch.setattr(search_index, "_local_index", None)
+    monkeypatch.setattr(suggest, "_suggest_index", None)
+    monkeypatch.setattr(write_behind, "_write_behind", None)
+    monkeypatch.setattr(feed, "_change_feed", None)
+    monkeypatch.setattr(leaderboard, "_leaderboard", None)
+    monkeypatch.setattr(images, "_image_cache", None)
+
+
+@pytest.fixture()
+def anilist_stub(monkeypatch):
+    """启动本地 AniList 桩服务，并把 settings.anilist_api_url 指向它"""
+    with AniListStub() as stub:
+        monkeypatch.setattr(settings, "anilist_api_url", stub.url)
+        yield stub
+
+
+@pytest.fixture()
+def async_engine():
+    """aiosqlite 内存库（StaticPool 共享同一个连接）"""
+    return create_async_engine(
+        "sqlite+aiosqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+
+@pytest.fixture()
+def test_client(async_engine):
+    """Provide a TestClient with an isolated in-memory database."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    async def create_tables():
+        async with async_engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+
+    async def get_session_override():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = get_session_override
+    app.dependency_overrides[get_async_engine] = lambda: async_engine
+    with TestClient(app) as client:
+        client.portal.call(create_tables)
+        yield client
+        client.portal.call(async_engine.dispose)
+    app.dependency_overrides.clear()
@@ -0,0 +1,210 @@
+"""
+本地 AniList GraphQL 桩服务和图片源站
+
+基于 ThreadingHTTPServer，在后台线程里监听 127.0.0.1 的随机端口，
+用于测试和基准脚本，避免访问真实的 graphql.anilist.co 和 s4.anilist.co。
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# handler(payload, stub) -> (状态码, 响应体, 响应头)；状态码为 None 时直接断开连接（模拟故障）
+Handler = Callable[[Dict[str, Any], "AniListStub"], Tuple[int, Any, Dict[str, str]]]
+
+
+def make_character(char_id: int, name: str, favourites: int = 100) -> Dict[str, Any]:
+    """构造一个与 AniList 返回结构一致的角色对象"""
+    return {
+        "id": char_id,
+        "name": {
+            "first": name,
+            "middle": None,
+            "last": None,
+            "full": name,
+            "native": None,
+            "alternative": [],
+        },
+        "image": {"large": f"https://img.example/{char_id}-l.jpg", "medium": f"https://img.example/{char_id}-m.jpg"},
+        "description": f"{name} description",
+        "gender": "Female",
+        "dateOfBirth": {"year": None, "month": 1, "day": 1},
+        "age": "17",
+        "bloodType": "A",
+        "favourites": favourites,
+        "siteUrl": f"https://anilist.co/character/{char_id}",
+        "media": {"edges": []},
+    }
+
+
+def search_results(search: str) -> List[Dict[str, Any]]:
+    """默认的搜索结果：名字里带 missing 的返回空，其它返回一个同名角色"""
+    if "missing" in search:
+        return []
+    return [make_character(sum(search.encode("utf-8")) % 100000, search)]
+
+
+def default_handler(payload: Dict[str, Any], stub: "AniListStub") -> Tuple[int, Any, Dict[str, str]]:
+    """默认行为：按 search 变量返回同名角色，支持批量搜索的别名 c0, c1, ... 和按 id 查询"""
+    variables = payload.get("variables") or {}
+    if "ids" in variables:
+        # id >= 900000 视为不存在
+        characters = [make_character(i, f"Character {i}", 1000 - i % 1000) for i in variables["ids"] if i < 900000]
+        return 200, {"data": {"Page": {"characters": characters}}}, {}
+    if "s0" in variables:
+        data = {}
+        i = 0
+        while f"s{i}" in variables:
+            data[f"c{i}"] = {"characters": search_results(variables[f"s{i}"])}
+            i += 1
+        return 200, {"data": data}, {}
+    search = variables.get("search") or "Unknown"
+    return 200, {"data": {"Page": {"characters": search_results(search)}}}, {}
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    # 默认 backlog 只有 5，并发测试时会被重置连接
+    request_queue_size = 256
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端取消请求（例如对冲请求的落败方）时连接被提前关闭，属于正常情况
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class AniListStub:
+    """本地 GraphQL 桩服务"""
+
+    def __init__(self, handler: Optional[Handler] = None, delay: float = 0.0):
+        self.handler = handler or default_handler
+        self.delay = delay
+        self.requests: List[Dict[str, Any]] = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = _StubHTTPServer(("127.0.0.1", 0), self._make_request_handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def request_count(self) -> int:
+        with self._lock:
+            return len(self.requests)
+
+    def _make_request_handler(self):
+        stub = self
+
+        class _RequestHandler(BaseHTTPRequestHandler):
+            # HTTP/1.1 才能保持 keep-alive 连接
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                with stub._lock:
+                    stub.requests.append(payload)
+                if stub.delay:
+                    time.sleep(stub.delay)
+                status, body, headers = stub.handler(payload, stub)
+                if status is None:
+                    self.close_connection = True
+                    return
+                raw = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def log_message(self, format, *args):
+                pass
+
+        return _RequestHandler
+
+    def start(self) -> "AniListStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "AniListStub":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+class ImageOrigin:
+    """本地图片源站：GET 路径返回 add() 注册的内容，未注册的返回 404"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.files: Dict[str, Tuple[bytes, str]] = {}
+        self.requests: List[str] = []
+        self._lock = threading.Lock()
+        self._server = _StubHTTPServer(("127.0.0.1", 0), self._make_request_handler())
+
+    @property
+    def host(self) -> str:
+        return self._server.server_address[0]
+
+    def url(self, path: str) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+    def add(self, path: str, body: bytes, content_type: str = "image/png") -> str:
+        """注册一个文件，返回它的地址"""
+        self.files[path] = (body, content_type)
+        return self.url(path)
+
+    def count(self, path: str) -> int:
+        with self._lock:
+            return self.requests.count(path)
+
+    def _make_request_handler(self):
+        origin = self
+
+        class _RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with origin._lock:
+                    origin.requests.append(self.path)
+                if origin.delay:
+                    time.sleep(origin.delay)
+                body, content_type = origin.files.get(self.path, (b"not found", "text/plain"))
+                self.send_response(200 if self.path in origin.files else 404)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return _RequestHandler
+
+    def __enter__(self) -> "ImageOrigin":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from app.services import AniListService, close_client
+
+
+def run(coro):
+    """在新的事件循环中运行协程，结束后关闭共享连接池"""
+    async def _main():
+        try:
+            return await coro
+        finally:
+            await close_client()
+
+    return asyncio.run(_main())
+
+
+def test_search_characters_async(anilist_stub):
+    results = run(AniListService.search_characters("Asuna"))
+    assert results[0]["name"]["full"] == "Asuna"
+    assert anilist_stub.requests[0]["variables"]["search"] == "Asuna"
+
+
+def test_concurrent_searches_overlap(anilist_stub):
+    anilist_stub.delay = 0.3
+
+    async def search_many():
+        return await asyncio.gather(*(AniListService.search_and_format(f"name-{i}") for i in range(5)))
+
+    start = time.perf_counter()
+    results = run(search_many())
+    elapsed = time.perf_counter() - start
+
+    assert [r[0]["name"]["full"] for r in results] == [f"name-{i}" for i in range(5)]
+    # 串行需要 1.5s，并发应接近单次延迟
+    assert elapsed < 1.0
+
+
+def test_sequential_searches_reuse_connection(anilist_stub):
+    async def search_sequentially():
+        for name in ("Asuna", "Mikasa", "Rem"):
+            await AniListService.search_characters(name)
+
+    run(search_sequentially())
+    assert anilist_stub.request_count == 3
+    assert anilist_stub.connections == 1
+
+
+def test_non_200_raises(anilist_stub):
+    anilist_stub.handler = lambda payload, stub: (500, {"errors": []}, {})
+    with pytest.raises(Exception, match="500"):
+        run(AniListService.search_characters("Asuna"))
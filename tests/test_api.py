@@ -7,10 +7,12 @@ pytest.importorskip("fastapi")
 pytest.importorskip("sqlmodel")
 
 from fastapi.testclient import TestClient
-from sqlmodel import Session, SQLModel, create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.main import app
-from app.database import get_session
+from app.database import get_async_session
 from app.services import AniListService
 
 try:  # pragma: no cover - compatibility shim when allure is unavailable
@@ -32,20 +34,25 @@ except ImportError:  # pragma: no cover - fallback for offline test execution
 @pytest.fixture()
 def test_client(monkeypatch):
     """Provide a TestClient with an isolated in-memory database."""
-    engine = create_engine(
-        "sqlite://",
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
-    SQLModel.metadata.create_all(engine)
 
-    def get_session_override():
-        with Session(engine) as session:
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+
+    async def get_session_override():
+        async with AsyncSession(engine, expire_on_commit=False) as session:
             yield session
 
-    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_async_session] = get_session_override
     with TestClient(app) as client:
+        client.portal.call(create_tables)
         yield client
+        client.portal.call(engine.dispose)
     app.dependency_overrides.clear()
 
 
@@ -65,7 +72,7 @@ def test_search_character_success(monkeypatch, test_client):
         }
     ]
 
-    def fake_search(name: str, per_page: int = 5) -> List[dict]:
+    async def fake_search(name: str, per_page: int = 5) -> List[dict]:
         return mock_characters
 
     monkeypatch.setattr(AniListService, "search_characters", classmethod(lambda cls, *args, **kwargs: fake_search(*args, **kwargs)))
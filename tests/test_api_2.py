@@ -10,7 +10,9 @@ pytest.importorskip("fastapi")
 pytest.importorskip("sqlmodel")
 
 from fastapi.testclient import TestClient
-from sqlmodel import Session, SQLModel, create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 ## 只跑新文件里的测试
 #PYTHONPATH=. pytest tests/test_api_2.py --alluredir=allure-results
@@ -18,7 +20,7 @@ from sqlmodel import Session, SQLModel, create_engine
 #allure serve allure-results
 
 from app.main import app
-from app.database import get_session
+from app.database import get_async_session
 from app.services import AniListService
 
 # ---- Allure 兼容处理：没有安装 allure 也能运行测试 ----
@@ -35,27 +37,32 @@ except ImportError:  # pragma: no cover - fallback for offline test execution
     allure = _AllureStub()
 
 
-# ---- 测试专用客户端：用 sqlite 内存库 + 覆盖 get_session ----
+# ---- 测试专用客户端：用 aiosqlite 内存库 + 覆盖 get_async_session ----
 @pytest.fixture()
 def test_client(monkeypatch):
     """Provide a TestClient with an isolated in-memory database."""
-    # 使用共享内存 sqlite，这样 create_all 创建的表在后续请求中也可见
-    engine = create_engine(
-        "sqlite://",
+    # 使用共享内存 sqlite（StaticPool 只有一个连接），这样 create_all 创建的表在后续请求中也可见
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
-    SQLModel.metadata.create_all(engine)
 
-    def get_session_override():
-        with Session(engine) as session:
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+
+    async def get_session_override():
+        async with AsyncSession(engine, expire_on_commit=False) as session:
             yield session
 
-    # 覆盖掉 get_session，让接口用 sqlite 而不是 MySQL
-    app.dependency_overrides[get_session] = get_session_override
+    # 覆盖掉 get_async_session，让接口用 sqlite 而不是 MySQL
+    app.dependency_overrides[get_async_session] = get_session_override
 
     with TestClient(app) as client:
+        client.portal.call(create_tables)
         yield client
+        client.portal.call(engine.dispose)
 
     app.dependency_overrides.clear()
 
@@ -80,7 +87,7 @@ def test_search_character_success(monkeypatch, test_client):
         }
     ]
 
-    def fake_search(name: str, per_page: int = 5) -> List[dict]:
+    async def fake_search(name: str, per_page: int = 5) -> List[dict]:
         return mock_characters
 
     # 用 monkeypatch 把真实的 AniList 调用替换掉，避免发真实网络请求
@@ -159,10 +166,10 @@ def test_search_character_with_yaml(monkeypatch, test_client, case):
     if query.strip():
         # 根据期望状态码决定返回数据还是空列表
         if case["expect_status"] == 404:
-            def fake_search(name: str, per_page: int = 5) -> List[dict]:
+            async def fake_search(name: str, per_page: int = 5) -> List[dict]:
                 return []  # 返回空列表，模拟未找到
         else:
-            def fake_search(name: str, per_page: int = 5) -> List[dict]:
+            async def fake_search(name: str, per_page: int = 5) -> List[dict]:
                 return [
                     {
                         "id": 1,
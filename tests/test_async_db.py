@@ -0,0 +1,62 @@
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlmodel import select
+
+from app.config import settings
+from app.database import database
+from app.models import Character
+
+
+@pytest.mark.parametrize(
+    "sync_url, async_url",
+    [
+        ("mysql+pymysql://root:pw@127.0.0.1:3306/anime?charset=utf8mb4",
+         "mysql+aiomysql://root:pw@127.0.0.1:3306/anime?charset=utf8mb4"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+        ("sqlite:///./anime.db", "sqlite+aiosqlite:///./anime.db"),
+    ],
+)
+def test_async_database_url(monkeypatch, sync_url, async_url):
+    monkeypatch.setattr(settings, "database_url", sync_url)
+    monkeypatch.setattr(settings, "async_database_url", None)
+    assert database.get_async_database_url() == async_url
+
+
+def test_explicit_async_database_url(monkeypatch):
+    monkeypatch.setattr(settings, "async_database_url", "sqlite+aiosqlite:///other.db")
+    assert database.get_async_database_url() == "sqlite+aiosqlite:///other.db"
+
+
+def test_pool_options_from_settings(monkeypatch):
+    monkeypatch.setattr(settings, "db_pool_size", 3)
+    monkeypatch.setattr(settings, "db_max_overflow", 4)
+    monkeypatch.setattr(settings, "db_pool_recycle", 60)
+    options = database._pool_options("mysql+aiomysql://u:p@localhost/anime")
+    assert options["pool_size"] == 3
+    assert options["max_overflow"] == 4
+    assert options["pool_recycle"] == 60
+    assert database._pool_options("sqlite+aiosqlite://") == {}
+
+
+def test_save_and_list_through_async_session(test_client, async_engine):
+    payload = {
+        "id": 7,
+        "name": {"full": "Mikasa Ackerman", "native": "ミカサ・アッカーマン"},
+        "favourites": 90000,
+        "image": {"medium": "mikasa.jpg"},
+    }
+    assert test_client.post("/api/character/save", json=payload).status_code == 200
+    # 重复保存走 merge 更新
+    payload["favourites"] = 90001
+    assert test_client.post("/api/character/save", json=payload).status_code == 200
+
+    async def load():
+        from sqlmodel.ext.asyncio.session import AsyncSession
+        async with AsyncSession(async_engine) as session:
+            return (await session.exec(select(Character))).all()
+
+    rows = test_client.portal.call(load)
+    assert [(row.id, row.favourites) for row in rows] == [(7, 90001)]
+    assert test_client.get("/api/getallcharacters").json()[0]["name_full"] == "Mikasa Ackerman"
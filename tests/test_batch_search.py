@@ -0,0 +1,56 @@
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services.anilist import build_batch_query
+
+
+def test_build_batch_query_aliases():
+    query = build_batch_query(3)
+    assert "$s2: String" in query
+    assert query.count("Page(page: 1, perPage: $perPage)") == 3
+    assert "c0:" in query and "c2:" in query
+    assert build_batch_query(3) is query
+
+
+def test_batch_search_chunks_requests(anilist_stub, monkeypatch):
+    monkeypatch.setattr(settings, "anilist_batch_size", 10)
+    names = [f"Name {i}" for i in range(20)]
+
+    with TestClient(app) as client:
+        response = client.post("/api/character/search/batch", json={"names": names})
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert list(data["results"]) == names
+    assert all(data["results"][name][0]["name"]["full"] == name for name in names)
+    assert anilist_stub.request_count == 2
+
+
+def test_batch_search_uses_cache_and_reports_not_found(anilist_stub):
+    with TestClient(app) as client:
+        client.get("/api/character/search", params={"name": "Asuna"})
+        response = client.post(
+            "/api/character/search/batch",
+            json={"names": ["Asuna", "Mikasa", "  mikasa ", "missing-xyz", ""]},
+        )
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert list(data["results"]) == ["Asuna", "Mikasa", "mikasa", "missing-xyz"]
+    assert data["results"]["mikasa"] == data["results"]["Mikasa"]
+    assert data["not_found"] == ["missing-xyz"]
+    # 第一次单独搜索 + 一次批量请求（Asuna 命中缓存，两个 Mikasa 合并）
+    assert anilist_stub.request_count == 2
+    assert len([k for k in anilist_stub.requests[1]["variables"] if k.startswith("s")]) == 2
+
+
+def test_batch_search_validation(anilist_stub, monkeypatch):
+    monkeypatch.setattr(settings, "batch_search_max_names", 2)
+    with TestClient(app) as client:
+        assert client.post("/api/character/search/batch", json={"names": ["  "]}).status_code == 400
+        assert client.post("/api/character/search/batch", json={"names": ["a", "b", "c"]}).status_code == 400
@@ -0,0 +1,62 @@
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy.dialects import mysql, sqlite
+
+from app.config import settings
+from app.database import build_upsert
+from app.models import Character
+
+
+def payload(char_id, favourites=10, name=None):
+    return {
+        "id": char_id,
+        "name": {"full": name or f"Character {char_id}", "native": None},
+        "image": {"medium": f"{char_id}.jpg"},
+        "favourites": favourites,
+        "siteUrl": f"https://anilist.co/character/{char_id}",
+    }
+
+
+def test_build_upsert_per_dialect():
+    rows = [Character(id=1, name_full="A").model_dump(), Character(id=2, name_full="B").model_dump()]
+    mysql_sql = str(build_upsert("mysql", Character.__table__, rows).compile(dialect=mysql.dialect()))
+    sqlite_sql = str(build_upsert("sqlite", Character.__table__, rows).compile(dialect=sqlite.dialect()))
+    assert "ON DUPLICATE KEY UPDATE" in mysql_sql
+    assert "ON CONFLICT (id) DO UPDATE" in sqlite_sql
+    with pytest.raises(NotImplementedError):
+        build_upsert("oracle", Character.__table__, rows)
+
+
+def test_batch_save_reports_per_item_results(test_client, monkeypatch):
+    monkeypatch.setattr(settings, "bulk_upsert_chunk_size", 2)
+    assert test_client.post("/api/character/save", json=payload(1, favourites=5)).status_code == 200
+
+    response = test_client.post("/api/character/save/batch", json=[
+        payload(1, favourites=50),
+        payload(2),
+        {"name": {"full": "no id"}},
+        payload(3),
+        payload(4, name="old"),
+        payload(4, name="new"),
+    ])
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert [(item["id"], item["status"]) for item in data["items"]] == [
+        (1, "updated"), (2, "created"), (None, "error"), (3, "created"), (4, "created"), (4, "created"),
+    ]
+    assert (data["saved"], data["failed"]) == (5, 1)
+
+    characters = {c["id"]: c for c in test_client.get("/api/getallcharacters").json()}
+    assert sorted(characters) == [1, 2, 3, 4]
+    assert characters[1]["favourites"] == 50
+    assert characters[4]["name_full"] == "new"
+
+
+def test_batch_save_validation(test_client, monkeypatch):
+    monkeypatch.setattr(settings, "batch_save_max_items", 2)
+    assert test_client.post("/api/character/save/batch", json=[]).status_code == 400
+    assert test_client.post("/api/character/save/batch",
+                            json=[payload(1), payload(2), payload(3)]).status_code == 400
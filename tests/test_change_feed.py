@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+
+import anyio
+import pytest
+
+from app.config import settings
+from app.routers.characters import iter_feed
+from app.services import ChangeFeed, SavedCharacter, get_change_feed
+from stub_server import make_character
+
+
+def saved(*ids, status="created"):
+    return [SavedCharacter(row={"id": char_id, "name_full": f"Character {char_id}"}, status=status) for char_id in ids]
+
+
+def parse_sse(body: bytes):
+    """解析 SSE 文本为 (event, id, data) 列表，忽略注释和 retry"""
+    events = []
+    for block in body.decode("utf-8").split("\n\n"):
+        fields = {}
+        for line in block.split("\n"):
+            if line and not line.startswith(":"):
+                key, _, value = line.partition(": ")
+                fields[key] = value
+        if "event" in fields:
+            events.append((fields["event"], fields.get("id"), json.loads(fields["data"])))
+    return events
+
+
+def test_publish_fans_out_one_shared_batch():
+    feed = ChangeFeed(history=10, queue_size=4)
+    first, _, _ = feed.subscribe()
+    second, _, _ = feed.subscribe()
+    feed.publish(saved(1, 2))
+    feed.publish(saved(1, status="updated"))
+
+    async def drain(subscriber):
+        return await subscriber.get(timeout=0)
+
+    batches = anyio.run(drain, first)
+    assert [[event.type for event in batch.events] for batch in batches] == [["insert", "insert"], ["update"]]
+    # 同一批事件只编码一次，所有订阅者共用
+    assert anyio.run(drain, second)[0] is batches[0]
+    assert json.loads(batches[1].events[0].data)["character"]["id"] == 1
+    assert feed.stats()["published"] == 3
+
+
+def test_resume_from_history_and_reset():
+    feed = ChangeFeed(history=3)
+    feed.publish(saved(1, 2, 3, 4, 5))
+
+    _, backlog, reset = feed.subscribe(feed.parse_cursor(f"{feed.nonce}-3"))
+    assert [event.seq for event in backlog] == [4, 5] and not reset
+
+    # 纯序号表示当前进程
+    _, backlog, reset = feed.subscribe(feed.parse_cursor("5"))
+    assert backlog == [] and not reset
+
+    # 已滚出历史、来自其他进程、或比当前序号还新：需要重新加载
+    for cursor in ("1", "other-4", f"{feed.nonce}-99", "garbage"):
+        _, backlog, reset = feed.subscribe(feed.parse_cursor(cursor))
+        assert reset and backlog == [], cursor
+
+
+def test_slow_consumer_overflows_and_can_resume():
+    feed = ChangeFeed(history=100, queue_size=2)
+    slow, _, _ = feed.subscribe()
+    for char_id in range(1, 6):
+        feed.publish(saved(char_id))
+    assert slow.overflowed
+    assert feed.stats()["overflows"] == 1
+
+    async def read():
+        chunks = []
+        async for chunk in iter_feed(feed, slow, [], False, heartbeat=1):
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    events = parse_sse(anyio.run(read))
+    assert events == [("overflow", None, {"last_seq": 0})]
+    assert feed.stats()["subscribers"] == 0
+
+    # 客户端带着最后收到的 id 重连，从历史里补齐
+    _, backlog, reset = feed.subscribe(feed.parse_cursor(f"{feed.nonce}-0"))
+    assert [event.seq for event in backlog] == [1, 2, 3, 4, 5] and not reset
+
+
+def test_iter_feed_streams_backlog_events_and_heartbeats():
+    feed = ChangeFeed(history=10)
+    feed.publish(saved(1))
+
+    async def scenario():
+        subscriber, backlog, reset = feed.subscribe(0)
+        stream = iter_feed(feed, subscriber, backlog, reset, heartbeat=0.01)
+        head = await stream.__anext__()
+        assert head.startswith(b"retry: 3000\n\n")
+        assert parse_sse(head) == [("insert", f"{feed.nonce}-1", {
+            "seq": 1, "id": f"{feed.nonce}-1", "type": "insert", "character": {"id": 1, "name_full": "Character 1"},
+        })]
+        assert await stream.__anext__() == b": ping\n\n"
+        feed.publish(saved(2, status="updated"))
+        assert [e[0] for e in parse_sse(await stream.__anext__())] == ["update"]
+        feed.close()
+        with pytest.raises(StopAsyncIteration):
+            await stream.__anext__()
+
+    anyio.run(scenario)
+    assert feed.stats()["subscribers"] == 0
+
+
+def test_sse_endpoint_pushes_saves(test_client):
+    test_client.post("/api/character/save", json=make_character(1, "Asuna"))
+    cursor = get_change_feed().last_event_id
+    result = {}
+
+    def listen():
+        result["response"] = test_client.get("/api/characters/feed", headers={"Last-Event-ID": cursor})
+
+    listener = threading.Thread(target=listen)
+    listener.start()
+    deadline = time.monotonic() + 5
+    while test_client.get("/api/characters/feed/stats").json()["data"]["subscribers"] == 0:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    test_client.post("/api/character/save", json=make_character(1, "Asuna", favourites=5))
+    test_client.post("/api/character/save/batch", json=[make_character(2, "Mikasa"), make_character(3, "Rem")])
+    # 服务关闭时断开所有订阅者，流式响应结束
+    test_client.portal.call(get_change_feed().close)
+    listener.join(5)
+
+    response = result["response"]
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.content)
+    assert [(event, data["character"]["id"]) for event, _, data in events] == [
+        ("update", 1), ("insert", 2), ("insert", 3),
+    ]
+    assert events[0][2]["character"]["favourites"] == 5
+
+
+def test_websocket_feed_with_resume(test_client):
+    test_client.post("/api/character/save", json=make_character(1, "Asuna"))
+    with test_client.websocket_connect("/api/characters/feed/ws?since=0") as ws:
+        assert json.loads(ws.receive_text())["character"]["id"] == 1
+        test_client.post("/api/character/save/batch", json=[make_character(2, "Mikasa")])
+        message = json.loads(ws.receive_text())
+        assert (message["type"], message["character"]["id"]) == ("insert", 2)
+
+    with test_client.websocket_connect(f"/api/characters/feed/ws?since={message['id']}") as ws:
+        test_client.post("/api/character/save", json=make_character(2, "Mikasa", favourites=1))
+        assert json.loads(ws.receive_text())["type"] == "update"
+
+
+def test_feed_disabled(test_client, monkeypatch):
+    monkeypatch.setattr(settings, "feed_enabled", False)
+    assert test_client.get("/api/characters/feed").status_code == 404
+    assert test_client.get("/api/characters/feed/stats").json()["data"] == {"enabled": False}
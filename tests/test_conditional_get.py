@@ -0,0 +1,136 @@
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import event
+
+from app.database import bump_version_statement, upsert_statement
+from app.models import Character
+from app.services import TableVersion, etag_matches
+from stub_server import make_character
+
+
+@pytest.fixture()
+def queries(async_engine):
+    """记录执行的 SQL 语句数"""
+    executed = []
+    event.listen(async_engine.sync_engine, "before_cursor_execute", lambda *args: executed.append(args[2]))
+    return executed
+
+
+def test_etag_matching():
+    assert etag_matches('"a-1"', '"a-1"')
+    assert etag_matches('W/"a-1"', '"a-1"')
+    assert etag_matches('"x", "a-1"', '"a-1"')
+    assert etag_matches('*', '"a-1"')
+    assert not etag_matches('"a-2"', '"a-1"')
+    assert not etag_matches(None, '"a-1"')
+    assert not etag_matches('"a-1"', None)
+
+
+def test_table_version_etag():
+    assert TableVersion(1, 100.0).etag != TableVersion(2, 100.0).etag
+    # 数据库重建后版本号从头计数，修改时间不同
+    assert TableVersion(1, 100.0).etag != TableVersion(1, 200.0).etag
+    assert TableVersion(1, 86400.0).last_modified == "Fri, 02 Jan 1970 00:00:00 GMT"
+    assert TableVersion().last_modified is None
+
+
+def version_queries(queries):
+    """304 路径只允许一次 table_versions 的主键查询"""
+    return len(queries) == 1 and "table_versions" in queries[0]
+
+
+def test_list_answers_304_without_querying_db(test_client, queries):
+    test_client.post("/api/character/save", json=make_character(1, "Asuna"))
+
+    response = test_client.get("/api/getallcharacters")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.headers["last-modified"]
+    assert response.headers["cache-control"] == "no-cache"
+
+    queries.clear()
+    response = test_client.get("/api/getallcharacters", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert version_queries(queries)
+
+    # 保存后版本变化，旧 ETag 失效
+    test_client.post("/api/character/save/batch", json=[make_character(2, "Mikasa")])
+    response = test_client.get("/api/getallcharacters", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert [c["id"] for c in response.json()] == [1, 2]
+
+
+def test_page_answers_304(test_client, queries):
+    test_client.post("/api/character/save", json=make_character(1, "Asuna"))
+    etag = test_client.get("/api/characters/page").headers["etag"]
+
+    queries.clear()
+    assert test_client.get("/api/characters/page", headers={"If-None-Match": etag}).status_code == 304
+    assert version_queries(queries)
+
+    test_client.post("/api/character/save", json=make_character(1, "Asuna", favourites=5))
+    assert test_client.get("/api/characters/page", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_remote_search_uses_cached_content_hash(test_client, anilist_stub):
+    response = test_client.get("/api/character/search", params={"name": "Rem", "source": "remote"})
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert anilist_stub.request_count == 1
+
+    response = test_client.get(
+        "/api/character/search", params={"name": "Rem", "source": "remote"}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert anilist_stub.request_count == 1
+
+    # 字段集不同，结果不同
+    response = test_client.get(
+        "/api/character/search",
+        params={"name": "Rem", "source": "remote", "fields": "card"},
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_local_search_uses_table_version(test_client, queries):
+    test_client.post("/api/character/save", json=make_character(1, "Asuna Yuuki"))
+    params = {"name": "asuna", "source": "local"}
+    response = test_client.get("/api/character/search", params=params)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    queries.clear()
+    assert test_client.get("/api/character/search", params=params, headers={"If-None-Match": etag}).status_code == 304
+    assert version_queries(queries)
+
+    test_client.post("/api/character/save", json=make_character(2, "Asuna Ichinose"))
+    response = test_client.get("/api/character/search", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["data"]["total"] == 2
+
+
+def test_write_from_another_process_invalidates_etag(test_client, async_engine):
+    test_client.post("/api/character/save", json=make_character(1, "Asuna"))
+    etag = test_client.get("/api/getallcharacters").headers["etag"]
+
+    # 其他工作进程或导入脚本直接写库：本进程收不到写入事件，版本行仍然变化
+    async def write_elsewhere():
+        dialect = async_engine.dialect.name
+        async with async_engine.begin() as conn:
+            await conn.execute(upsert_statement(dialect, Character.__table__, ["id", "name_full"]),
+                               [{"id": 2, "name_full": "Mikasa"}])
+            await conn.execute(bump_version_statement(dialect, Character.__tablename__))
+
+    test_client.portal.call(write_elsewhere)
+    response = test_client.get("/api/getallcharacters", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert [c["id"] for c in response.json()] == [1, 2]
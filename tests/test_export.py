@@ -0,0 +1,54 @@
+import csv
+import io
+import json
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.models import Character
+
+
+@pytest.fixture()
+def seeded_client(test_client, async_engine, monkeypatch):
+    # 小块读取，确保导出跨越多个块
+    monkeypatch.setattr(settings, "export_chunk_size", 3)
+
+    async def seed():
+        async with AsyncSession(async_engine) as session:
+            for i in range(1, 11):
+                session.add(Character(id=i, name_full=f"名前 {i}", favourites=i * 10,
+                                      description=f'line "{i}", with comma'))
+            await session.commit()
+
+    test_client.portal.call(seed)
+    return test_client
+
+
+def test_export_ndjson(seeded_client):
+    with seeded_client.stream("GET", "/api/characters/export") as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        chunks = list(response.iter_raw())
+    rows = [json.loads(line) for line in b"".join(chunks).decode("utf-8").splitlines()]
+    assert [row["id"] for row in rows] == list(range(1, 11))
+    assert rows[0]["name_full"] == "名前 1"
+    assert rows[0]["description"] == 'line "1", with comma'
+
+
+def test_export_csv_with_selected_fields(seeded_client):
+    response = seeded_client.get("/api/characters/export",
+                                 params={"format": "csv", "fields": "name_full,description"})
+    assert response.status_code == 200
+    assert "characters.csv" in response.headers["content-disposition"]
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["id", "name_full", "description"]
+    assert rows[1] == ["1", "名前 1", 'line "1", with comma']
+    assert len(rows) == 11
+
+
+def test_export_rejects_unknown_format(seeded_client):
+    assert seeded_client.get("/api/characters/export", params={"format": "xml"}).status_code == 400
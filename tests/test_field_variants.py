@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import AniListService
+from app.services.anilist import build_search_query
+
+
+def test_query_variants_are_cached_and_projected():
+    card = build_search_query("card")
+    assert build_search_query("card") is card
+    assert "description" not in card and "media" not in card
+    assert "description" in build_search_query("detail")
+    assert "media" not in build_search_query("detail")
+    assert " ".join(build_search_query("full").split()) == " ".join(AniListService.QUERY.split())
+
+
+def test_search_with_card_fields(anilist_stub):
+    with TestClient(app) as client:
+        response = client.get("/api/character/search", params={"name": "Asuna", "fields": "card"})
+
+    assert response.status_code == 200
+    character = response.json()["data"]["characters"][0]
+    assert set(character) == {"id", "name", "image", "favourites"}
+    assert character["image"] == {"medium": character["image"]["medium"]}
+    assert "description" not in anilist_stub.requests[0]["query"]
+
+
+def test_variants_are_cached_separately(anilist_stub):
+    with TestClient(app) as client:
+        card = client.get("/api/character/search", params={"name": "Asuna", "fields": "card"}).json()
+        full = client.get("/api/character/search", params={"name": "Asuna"}).json()
+        detail = client.post(
+            "/api/character/search/batch", json={"names": ["Asuna"], "fields": "detail"}
+        ).json()
+
+    assert "media" in full["data"]["characters"][0]
+    assert "media" not in card["data"]["characters"][0]
+    assert "description" in detail["data"]["results"]["Asuna"][0]
+    assert "dateOfBirth" not in detail["data"]["results"]["Asuna"][0]
+    assert anilist_stub.request_count == 3
+
+
+def test_unknown_fields_rejected(anilist_stub):
+    with TestClient(app) as client:
+        response = client.get("/api/character/search", params={"name": "Asuna", "fields": "everything"})
+    assert response.status_code == 400
+    assert anilist_stub.request_count == 0
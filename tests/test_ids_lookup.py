@@ -0,0 +1,97 @@
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import event
+
+from app.config import settings
+
+
+def save(client, char_id, favourites=10):
+    response = client.post("/api/character/save", json={
+        "id": char_id,
+        "name": {"full": f"Saved {char_id}", "native": None},
+        "image": {"medium": f"{char_id}.jpg"},
+        "favourites": favourites,
+    })
+    assert response.status_code == 200
+
+
+@pytest.fixture()
+def select_count(async_engine):
+    """统计执行的 SELECT 语句数量"""
+    statements = []
+
+    def before_execute(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_execute)
+    yield statements
+    event.remove(async_engine.sync_engine, "before_cursor_execute", before_execute)
+
+
+def lookup(client, ids, **params):
+    response = client.get("/api/characters", params={"ids": ids, **params})
+    assert response.status_code == 200
+    return response.json()["data"]
+
+
+def test_db_first_then_anilist_in_request_order(test_client, anilist_stub, select_count):
+    save(test_client, 2)
+    save(test_client, 4)
+    select_count.clear()
+
+    data = lookup(test_client, "3,2,999999,1,4,2")
+    assert [c["id"] for c in data["characters"]] == [3, 2, 1, 4]
+    assert data["characters"][1]["name"]["full"] == "Saved 2"
+    assert data["characters"][0]["name"]["full"] == "Character 3"
+    assert data["missing"] == [999999]
+    assert data["sources"] == {"cache": 0, "database": 2, "anilist": 2}
+    assert data["complete"] is True
+    # 一次 IN 查询 + 一次 AniList 请求
+    assert len(select_count) == 1
+    assert anilist_stub.request_count == 1
+    assert anilist_stub.requests[0]["variables"]["ids"] == [3, 999999, 1]
+
+    # 第二次全部来自缓存（包括确认不存在的 id）
+    select_count.clear()
+    data = lookup(test_client, "1,2,3,4,999999", fields="card")
+    assert data["sources"] == {"cache": 4, "database": 0, "anilist": 0}
+    assert set(data["characters"][0]) == {"id", "name", "image", "favourites"}
+    assert len(select_count) == 0
+    assert anilist_stub.request_count == 1
+
+
+def test_save_invalidates_cache_and_write_through(test_client, anilist_stub):
+    assert lookup(test_client, "5", remote="false")["missing"] == [5]
+    assert anilist_stub.request_count == 0
+
+    data = lookup(test_client, "5,6", save="true")
+    assert data["sources"]["anilist"] == 2
+    stored = {c["id"] for c in test_client.get("/api/getallcharacters").json()}
+    assert stored == {5, 6}
+
+    # 保存后缓存失效，读到新数据
+    save(test_client, 5, favourites=12345)
+    assert lookup(test_client, "5")["characters"][0]["favourites"] == 12345
+
+
+def test_invalid_ids(test_client, monkeypatch):
+    monkeypatch.setattr(settings, "ids_lookup_max", 3)
+    assert test_client.get("/api/characters", params={"ids": "1,a"}).status_code == 400
+    assert test_client.get("/api/characters", params={"ids": ","}).status_code == 400
+    assert test_client.get("/api/characters", params={"ids": "1,2,3,4"}).status_code == 400
+    assert test_client.get("/api/characters", params={"ids": "1", "fields": "x"}).status_code == 400
+
+
+def test_anilist_failure_returns_partial(test_client, monkeypatch):
+    from stub_server import AniListStub
+
+    save(test_client, 7)
+    with AniListStub(handler=lambda payload, stub: (500, {"errors": []}, {})) as stub:
+        monkeypatch.setattr(settings, "anilist_api_url", stub.url)
+        data = lookup(test_client, "7,8")
+    assert [c["id"] for c in data["characters"]] == [7]
+    assert data["missing"] == [8]
+    assert data["complete"] is False
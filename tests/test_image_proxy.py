@@ -0,0 +1,168 @@
+import asyncio
+import io
+import os
+
+import pytest
+
+from app.config import settings
+from app.services import ImageCache, get_image_cache
+from stub_server import ImageOrigin
+
+
+@pytest.fixture()
+def origin(monkeypatch, tmp_path):
+    """本地图片源站，图片缓存目录放在临时目录"""
+    with ImageOrigin() as origin:
+        monkeypatch.setattr(settings, "image_proxy_hosts", [origin.host])
+        monkeypatch.setattr(settings, "image_cache_dir", str(tmp_path / "images"))
+        yield origin
+
+
+def png(width, height, color=(200, 30, 30)):
+    Image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_original_is_fetched_once_and_revalidated(test_client, origin):
+    url = origin.add("/a.png", b"\x89PNG fake image bytes")
+    same = origin.add("/copy-of-a.png", b"\x89PNG fake image bytes")
+
+    first = test_client.get("/api/image", params={"url": url})
+    assert first.status_code == 200
+    assert first.content == b"\x89PNG fake image bytes"
+    assert first.headers["content-type"] == "image/png"
+    assert "immutable" in first.headers["cache-control"]
+    assert first.headers["x-content-type-options"] == "nosniff"
+    assert first.headers["content-security-policy"] == "sandbox"
+    etag = first.headers["etag"]
+
+    assert test_client.get("/api/image", params={"url": url}).content == first.content
+    assert origin.count("/a.png") == 1
+
+    not_modified = test_client.get("/api/image", params={"url": url}, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+
+    # 内容相同的另一个地址：同一个 ETag，磁盘上只存一份
+    assert test_client.get("/api/image", params={"url": same}).headers["etag"] == etag
+    stats = test_client.get("/api/image/stats").json()["data"]
+    assert (stats["downloads"], stats["files"], stats["urls"], stats["hits"]) == (2, 1, 2, 2)
+
+
+def test_thumbnail_generated_once(test_client, origin):
+    Image = pytest.importorskip("PIL.Image")
+    url = origin.add("/large.png", png(600, 900))
+
+    response = test_client.get("/api/image", params={"url": url, "w": 120})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert Image.open(io.BytesIO(response.content)).size == (120, 180)
+    assert response.headers["etag"].endswith('-120"')
+
+    again = test_client.get("/api/image", params={"url": url, "w": 120})
+    assert again.content == response.content
+    original = test_client.get("/api/image", params={"url": url})
+    assert original.headers["etag"] != response.headers["etag"]
+    assert origin.count("/large.png") == 1
+    stats = test_client.get("/api/image/stats").json()["data"]
+    assert (stats["thumbnails"], stats["thumbnail_hits"]) == (1, 1)
+
+
+def test_rejected_requests(test_client, origin):
+    url = origin.add("/a.png", b"image")
+    origin.add("/page.html", b"<html>", "text/html")
+    origin.add("/icon.svg", b"<svg xmlns='http://www.w3.org/2000/svg'><script>alert(1)</script></svg>", "image/svg+xml")
+
+    assert test_client.get("/api/image", params={"url": "http://evil.example/a.png"}).status_code == 403
+    assert test_client.get("/api/image", params={"url": "file:///etc/passwd"}).status_code == 400
+    assert test_client.get("/api/image", params={"url": url, "w": 77}).status_code == 400
+    assert test_client.get("/api/image", params={"url": origin.url("/missing.png")}).status_code == 404
+    assert test_client.get("/api/image", params={"url": origin.url("/page.html")}).status_code == 502
+    # SVG 可以带脚本，不从本站的源返回
+    assert test_client.get("/api/image", params={"url": origin.url("/icon.svg")}).status_code == 502
+
+
+def test_file_evicted_before_response_is_fetched_again(test_client, origin, monkeypatch):
+    url = origin.add("/a.png", b"\x89PNG evicted")
+    cache = get_image_cache()
+    get = cache.get
+    evicted = []
+
+    async def get_then_evict(*args, **kwargs):
+        image = await get(*args, **kwargs)
+        if not evicted:
+            # 模拟其他请求写入新文件时，淘汰了刚取得、还没开始返回的文件
+            evicted.append(image.path)
+            max_bytes, cache.max_bytes = cache.max_bytes, 0
+            cache._evict()
+            cache.max_bytes = max_bytes
+        return image
+
+    monkeypatch.setattr(cache, "get", get_then_evict)
+    response = test_client.get("/api/image", params={"url": url})
+    assert response.status_code == 200
+    assert response.content == b"\x89PNG evicted"
+    assert evicted and origin.count("/a.png") == 2
+
+
+def test_lru_eviction_by_bytes_and_reload(origin, tmp_path):
+    urls = [origin.add(f"/{name}.png", name.encode() * 1000) for name in "abc"]
+    root = str(tmp_path / "lru")
+
+    async def scenario():
+        cache = ImageCache(root, max_bytes=2500, allowed_hosts=[origin.host])
+        try:
+            a = await cache.get(urls[0])
+            await cache.get(urls[1])
+            await cache.get(urls[0])  # a 变成最近使用
+            await cache.get(urls[2])  # 超过 2500 字节，淘汰 b
+            assert cache.stats()["bytes"] <= 2500
+            assert os.path.exists(a.path)
+            await cache.get(urls[1])  # b 重新下载，淘汰 a
+        finally:
+            await cache.close()
+
+        # 重启后从磁盘重建索引，不需要重新下载
+        reloaded = ImageCache(root, max_bytes=2500, allowed_hosts=[origin.host])
+        try:
+            await reloaded.get(urls[1])
+            await reloaded.get(urls[2])
+            return reloaded.stats()
+        finally:
+            await reloaded.close()
+
+    stats = asyncio.run(scenario())
+    assert (stats["downloads"], stats["hits"], stats["files"]) == (0, 2, 2)
+    assert [origin.count(f"/{name}.png") for name in "abc"] == [1, 2, 1]
+
+
+def test_concurrent_requests_download_once(origin):
+    url = origin.add("/a.png", b"x" * 100000)
+
+    async def scenario():
+        cache = get_image_cache()
+        try:
+            return await asyncio.gather(*(cache.get(url) for _ in range(20)))
+        finally:
+            await cache.close()
+
+    results = asyncio.run(scenario())
+    assert len({image.path for image in results}) == 1
+    assert origin.count("/a.png") == 1
+
+
+def test_missing_pillow_is_reported_at_startup(async_engine, monkeypatch, caplog):
+    import logging
+
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from app.services import images
+
+    monkeypatch.setattr(images, "Image", None)
+    with caplog.at_level(logging.WARNING, logger="app.main"):
+        with TestClient(app):
+            pass
+    assert any("未安装 Pillow" in record.getMessage() for record in caplog.records)
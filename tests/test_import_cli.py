@@ -0,0 +1,117 @@
+import json
+
+import pytest
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from app.cli import import_characters as cli
+from app.models import Character
+from stub_server import make_character
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'import.db'}")
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def write_ndjson(path, characters):
+    path.write_text("".join(json.dumps(c, ensure_ascii=False) + "\n" for c in characters), encoding="utf-8")
+
+
+def stored(engine):
+    with Session(engine) as session:
+        return {c.id: c for c in session.exec(select(Character)).all()}
+
+
+def dump(count):
+    characters = [make_character(i, f"キャラ {i}" if i % 3 == 0 else f"Character {i}", i) for i in range(1, count + 1)]
+    characters.append({"name": {"full": "no id"}})
+    return characters
+
+
+def test_import_ndjson(engine, tmp_path):
+    path = tmp_path / "dump.ndjson"
+    write_ndjson(path, dump(25))
+    with path.open("a", encoding="utf-8") as f:
+        f.write("not json\n\n")
+
+    stats = cli.import_file(path, engine, chunk_size=10)
+    assert (stats.rows, stats.skipped, stats.chunks) == (25, 2, 3)
+    rows = stored(engine)
+    assert len(rows) == 25
+    assert rows[3].name_full == "キャラ 3"
+    assert rows[25].image_url == "https://img.example/25-m.jpg"
+    assert not path.with_name("dump.ndjson.checkpoint").exists()
+
+
+def test_import_json_array_with_small_reads(engine, tmp_path, monkeypatch):
+    # 读取块很小，元素和多字节字符都会跨越读取边界
+    monkeypatch.setattr(cli, "READ_SIZE", 7)
+    path = tmp_path / "dump.json"
+    path.write_text(json.dumps(dump(12), ensure_ascii=False, indent=1), encoding="utf-8")
+
+    assert cli.detect_format(path) == "json"
+    stats = cli.import_file(path, engine, chunk_size=5)
+    assert (stats.rows, stats.skipped) == (12, 1)
+    assert stored(engine)[12].name_full == "キャラ 12"
+
+    # 返回的偏移指向元素末尾，可以从这里继续解析
+    with path.open("rb") as f:
+        offsets = [end for _, end in cli.iter_json_array(f, 0)]
+    with path.open("rb") as f:
+        rest = [value["id"] for value, _ in cli.iter_json_array(f, offsets[4]) if "id" in value]
+    assert rest == list(range(6, 13))
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "json"])
+def test_resume_from_checkpoint(engine, tmp_path, monkeypatch, fmt):
+    path = tmp_path / f"dump.{fmt}"
+    characters = dump(30)
+    if fmt == "ndjson":
+        write_ndjson(path, characters)
+    else:
+        path.write_text(json.dumps(characters, ensure_ascii=False), encoding="utf-8")
+
+    # 写入第三块时中断
+    original = cli.write_rows
+    calls = []
+
+    def flaky(engine, rows):
+        calls.append(len(rows))
+        if len(calls) == 3:
+            raise RuntimeError("killed")
+        original(engine, rows)
+
+    monkeypatch.setattr(cli, "write_rows", flaky)
+    with pytest.raises(RuntimeError):
+        cli.import_file(path, engine, chunk_size=10)
+    checkpoint = json.loads(path.with_name(path.name + ".checkpoint").read_text())
+    assert checkpoint["rows"] == 20
+    assert len(stored(engine)) == 20
+
+    monkeypatch.setattr(cli, "write_rows", original)
+    stats = cli.import_file(path, engine, chunk_size=10)
+    assert stats.resumed_from == checkpoint["offset"]
+    assert (stats.rows, stats.total) == (10, 30)
+    assert len(stored(engine)) == 30
+
+
+def test_multiprocess_parse(engine, tmp_path):
+    path = tmp_path / "dump.ndjson"
+    write_ndjson(path, dump(50))
+    stats = cli.import_file(path, engine, chunk_size=7, workers=2)
+    assert (stats.rows, stats.skipped) == (50, 1)
+    assert len(stored(engine)) == 50
+
+
+def test_upsert_updates_existing_rows(engine, tmp_path):
+    path = tmp_path / "dump.ndjson"
+    write_ndjson(path, [make_character(1, "Old", 1), make_character(2, "B", 2), make_character(1, "New", 5)])
+    cli.import_file(path, engine)
+    assert stored(engine)[1].name_full == "New"
+
+    write_ndjson(path, [make_character(2, "B", 99)])
+    cli.import_file(path, engine)
+    assert stored(engine)[2].favourites == 99
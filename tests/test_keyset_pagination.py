@@ -0,0 +1,103 @@
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import Character
+from app.routers.characters import encode_cursor
+
+
+@pytest.fixture()
+def seeded_client(test_client, async_engine):
+    favourites = [50, 10, 50, None, 30, 10, 70, None, 20, 50]
+
+    async def seed():
+        async with AsyncSession(async_engine) as session:
+            for i, fav in enumerate(favourites, start=1):
+                session.add(Character(id=i, name_full=f"Character {i}", favourites=fav,
+                                      description="x" * 1000))
+            await session.commit()
+            # 模型默认值会把 None 变成 0，直接写入 NULL
+            nulls = [i for i, fav in enumerate(favourites, start=1) if fav is None]
+            await session.exec(update(Character).where(Character.id.in_(nulls)).values(favourites=None))
+            await session.commit()
+
+    test_client.portal.call(seed)
+    return test_client
+
+
+def collect(client, **params):
+    pages, cursor = [], None
+    while True:
+        query = dict(params)
+        if cursor:
+            query["after"] = cursor
+        response = client.get("/api/characters/page", params=query)
+        assert response.status_code == 200
+        data = response.json()["data"]
+        pages.append(data["items"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_paginate_by_id(seeded_client):
+    pages = collect(seeded_client, limit=3)
+    assert [len(page) for page in pages] == [3, 3, 3, 1]
+    assert [row["id"] for page in pages for row in page] == list(range(1, 11))
+    assert "description" not in pages[0][0]
+
+
+def test_paginate_by_favourites_with_ties_and_nulls(seeded_client):
+    pages = collect(seeded_client, limit=4, order="favourites")
+    rows = [(row["favourites"], row["id"]) for page in pages for row in page]
+    assert rows == [(70, 7), (50, 10), (50, 3), (50, 1), (30, 5), (20, 9),
+                    (10, 6), (10, 2), (None, 8), (None, 4)]
+
+
+def test_column_projection(seeded_client):
+    response = seeded_client.get("/api/characters/page",
+                                 params={"limit": 2, "fields": "name_full,description"})
+    items = response.json()["data"]["items"]
+    assert set(items[0]) == {"id", "name_full", "description"}
+    assert items[0]["description"] == "x" * 1000
+
+
+def test_invalid_parameters(seeded_client):
+    assert seeded_client.get("/api/characters/page", params={"fields": "password"}).status_code == 400
+    assert seeded_client.get("/api/characters/page", params={"order": "name"}).status_code == 400
+    assert seeded_client.get("/api/characters/page", params={"after": "not-a-cursor"}).status_code == 400
+
+    cursor = seeded_client.get("/api/characters/page", params={"limit": 1}).json()["data"]["next_cursor"]
+    response = seeded_client.get("/api/characters/page", params={"after": cursor, "order": "favourites"})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("order, key", [
+    ("id", []),
+    ("id", [1, 2]),
+    ("id", ["1"]),
+    ("id", [True]),
+    ("favourites", [1]),
+    ("favourites", [1, 2, 3]),
+    ("favourites", ["x", 2]),
+    ("favourites", [10, None]),
+    ("favourites", {"a": 1}),
+])
+def test_malformed_cursor_key(seeded_client, order, key):
+    response = seeded_client.get("/api/characters/page", params={"after": encode_cursor(order, key), "order": order})
+    assert response.status_code == 400
+
+
+def test_cursor_with_null_favourites(seeded_client):
+    response = seeded_client.get("/api/characters/page", params={
+        "after": encode_cursor("favourites", [None, 8]), "order": "favourites",
+    })
+    assert response.status_code == 200
+    assert [row["id"] for row in response.json()["data"]["items"]] == [4]
+
+
+def test_legacy_endpoint_still_returns_everything(seeded_client):
+    assert len(seeded_client.get("/api/getallcharacters").json()) == 10
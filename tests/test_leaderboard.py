@@ -0,0 +1,184 @@
+import random
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+import anyio
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.dialects import sqlite
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import bump_version_statement, ensure_indexes, upsert_characters, upsert_statement
+from app.models import Character
+from app.services import Leaderboard, get_leaderboard
+from app.services.leaderboard import rank_key, top_filters
+from stub_server import make_character
+
+GENDERS = ["Female", "Male", None]
+
+
+def row(char_id, favourites, gender="Female", name=None):
+    return {
+        "id": char_id, "name_full": name or f"Character {char_id}", "name_native": None, "gender": gender,
+        "age": None, "favourites": favourites, "image_url": None, "site_url": None,
+    }
+
+
+async def seed(engine, rows):
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        await upsert_characters(session, [Character(**r) for r in rows])
+
+
+def expected_top(rows, limit, gender=None, prefix=None):
+    matching = [
+        r for r in rows.values()
+        if (not gender or r["gender"] == gender)
+        and (not prefix or r["name_full"].casefold().startswith(prefix.casefold()))
+    ]
+    return [r["id"] for r in sorted(matching, key=rank_key, reverse=True)[:limit]]
+
+
+def test_incremental_updates_match_full_recompute(async_engine):
+    rng = random.Random(7)
+    truth = {i: row(i, rng.randint(0, 50), rng.choice(GENDERS), f"{rng.choice('ab')}name {i}") for i in range(1, 41)}
+    board = Leaderboard(size=8, ttl=0)
+
+    async def scenario():
+        await seed(async_engine, truth.values())
+        async with AsyncSession(async_engine) as session:
+            await board.ensure_loaded(session)
+        served = 0
+        for step in range(400):
+            char_id = rng.randint(1, 60)
+            current = truth.get(char_id) or row(char_id, 0, rng.choice(GENDERS), f"{rng.choice('ab')}name {char_id}")
+            updated = dict(current, favourites=max(0, (current["favourites"] or 0) + rng.randint(-20, 20)))
+            if step % 50 == 0:
+                updated["favourites"] = None
+            truth[char_id] = updated
+            board.apply(updated)
+            for limit, gender, prefix in ((3, None, None), (2, "Female", None), (2, None, "A"), (1, "Male", "b")):
+                result = board.top(limit, gender, prefix)
+                if result is not None:
+                    served += 1
+                    assert [r["id"] for r in result] == expected_top(truth, limit, gender, prefix), step
+        return served
+
+    # 榜单变浅后（不足时返回 None）也从来不会返回错误的结果，并且大部分请求能直接用榜单
+    assert anyio.run(scenario) > 400
+
+
+def test_top_endpoint_uses_cache_and_matches_db(test_client, monkeypatch):
+    characters = [make_character(i, name, favourites) for i, name, favourites in (
+        (1, "Asuna Yuuki", 500), (2, "Asuna Ichinose", 50), (3, "Mikasa Ackerman", 900),
+        (4, "Rem", 800), (5, "Levi", 700), (6, "100%_real", 10),
+    )]
+    characters[4]["gender"] = "Male"
+    test_client.post("/api/character/save/batch", json=characters)
+
+    def top(**params):
+        response = test_client.get("/api/characters/top", params=params)
+        assert response.status_code == 200, response.text
+        data = response.json()["data"]
+        return [item["id"] for item in data["items"]], data["source"]
+
+    cases = [
+        {"limit": 3},
+        {"limit": 2, "gender": "Male"},
+        {"limit": 2, "gender": "male"},
+        {"limit": 2, "gender": "FEMALE"},
+        {"limit": 5, "prefix": "asu"},
+        {"limit": 5, "prefix": "100%_"},
+        {"limit": 5, "prefix": "100__"},
+    ]
+    cached = [top(**params) for params in cases]
+    assert [ids for ids, _ in cached] == [[3, 4, 5], [5], [5], [3, 4], [1, 2], [6], []]
+    assert {source for _, source in cached} == {"cache"}
+
+    monkeypatch.setattr(settings, "leaderboard_cache_enabled", False)
+    assert [top(**params) for params in cases] == [(ids, "db") for ids, _ in cached]
+    monkeypatch.setattr(settings, "leaderboard_cache_enabled", True)
+
+    # 收藏数变化后榜单增量更新，不重新加载
+    test_client.post("/api/character/save", json=make_character(2, "Asuna Ichinose", 1000))
+    assert top(limit=2) == ([2, 3], "cache")
+    assert get_leaderboard().stats()["loads"] == 1
+
+    # 需要 description 时直接查数据库
+    response = test_client.get("/api/characters/top", params={"limit": 1, "fields": "id,description"})
+    assert response.json()["data"] == {
+        "items": [{"favourites": 1000, "id": 2, "description": "Asuna Ichinose description"}],
+        "source": "db", "limit": 1,
+    }
+    assert test_client.get("/api/characters/top", params={"limit": settings.top_max_limit + 1}).status_code == 400
+
+
+def test_top_endpoint_falls_back_to_db_when_board_too_shallow(test_client, monkeypatch):
+    monkeypatch.setattr(settings, "leaderboard_size", 2)
+    test_client.post("/api/character/save/batch", json=[make_character(i, f"C{i}", i * 10) for i in range(1, 6)])
+    response = test_client.get("/api/characters/top", params={"limit": 4})
+    assert response.json()["data"]["source"] == "db"
+    assert [item["id"] for item in response.json()["data"]["items"]] == [5, 4, 3, 2]
+
+
+def test_top_endpoint_reloads_after_write_from_another_process(test_client, async_engine):
+    test_client.post("/api/character/save/batch", json=[make_character(i, f"C{i}", i * 10) for i in range(1, 4)])
+    first = test_client.get("/api/characters/top", params={"limit": 2})
+    assert [item["id"] for item in first.json()["data"]["items"]] == [3, 2]
+
+    # 其他工作进程直接写库：本进程的榜单收不到写入事件，但版本号变了
+    async def write_elsewhere():
+        dialect = async_engine.dialect.name
+        async with async_engine.begin() as conn:
+            await conn.execute(upsert_statement(dialect, Character.__table__, ["id", "name_full", "favourites"]),
+                               [{"id": 9, "name_full": "C9", "favourites": 900}])
+            await conn.execute(bump_version_statement(dialect, Character.__tablename__))
+
+    test_client.portal.call(write_elsewhere)
+    response = test_client.get("/api/characters/top", params={"limit": 2},
+                               headers={"If-None-Match": first.headers["etag"]})
+    assert response.status_code == 200
+    assert response.headers["etag"] != first.headers["etag"]
+    assert [item["id"] for item in response.json()["data"]["items"]] == [9, 3]
+    assert response.json()["data"]["source"] == "cache"
+    assert get_leaderboard().stats()["loads"] == 2
+
+
+def test_top_queries_use_indexes(async_engine):
+    async def plans():
+        await seed(async_engine, [row(1, 10)])
+        result = {}
+        async with async_engine.connect() as conn:
+            for name, gender, prefix in (("top", None, None), ("gender", "Female", None), ("prefix", None, "ab")):
+                statement = select(Character.id).order_by(Character.favourites.desc(), Character.id.desc()).limit(10)
+                for condition in top_filters(gender, prefix, "sqlite"):
+                    statement = statement.where(condition)
+                compiled = statement.compile(dialect=sqlite.dialect())
+                rows = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", tuple(compiled.params.values()))
+                result[name] = " / ".join(r[3] for r in rows)
+        return result
+
+    plans = anyio.run(plans)
+    assert "ix_characters_favourites_id" in plans["top"] and "TEMP B-TREE" not in plans["top"]
+    assert "ix_characters_gender_nocase_favourites_id" in plans["gender"] and "TEMP B-TREE" not in plans["gender"]
+    assert "ix_characters_name_full_nocase" in plans["prefix"]
+
+
+def test_ensure_indexes_adds_missing_indexes_to_existing_table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE characters (id INTEGER PRIMARY KEY, name_full VARCHAR(100), "
+                          "name_native VARCHAR(100), gender VARCHAR(20), age VARCHAR(20), favourites INTEGER, "
+                          "image_url VARCHAR(300), description TEXT, site_url VARCHAR(300))"))
+    SQLModel.metadata.create_all(engine)
+    assert inspect(engine).get_indexes("characters") == []
+
+    ensure_indexes(engine)
+    ensure_indexes(engine)
+    assert sorted(index["name"] for index in inspect(engine).get_indexes("characters")) == [
+        "ix_characters_favourites_id", "ix_characters_gender_nocase_favourites_id", "ix_characters_name_full_nocase",
+    ]
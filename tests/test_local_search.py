@@ -0,0 +1,143 @@
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import bump_version_statement, upsert_statement
+from app.models import Character
+from app.services import LocalSearchIndex, build_local_index, get_local_index
+from app.services.search_index import kana_to_romaji, normalize
+
+
+def test_normalize_and_romaji():
+    assert normalize("  Ｙｕｕｋｉ・Asuna ") == "yuuki asuna"
+    assert normalize("アスナ") == "あすな"
+    assert kana_to_romaji("あすな") == "asuna"
+    assert kana_to_romaji("しょうた") == "shouta"
+    assert kana_to_romaji("きょうこ") == "kyouko"
+    assert kana_to_romaji("まっちゃ") == "matcha"
+
+
+@pytest.fixture()
+def index():
+    index = LocalSearchIndex(min_score=0.35)
+    index.add(1, ["Asuna Yuuki", "結城明日奈", "Lightning Flash"], favourites=30000)
+    index.add(2, ["Asuna Ichinose", None], favourites=50)
+    index.add(3, ["Mikasa Ackerman", "ミカサ・アッカーマン"], favourites=90000)
+    index.add(4, ["Rem", "レム"], favourites=80000)
+    return index
+
+
+def test_substring_matches_ranked_by_favourites(index):
+    assert index.search("asuna", 5) == [1, 2]
+
+
+def test_typo_tolerance(index):
+    assert index.search("Mikasa Akerman", 5)[0] == 3
+    assert index.search("asnua yuki", 5)[0] == 1
+
+
+def test_cjk_and_kana_romaji(index):
+    assert index.search("明日奈", 5) == [1]
+    assert index.search("みかさ", 5) == [3]
+    assert index.search("mikasa akkaaman", 5)[0] == 3
+    assert index.search("lightning", 5) == [1]
+
+
+def test_update_and_remove(index):
+    index.add(2, ["Kurumi Tokisaki"], favourites=10)
+    assert index.search("asuna", 5) == [1]
+    assert index.search("kurumi", 5) == [2]
+    index.remove(2)
+    assert index.search("kurumi", 5) == []
+    assert index.stats()["characters"] == 3
+
+
+def save(client, char_id, full, favourites, alternative=()):
+    response = client.post("/api/character/save", json={
+        "id": char_id,
+        "name": {"full": full, "native": None, "alternative": list(alternative)},
+        "favourites": favourites,
+        "image": {"medium": f"{char_id}.jpg"},
+    })
+    assert response.status_code == 200
+
+
+def test_search_sources(test_client, anilist_stub):
+    save(test_client, 1, "Asuna Yuuki", 30000, ["Lightning Flash"])
+    save(test_client, 2, "Asuna Ichinose", 50)
+    test_client.post("/api/character/save/batch", json=[
+        {"id": 3, "name": {"full": "Asuna Kagura"}, "favourites": 10},
+    ])
+
+    local = test_client.get("/api/character/search", params={"name": "asuna", "source": "auto"}).json()["data"]
+    assert local["source"] == "local"
+    assert [c["id"] for c in local["characters"]] == [1, 2, 3]
+    assert anilist_stub.request_count == 0
+
+    # 本地只有 1 个结果，少于 local_search_min_results，回退到 AniList
+    fallback = test_client.get("/api/character/search",
+                               params={"name": "Yuuki", "source": "auto"}).json()["data"]
+    assert fallback["source"] == "remote"
+    assert anilist_stub.request_count == 1
+
+    only_local = test_client.get("/api/character/search",
+                                 params={"name": "Yuuki", "source": "local", "fields": "card"})
+    assert only_local.json()["data"]["characters"][0]["name"]["full"] == "Asuna Yuuki"
+    # 别名没有存进数据库，重建后无法还原，增量更新也不索引，重启前后结果一致
+    assert test_client.get("/api/character/search",
+                           params={"name": "Lightning Flash", "source": "local"}).status_code == 404
+    assert test_client.get("/api/character/search", params={"name": "Nobody", "source": "local"}).status_code == 404
+    assert test_client.get("/api/character/search", params={"name": "x", "source": "cache"}).status_code == 400
+
+
+def test_default_source_is_remote(test_client, anilist_stub):
+    # 本地结果缺少 AniList 才有的字段，不指定来源时即使本地结果足够也查询 AniList，返回结构不随本地数据变化
+    for char_id in (1, 2, 3):
+        save(test_client, char_id, f"Asuna {char_id}", 10)
+    data = test_client.get("/api/character/search", params={"name": "asuna"}).json()["data"]
+    assert data["source"] == "remote"
+    assert anilist_stub.request_count == 1
+
+def test_build_index_from_database(test_client, async_engine):
+    async def seed_and_build():
+        async with AsyncSession(async_engine) as session:
+            session.add(Character(id=10, name_full="Rem", name_native="レム", favourites=80000))
+            session.add(Character(id=11, name_full="Ram", name_native="ラム", favourites=40000))
+            await session.commit()
+        return await build_local_index(async_engine)
+
+    index = test_client.portal.call(seed_and_build)
+    assert index.search("れむ", 5)[0] == 10
+    assert index.search("ram", 5)[0] == 11
+
+
+def test_index_rebuilt_after_write_from_another_process(test_client, async_engine):
+    save(test_client, 1, "Asuna Yuuki", 30000)
+    first = test_client.get("/api/character/search", params={"name": "asuna", "source": "local"})
+    assert [c["id"] for c in first.json()["data"]["characters"]] == [1]
+    index = get_local_index()
+
+    # 其他工作进程直接写库：本进程的索引收不到写入事件，但版本号变了
+    async def write_elsewhere():
+        dialect = async_engine.dialect.name
+        async with async_engine.begin() as conn:
+            await conn.execute(upsert_statement(dialect, Character.__table__, ["id", "name_full", "favourites"]),
+                               [{"id": 2, "name_full": "Asuna Ichinose", "favourites": 50}])
+            await conn.execute(bump_version_statement(dialect, Character.__tablename__))
+
+    test_client.portal.call(write_elsewhere)
+    response = test_client.get("/api/character/search", params={"name": "asuna", "source": "local"},
+                               headers={"If-None-Match": first.headers["etag"]})
+    assert response.status_code == 200
+    assert response.headers["etag"] != first.headers["etag"]
+    assert [c["id"] for c in response.json()["data"]["characters"]] == [1, 2]
+    assert get_local_index() is not index
+
+    # 本进程自己的写入只增量更新，不重建
+    index = get_local_index()
+    save(test_client, 3, "Asuna Kagura", 10)
+    response = test_client.get("/api/character/search", params={"name": "asuna", "source": "local"})
+    assert [c["id"] for c in response.json()["data"]["characters"]] == [1, 2, 3]
+    assert get_local_index() is index
@@ -0,0 +1,120 @@
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import event
+
+from app.config import settings
+from app.models import Media
+from app.services import get_write_behind
+from stub_server import make_character
+
+
+def with_media(char_id, media, favourites=100):
+    """带作品的角色（AniList 的 media.edges 结构）"""
+    character = make_character(char_id, f"Character {char_id}", favourites)
+    character["media"] = {"edges": [
+        {"node": {"id": media_id, "title": {"romaji": f"Title {media_id}", "english": None}, "type": "ANIME"}}
+        for media_id in media
+    ]}
+    return character
+
+
+def media_ids(client, char_id):
+    characters = {c["id"]: c for c in client.get("/api/getallcharacters").json()}
+    return [m["id"] for m in characters[char_id]["media"]]
+
+
+def test_rows_from_anilist_shapes():
+    raw = with_media(1, [10, 11, 10, 0])
+    assert Media.rows_from_anilist(raw) == [
+        {"id": 10, "title": "Title 10", "type": "ANIME"},
+        {"id": 11, "title": "Title 11", "type": "ANIME"},
+    ]
+    formatted = {"id": 1, "media": [{"id": 5, "title": "T", "type": "MANGA"}, {"id": None, "title": "x"}]}
+    assert Media.rows_from_anilist(formatted) == [{"id": 5, "title": "T", "type": "MANGA"}]
+    assert Media.rows_from_anilist({"id": 1}) is None
+
+
+def test_save_persists_media_in_order(test_client):
+    assert test_client.post("/api/character/save", json=with_media(1, [30, 10, 20])).status_code == 200
+    assert media_ids(test_client, 1) == [30, 10, 20]
+
+    # 再次保存替换关联
+    test_client.post("/api/character/save", json=with_media(1, [20, 40]))
+    assert media_ids(test_client, 1) == [20, 40]
+
+    # 数据里没有作品信息时保留原来的关联
+    character = with_media(1, [])
+    del character["media"]
+    test_client.post("/api/character/save", json=character)
+    assert media_ids(test_client, 1) == [20, 40]
+
+
+def test_write_behind_keeps_latest_media(test_client, async_engine, monkeypatch):
+    monkeypatch.setattr(settings, "write_behind_enabled", True)
+    monkeypatch.setattr(settings, "write_behind_flush_interval", 60)
+
+    test_client.post("/api/character/save", json=with_media(1, [10, 11]))
+    # 合并进同一批：后一次没有作品信息时沿用前一次的
+    character = with_media(1, [])
+    del character["media"]
+    test_client.post("/api/character/save", json=character)
+    assert test_client.portal.call(get_write_behind(async_engine).flush) == 1
+    assert media_ids(test_client, 1) == [10, 11]
+
+
+def test_batch_save_persists_media(test_client):
+    response = test_client.post("/api/character/save/batch", json=[
+        with_media(1, [10, 11]),
+        with_media(2, [11]),
+        {"id": 3, "name": {"full": "formatted"}, "media": [{"id": 12, "title": "T", "type": "MANGA"}]},
+    ])
+    assert response.status_code == 200
+    assert media_ids(test_client, 1) == [10, 11]
+    assert media_ids(test_client, 2) == [11]
+    assert media_ids(test_client, 3) == [12]
+
+
+def test_media_characters_endpoint(test_client):
+    test_client.post("/api/character/save/batch", json=[
+        with_media(1, [10], favourites=5),
+        with_media(2, [10, 11], favourites=50),
+        with_media(3, [11], favourites=500),
+    ])
+
+    response = test_client.get("/api/media/10/characters")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["media"] == {"id": 10, "title": "Title 10", "type": "ANIME"}
+    assert data["total"] == 2
+    assert [c["id"] for c in data["characters"]] == [2, 1]
+    assert [m["id"] for m in data["characters"][0]["media"]] == [10, 11]
+
+    assert test_client.get("/api/media/999/characters").status_code == 404
+
+
+def test_list_query_count_does_not_grow(test_client, async_engine):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def queries_for(n):
+        test_client.post("/api/character/save/batch", json=[
+            with_media(i, [1000 + i % 3, 2000 + i]) for i in range(1, n + 1)
+        ])
+        statements.clear()
+        response = test_client.get("/api/getallcharacters")
+        assert len(response.json()) == n
+        assert all(len(c["media"]) == 2 for c in response.json())
+        return len(statements)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        small = queries_for(2)
+        large = queries_for(20)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    # 表版本 + 角色 + 作品（selectinload 一次 IN 查询）
+    assert small == large == 3
@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from app.metrics import REGISTRY, Counter, Gauge, Histogram, Registry, instrument_engine
+from stub_server import make_character
+
+
+def value(name, **labels):
+    return REGISTRY.sample(name, labels) or 0
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    requests = Counter("demo_total", "演示计数", ["path"], registry=registry)
+    latency = Histogram("demo_seconds", "演示耗时", buckets=(0.1, 1), registry=registry)
+    in_flight = Gauge("demo_in_flight", "演示", registry=registry)
+
+    requests.labels('/a"b').inc()
+    requests.labels('/a"b').inc(2)
+    for seconds in (0.05, 0.1, 0.5, 3):
+        latency.observe(seconds)
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+
+    text = registry.render()
+    assert "# TYPE demo_total counter" in text
+    assert 'demo_total{path="/a\\"b"} 3' in text
+    assert 'demo_seconds_bucket{le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{le="1"} 3' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 4' in text
+    assert "demo_seconds_count 4" in text
+    assert "demo_seconds_sum 3.65" in text
+    assert "demo_in_flight 1" in text
+    assert registry.sample("demo_total", {"path": '/a"b'}) == 3
+    with pytest.raises(ValueError):
+        requests.labels()
+
+
+def test_sharded_counter_is_exact_across_threads():
+    registry = Registry()
+    counter = Counter("threads_total", "演示", registry=registry)
+    histogram = Histogram("threads_seconds", "演示", registry=registry)
+
+    def work():
+        for _ in range(20000):
+            counter.inc()
+            histogram.observe(0.002)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registry.sample("threads_total") == 160000
+    assert registry.sample("threads_seconds_count") == 160000
+
+
+def test_http_metrics_use_route_templates(test_client):
+    labels = {"method": "GET", "route": "/api/media/{media_id}/characters", "status": "404"}
+    before = value("http_requests_total", **labels)
+    serialized = value("http_response_serialize_seconds_count", route="/api/character/save/stats")
+
+    for media_id in (1, 2, 3):
+        assert test_client.get(f"/api/media/{media_id}/characters").status_code == 404
+    test_client.get("/no/such/path")
+    test_client.get("/api/character/save/stats")
+
+    assert value("http_requests_total", **labels) == before + 3
+    assert value("http_requests_total", method="GET", route="unmatched", status="404") >= 1
+    assert value("http_request_duration_seconds_count",
+                 method="GET", route="/api/media/{media_id}/characters") >= 3
+    assert value("http_response_serialize_seconds_count", route="/api/character/save/stats") == serialized + 1
+
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    # /metrics 自己正在处理中
+    assert 'http_requests_in_flight{method="GET"} 1' in response.text
+
+
+def test_anilist_and_db_metrics(test_client, anilist_stub, async_engine):
+    instrument_engine(async_engine)
+    responses = value("anilist_responses_total", status="200")
+    upstream = value("anilist_request_duration_seconds_count")
+    inserts = value("db_query_duration_seconds_count", operation="INSERT")
+    selects = value("db_query_duration_seconds_count", operation="SELECT")
+
+    assert test_client.get("/api/character/search", params={"name": "Metrics", "source": "remote"}).status_code == 200
+    assert test_client.post("/api/character/save", json=make_character(1, "Metrics")).status_code == 200
+    test_client.get("/api/getallcharacters")
+
+    assert value("anilist_responses_total", status="200") == responses + 1
+    assert value("anilist_request_duration_seconds_count") == upstream + 1
+    assert value("db_query_duration_seconds_count", operation="INSERT") > inserts
+    assert value("db_query_duration_seconds_count", operation="SELECT") > selects
@@ -0,0 +1,150 @@
+import logging
+import os
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from app.config import settings
+from app.metrics import RequestTimer, SamplingProfiler, current_timer, stage
+
+
+def timing_names(response):
+    return [part.split(";")[0] for part in response.headers["server-timing"].split(", ")]
+
+
+def test_stage_outside_request_is_noop():
+    assert current_timer() is None
+    with stage("anything"):
+        pass
+
+    timer = RequestTimer()
+    timer.add("db", 0.002)
+    timer.add("db", 0.003)
+    timer.add("format", 0.0001)
+    assert timer.server_timing().startswith("db;dur=5.0, format;dur=0.1, total;dur=")
+    assert timer.summary() == "db=5.0ms×2, format=0.1ms"
+
+
+def test_search_server_timing_stages(test_client, anilist_stub):
+    params = {"name": "Timing", "source": "remote"}
+    first = test_client.get("/api/character/search", params=params)
+    assert first.status_code == 200
+    assert timing_names(first) == ["remote_search", "anilist", "decode", "format", "serialize", "total"]
+
+    # 第二次命中搜索缓存，不再访问 AniList
+    second = test_client.get("/api/character/search", params=params)
+    assert timing_names(second) == ["remote_search", "serialize", "total"]
+
+
+def test_db_stage_and_slow_request_log(test_client, async_engine, monkeypatch, caplog):
+    from app.metrics import instrument_engine
+
+    instrument_engine(async_engine)
+    monkeypatch.setattr(settings, "slow_request_ms", 0.001)
+    with caplog.at_level(logging.WARNING, logger="app.metrics.middleware"):
+        response = test_client.get("/api/getallcharacters")
+    assert "db" in timing_names(response)
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(message.startswith("慢请求 GET /api/getallcharacters") and "db=" in message for message in messages)
+
+
+
+def test_streaming_body_not_counted_as_slow(monkeypatch, caplog):
+    import asyncio
+
+    import httpx
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse
+
+    from app.metrics import TimingMiddleware
+
+    app = FastAPI()
+    app.add_middleware(TimingMiddleware)
+
+    async def slow_body():
+        for _ in range(3):
+            await asyncio.sleep(0.05)
+            yield b"chunk\n"
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(slow_body(), media_type="text/plain")
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(0.1)
+        return {}
+
+    async def call(path):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(path)
+
+    monkeypatch.setattr(settings, "slow_request_ms", 50)
+    with caplog.at_level(logging.WARNING, logger="app.metrics.middleware"):
+        assert asyncio.run(call("/stream")).text == "chunk\n" * 3
+        assert not [record for record in caplog.records if "慢请求" in record.getMessage()]
+        asyncio.run(call("/slow"))
+    assert any(record.getMessage().startswith("慢请求 GET /slow") for record in caplog.records)
+
+
+def test_slow_log_alone_instruments_engine(monkeypatch):
+    from sqlalchemy import event
+
+    from app.database import database
+    from app.metrics.series import _before_cursor_execute
+
+    monkeypatch.setattr(settings, "metrics_enabled", False)
+    monkeypatch.setattr(settings, "server_timing_enabled", False)
+    monkeypatch.setattr(settings, "debug", False)
+    monkeypatch.setattr(settings, "slow_request_ms", 1000)
+    monkeypatch.setattr(settings, "database_url", "sqlite://")
+    monkeypatch.setattr(database, "_engine", None)
+    engine = database.get_engine()
+    try:
+        assert event.contains(engine, "before_cursor_execute", _before_cursor_execute)
+    finally:
+        engine.dispose()
+
+def test_profile_header_only_in_debug(test_client, anilist_stub, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+    headers = {"X-Profile": "1"}
+    params = {"name": "Profiled", "source": "remote"}
+
+    response = test_client.get("/api/character/search", params=params, headers=headers)
+    assert "x-profile-file" not in response.headers
+    assert os.listdir(tmp_path) == []
+
+    monkeypatch.setattr(settings, "debug", True)
+    anilist_stub.delay = 0.05
+    response = test_client.get("/api/character/search", params={**params, "name": "Profiled 2"}, headers=headers)
+    path = response.headers["x-profile-file"]
+    assert os.path.dirname(path) == str(tmp_path)
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert stack and int(count) > 0
+
+
+def test_sampling_profiler_collapsed_stacks():
+    stop = threading.Event()
+
+    def busy_loop_for_profiler():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop_for_profiler)
+    worker.start()
+    profiler = SamplingProfiler(thread_id=worker.ident, interval=0.001).start()
+    time.sleep(0.1)
+    profiler.stop()
+    stop.set()
+    worker.join()
+
+    text = profiler.collapsed()
+    assert "busy_loop_for_profiler (test_request_timing.py:" in text
+    assert sum(profiler.samples.values()) > 10
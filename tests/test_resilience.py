@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+import pytest
+
+from app.config import settings
+from app.services import (
+    AniListService,
+    AniListTimeoutError,
+    AniListUnavailableError,
+    CircuitOpenError,
+    close_client,
+    get_circuit_breaker,
+    get_latency_tracker,
+    get_search_cache,
+)
+from app.services.resilience import CircuitBreaker
+from stub_server import default_handler
+
+
+def run(coro):
+    async def _main():
+        try:
+            return await coro
+        finally:
+            await close_client()
+
+    return asyncio.run(_main())
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=clock)
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as exc:
+        breaker.before_call()
+    assert exc.value.retry_after == 10
+
+    # 到时间后只放行一个探测请求，失败则重新打开
+    clock.now = 10
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now = 20
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+    assert breaker.stats()["opened"] == 2
+
+
+def test_deadline_covers_slow_response(anilist_stub, monkeypatch):
+    monkeypatch.setattr(settings, "anilist_deadline", 0.2)
+    anilist_stub.delay = 1.0
+    start = time.perf_counter()
+    with pytest.raises(AniListTimeoutError):
+        run(AniListService.search_characters("Asuna"))
+    assert time.perf_counter() - start < 0.6
+    assert get_circuit_breaker().failures == 1
+
+
+def test_deadline_covers_retries(anilist_stub, monkeypatch):
+    monkeypatch.setattr(settings, "anilist_deadline", 0.3)
+    anilist_stub.handler = lambda payload, stub: (429, {}, {"Retry-After": "1"})
+    start = time.perf_counter()
+    with pytest.raises(AniListTimeoutError):
+        run(AniListService.search_characters("Asuna"))
+    assert time.perf_counter() - start < 0.8
+    assert anilist_stub.request_count == 1
+
+
+def test_breaker_fails_fast_after_5xx(test_client, anilist_stub, monkeypatch):
+    monkeypatch.setattr(settings, "anilist_breaker_threshold", 2)
+    anilist_stub.handler = lambda payload, stub: (502, {}, {})
+
+    for name in ("a", "b"):
+        assert test_client.get("/api/character/search", params={"name": name, "source": "remote"}).status_code == 500
+    response = test_client.get("/api/character/search", params={"name": "c", "source": "remote"})
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) > 0
+    assert anilist_stub.request_count == 2
+
+    stats = test_client.get("/api/character/search/stats").json()["data"]
+    assert stats["breaker"]["state"] == "open" and stats["breaker"]["rejected"] == 1
+
+
+def test_connection_drop_counts_as_failure(anilist_stub):
+    anilist_stub.handler = lambda payload, stub: (None, None, {})
+    with pytest.raises(AniListUnavailableError):
+        run(AniListService.search_characters("Asuna"))
+    assert get_circuit_breaker().failures == 1
+
+
+def test_serves_stale_cache_when_upstream_unavailable(anilist_stub, monkeypatch):
+    monkeypatch.setattr(settings, "search_cache_ttl", 0)
+    monkeypatch.setattr(settings, "search_cache_stale_ttl", 0)
+    monkeypatch.setattr(settings, "anilist_deadline", 0.2)
+
+    async def scenario():
+        fresh = await AniListService.search_and_format("Asuna")
+        anilist_stub.delay = 1.0
+        stale = await AniListService.search_and_format("Asuna")
+        with pytest.raises(AniListTimeoutError):
+            await AniListService.search_and_format("Mikasa")
+        return fresh, stale
+
+    fresh, stale = run(scenario())
+    assert stale == fresh
+    assert get_search_cache().stats()["fallbacks"] == 1
+
+
+def test_hedged_request_cuts_tail_latency(anilist_stub, monkeypatch):
+    monkeypatch.setattr(settings, "anilist_hedge_enabled", True)
+    tracker = get_latency_tracker()
+    for _ in range(tracker.min_samples):
+        tracker.record(0.02)
+
+    def slow_first(payload, stub):
+        if stub.request_count == 1:
+            time.sleep(1.0)
+        return default_handler(payload, stub)
+
+    anilist_stub.handler = slow_first
+    start = time.perf_counter()
+    results = run(AniListService.search_characters("Asuna"))
+    assert time.perf_counter() - start < 0.5
+    assert results[0]["name"]["full"] == "Asuna"
+    assert anilist_stub.request_count == 2
+    assert tracker.hedged == 1 and tracker.hedge_wins == 1
+
+
+def test_no_hedge_without_latency_samples(anilist_stub, monkeypatch):
+    monkeypatch.setattr(settings, "anilist_hedge_enabled", True)
+    anilist_stub.delay = 0.1
+    run(AniListService.search_characters("Asuna"))
+    assert anilist_stub.request_count == 1
+    assert get_latency_tracker().hedged == 0
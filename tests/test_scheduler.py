@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services import AniListService, AniListUnavailableError, close_client, get_scheduler
+from app.services.scheduler import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    UpstreamScheduler,
+    parse_retry_after,
+)
+from stub_server import default_handler
+
+
+def run(coro):
+    async def _main():
+        try:
+            return await coro
+        finally:
+            await close_client()
+
+    return asyncio.run(_main())
+
+
+def throttle_first(retry_after: str):
+    """第一次请求返回 429，之后正常"""
+    def handler(payload, stub):
+        if stub.request_count == 1:
+            return 429, {"errors": [{"message": "Too Many Requests"}]}, {
+                "Retry-After": retry_after,
+                "X-RateLimit-Limit": "90",
+                "X-RateLimit-Remaining": "0",
+            }
+        return default_handler(payload, stub)
+
+    return handler
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("garbage") is None
+
+
+def test_retry_after_is_honored(anilist_stub):
+    anilist_stub.handler = throttle_first("1")
+
+    start = time.perf_counter()
+    results = run(AniListService.search_characters("Asuna"))
+    elapsed = time.perf_counter() - start
+
+    assert results[0]["name"]["full"] == "Asuna"
+    assert anilist_stub.request_count == 2
+    assert elapsed >= 0.9
+    assert get_scheduler().stats()["throttled"] == 1
+
+
+def test_long_retry_after_fails_fast_with_503(anilist_stub):
+    anilist_stub.handler = throttle_first("120")
+
+    with TestClient(app) as client:
+        start = time.perf_counter()
+        response = client.get("/api/character/search", params={"name": "Asuna"})
+        elapsed = time.perf_counter() - start
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) > 100
+    assert anilist_stub.request_count == 1
+    assert elapsed < settings.anilist_max_queue_wait
+
+
+def test_remaining_header_drains_bucket(anilist_stub, monkeypatch):
+    monkeypatch.setattr(settings, "anilist_max_queue_wait", 0.2)
+    anilist_stub.handler = lambda payload, stub: (
+        200,
+        default_handler(payload, stub)[1],
+        {"X-RateLimit-Limit": "6", "X-RateLimit-Remaining": "0"},
+    )
+
+    async def scenario():
+        await AniListService.search_characters("Asuna")
+        # 额度为 0 且每 10 秒才补充一个令牌，超过排队上限直接失败
+        with pytest.raises(AniListUnavailableError):
+            await AniListService.search_characters("Mikasa")
+
+    run(scenario())
+    assert anilist_stub.request_count == 1
+    assert get_scheduler().capacity == 6
+
+
+def test_configured_rate_is_a_ceiling():
+    scheduler = UpstreamScheduler(rate_limit=6, max_wait=5)
+    # 上游声明的额度更大时不提高速率
+    scheduler.update(200, {"X-RateLimit-Limit": "90"})
+    assert (scheduler.capacity, scheduler.rate) == (6, 0.1)
+    assert scheduler.tokens <= 6
+    # 上游额度更小时按上游的来
+    scheduler.update(200, {"X-RateLimit-Limit": "3"})
+    assert (scheduler.capacity, scheduler.tokens) == (3, 3)
+
+
+def test_interactive_requests_go_first():
+    scheduler = UpstreamScheduler(rate_limit=600, max_wait=5)
+    scheduler.tokens = 0
+    order = []
+
+    async def worker(name, priority):
+        await scheduler.acquire(priority)
+        order.append(name)
+
+    async def scenario():
+        tasks = [asyncio.create_task(worker(f"background-{i}", PRIORITY_BACKGROUND)) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(worker("interactive", PRIORITY_INTERACTIVE)))
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert order[0] == "interactive"
+    assert scheduler.stats()["granted"] == 4
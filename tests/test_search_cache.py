@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(clock, **kwargs):
+    options = dict(max_size=2, ttl=10, negative_ttl=2, stale_ttl=5, clock=clock)
+    options.update(kwargs)
+    return TTLCache(**options)
+
+
+def test_hit_miss_and_lru_eviction():
+    clock = FakeClock()
+    cache = make_cache(clock)
+    calls = []
+
+    async def scenario():
+        async def loader(value):
+            calls.append(value)
+            return [value]
+
+        await cache.get_or_load("a", lambda: loader("a"))
+        await cache.get_or_load("a", lambda: loader("a"))
+        await cache.get_or_load("b", lambda: loader("b"))
+        await cache.get_or_load("c", lambda: loader("c"))
+
+    asyncio.run(scenario())
+    assert calls == ["a", "b", "c"]
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 3, 1)
+
+
+def test_negative_results_use_short_ttl():
+    clock = FakeClock()
+    cache = make_cache(clock)
+    cache.set("missing", [])
+    cache.set("found", ["x"])
+    clock.now = 3
+    assert cache.get("found") == ["x"]
+    assert cache.get("missing") is None
+
+
+def test_stale_entry_served_while_refreshing():
+    clock = FakeClock()
+    cache = make_cache(clock)
+
+    async def scenario():
+        cache.set("k", ["old"])
+        clock.now = 12  # 过期但仍在 stale 窗口内
+
+        async def loader():
+            return ["new"]
+
+        stale = await cache.get_or_load("k", loader)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        fresh = await cache.get_or_load("k", loader)
+        return stale, fresh
+
+    stale, fresh = asyncio.run(scenario())
+    assert stale == ["old"]
+    assert fresh == ["new"]
+    assert cache.stats()["stale_hits"] == 1
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_failed_refresh_keeps_stale_value():
+    clock = FakeClock()
+    cache = make_cache(clock)
+
+    async def scenario():
+        cache.set("k", ["old"])
+        clock.now = 12
+
+        async def loader():
+            raise RuntimeError("upstream down")
+
+        value = await cache.get_or_load("k", loader)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return value
+
+    assert asyncio.run(scenario()) == ["old"]
+    assert cache.stats()["refresh_errors"] == 1
+    assert cache._entries["k"].value == ["old"]
+
+
+def test_search_endpoint_uses_cache(anilist_stub):
+    with TestClient(app) as client:
+        for name in ("Asuna", " asuna ", "ASUNA"):
+            response = client.get("/api/character/search", params={"name": name})
+            assert response.status_code == 200
+
+        stats = client.get("/api/character/search/stats").json()["data"]["cache"]
+
+    assert anilist_stub.request_count == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
@@ -0,0 +1,56 @@
+import io
+import json
+
+import anyio
+
+import show
+from app.services import AniListService
+from stub_server import AniListStub
+
+
+def test_read_names_skips_blank_and_comments():
+    assert list(show.read_names(["Asuna\n", "\n", "# comment\n", "  Rem  \n"])) == ["Asuna", "Rem"]
+
+
+def test_batch_streams_ndjson_with_bounded_concurrency(anilist_stub):
+    anilist_stub.delay = 0.05
+    names = [f"Name {i}" for i in range(12)] + ["missing one"]
+    out = io.StringIO()
+
+    summary = anyio.run(show.run_batch, iter(names), 4, 3, out)
+
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert sorted(r["name"] for r in records) == sorted(names)
+    assert summary["total"] == 13 and summary["ok"] == 12 and summary["empty"] == 1 and summary["errors"] == 0
+    assert summary["names_per_second"] > 0
+    # 复用 AniListService 的查询，每个请求都带上 per_page
+    assert all(r["variables"]["perPage"] == 3 for r in anilist_stub.requests)
+    assert all(r["query"] == AniListService.QUERY for r in anilist_stub.requests)
+    # 4 个 worker 并发：12 个 50ms 的请求远少于串行的 0.6 秒
+    assert summary["elapsed"] < 0.5
+
+
+def test_batch_reports_errors(monkeypatch):
+    from app.config import settings
+
+    with AniListStub(handler=lambda payload, stub: (500, {}, {})) as stub:
+        monkeypatch.setattr(settings, "anilist_api_url", stub.url)
+        out = io.StringIO()
+        summary = anyio.run(show.run_batch, ["A", "B"], 2, 5, out)
+
+    assert summary["errors"] == 2
+    assert all("error" in json.loads(line) for line in out.getvalue().splitlines())
+
+
+def test_configure_batch_widens_deadline_for_queueing(monkeypatch):
+    from app.config import settings
+
+    for name in ("anilist_rate_limit", "anilist_max_queue_wait", "anilist_deadline", "anilist_max_retries"):
+        monkeypatch.setattr(settings, name, getattr(settings, name))
+    monkeypatch.setattr(settings, "anilist_deadline", 8.0)
+    monkeypatch.setattr(settings, "anilist_max_retries", 2)
+
+    show.configure_batch(6, 600)
+    assert (settings.anilist_rate_limit, settings.anilist_max_queue_wait) == (6, 600)
+    # 每次 429 重试最多排队 max_wait 秒，都在截止时间之内
+    assert settings.anilist_deadline == 8.0 + 600 * 2
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from app.services import AniListService, close_client, get_singleflight
+from app.services.singleflight import SingleFlight
+
+
+def run(coro):
+    async def _main():
+        try:
+            return await coro
+        finally:
+            await close_client()
+
+    return asyncio.run(_main())
+
+
+def test_parallel_identical_searches_send_one_request(anilist_stub):
+    anilist_stub.delay = 0.2
+    before = get_singleflight().stats()["merged"]
+
+    async def search_many():
+        return await asyncio.gather(*(AniListService.search_characters("Asuna") for _ in range(20)))
+
+    results = run(search_many())
+    assert anilist_stub.request_count == 1
+    assert all(r == results[0] for r in results)
+    assert get_singleflight().stats()["merged"] - before == 19
+
+
+def test_errors_are_shared(anilist_stub):
+    anilist_stub.delay = 0.2
+    anilist_stub.handler = lambda payload, stub: (500, {"errors": []}, {})
+
+    async def search_many():
+        return await asyncio.gather(
+            *(AniListService.search_characters("Asuna") for _ in range(5)),
+            return_exceptions=True,
+        )
+
+    results = run(search_many())
+    assert anilist_stub.request_count == 1
+    assert all(isinstance(r, Exception) and "500" in str(r) for r in results)
+
+
+def test_different_variables_are_not_merged(anilist_stub):
+    anilist_stub.delay = 0.1
+
+    async def search_many():
+        await asyncio.gather(
+            AniListService.search_characters("Asuna"),
+            AniListService.search_characters("Asuna", per_page=10),
+            AniListService.search_characters("Mikasa"),
+        )
+
+    run(search_many())
+    assert anilist_stub.request_count == 3
+
+
+def test_cancelled_caller_does_not_cancel_shared_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def scenario():
+        first = asyncio.create_task(flight.do("k", fetch))
+        second = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "ok"
+    assert calls == [1]
+    assert flight.stats() == {"calls": 2, "executions": 1, "merged": 1, "inflight": 0}
@@ -0,0 +1,104 @@
+from app.services import SuggestIndex
+
+
+def ids(results):
+    return [item["id"] for item in results]
+
+
+def test_prefix_ranked_by_favourites():
+    index = SuggestIndex()
+    index.add(1, "Asuna Yuuki", "結城明日奈", favourites=30000)
+    index.add(2, "Asuna Ichinose", favourites=50)
+    index.add(3, "Yui", favourites=40000)
+    index.add(4, "Rem", "レム", favourites=80000)
+
+    assert ids(index.suggest("as", 5)) == [1, 2]
+    assert ids(index.suggest("yu", 5)) == [3, 1]
+    assert ids(index.suggest("asuna y", 5)) == [1]
+    assert ids(index.suggest("明日", 5)) == [1]
+    assert ids(index.suggest("れ", 5)) == [4]
+    assert ids(index.suggest("x", 5)) == []
+    assert index.suggest("rem", 1)[0]["name"] == {"full": "Rem", "native": "レム"}
+
+
+def test_incremental_insert_updates_cached_short_prefix():
+    index = SuggestIndex(top_k=2)
+    index.add(1, "Asuna", favourites=10)
+    index.add(2, "Asuka", favourites=20)
+    assert ids(index.suggest("a", 2)) == [2, 1]
+
+    index.add(3, "Akane", favourites=30)
+    assert ids(index.suggest("a", 2)) == [3, 2]
+
+    # 更新收藏数、删除缓存中的角色后结果重新计算
+    index.add(1, "Asuna", favourites=40)
+    assert ids(index.suggest("a", 2)) == [1, 3]
+    index.remove(1)
+    assert ids(index.suggest("a", 2)) == [3, 2]
+
+
+def test_bounded_entries_evict_unsaved_first():
+    index = SuggestIndex(max_entries=2)
+    index.add(1, "Saved Low", favourites=1, saved=True)
+    index.add(2, "Fetched High", favourites=1000)
+    index.add(3, "Fetched Mid", favourites=500)
+
+    assert len(index) == 2
+    assert ids(index.suggest("fetched", 5)) == [2]
+    assert ids(index.suggest("saved", 5)) == [1]
+    assert index.stats()["evictions"] == 1
+
+
+def test_repeated_updates_stay_bounded_without_queries():
+    index = SuggestIndex()
+    index.COMPACT_MIN = 10
+    index.add(1, "Asuna Yuuki", favourites=1)
+    live = len(index._keys)
+    for favourites in range(2, 500):
+        index.add(1, "Asuna Yuuki", favourites=favourites)
+        index.add(2, "Rem", favourites=favourites)
+
+    # 从来没有调用 suggest()，失效键和淘汰堆也不会无限增长
+    assert len(index._keys) <= 2 * (live + 10) + 10
+    assert len(index._evict_heap) <= 2 * 2 + 10
+    assert ids(index.suggest("asu", 5)) == [1]
+
+
+def test_cached_prefixes_bounded_and_misses_not_cached():
+    index = SuggestIndex(max_cached_prefixes=3)
+    index.add(1, "Asuna", favourites=10)
+    for char in "一二三四五六七八九十":
+        assert index.suggest(char, 5) == []
+    assert index.stats()["cached_prefixes"] == 0
+
+    for prefix in ("a", "as", "asu", "asun"):
+        assert ids(index.suggest(prefix, 5)) == [1]
+    index.suggest("a", 5)
+    assert index.stats()["cached_prefixes"] <= 3
+
+    # 之前没有结果的前缀，插入后能查到
+    index.add(2, "一郎", favourites=5)
+    assert ids(index.suggest("一", 5)) == [2]
+
+
+def test_suggest_endpoint_fed_by_saves_and_searches(test_client, anilist_stub):
+    test_client.post("/api/character/save", json={
+        "id": 99, "name": {"full": "Asuna Saved", "native": None}, "favourites": 5,
+        "image": {"medium": "99.jpg"},
+    })
+    response = test_client.get("/api/character/suggest", params={"q": "asu"})
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert ids(data["suggestions"]) == [99]
+    assert data["suggestions"][0]["saved"] is True
+
+    # AniList 返回的角色也进入联想索引
+    test_client.get("/api/character/search", params={"name": "Asuna", "source": "remote"})
+    suggestions = test_client.get("/api/character/suggest", params={"q": "asu"}).json()["data"]["suggestions"]
+    assert 99 in ids(suggestions) and len(suggestions) > 1
+    assert [item["favourites"] for item in suggestions] == sorted(
+        (item["favourites"] for item in suggestions), reverse=True
+    )
+
+    assert test_client.get("/api/character/suggest", params={"q": " "}).json()["data"]["suggestions"] == []
+    assert test_client.get("/api/character/suggest", params={"q": "a", "limit": 0}).status_code == 400
@@ -0,0 +1,120 @@
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+import anyio
+from sqlalchemy import event
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import Character
+from app.services import CharacterSyncWorker, get_character_version
+from stub_server import make_character
+
+
+def upstream(payload, stub):
+    """id 为偶数的角色收藏数变化，id >= 900000 不存在"""
+    characters = []
+    for char_id in payload["variables"]["ids"]:
+        if char_id < 900000:
+            favourites = 100 + (1 if char_id % 2 == 0 else 0)
+            characters.append(make_character(char_id, f"Character {char_id}", favourites))
+    return 200, {"data": {"Page": {"characters": characters}}}, {}
+
+
+async def seed(engine, ids):
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        for char_id in ids:
+            session.add(Character.from_anilist(make_character(char_id, f"Character {char_id}", 100)))
+        await session.commit()
+
+
+async def etag(engine):
+    async with AsyncSession(engine) as session:
+        return (await get_character_version(session)).etag
+
+
+async def favourites(engine):
+    async with AsyncSession(engine) as session:
+        return dict((await session.exec(select(Character.id, Character.favourites))).all())
+
+
+def test_sync_updates_only_changed_rows(async_engine, anilist_stub, tmp_path):
+    anilist_stub.handler = upstream
+    ids = [*range(1, 8), 900001]
+    updates = []
+
+    def count_updates(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE"):
+            updates.append(len(parameters) if executemany else 1)
+
+    async def main():
+        await seed(async_engine, ids)
+        event.listen(async_engine.sync_engine, "before_cursor_execute", count_updates)
+        worker = CharacterSyncWorker(async_engine, batch_size=3, rate_limit=0, checkpoint_path=tmp_path / "cp.json")
+        await worker.run_pass()
+        return worker, await favourites(async_engine)
+
+    worker, result = anyio.run(main)
+    assert result == {i: (101 if i % 2 == 0 else 100) for i in range(1, 8)} | {900001: 100}
+    stats = worker.stats()
+    assert stats["checked"] == 8 and stats["batches"] == 3
+    assert stats["updated"] == 3 and stats["unchanged"] == 4 and stats["missing"] == 1
+    assert stats["passes"] == 1 and stats["last_id"] == 0
+    # 有变化的批次各一条 executemany UPDATE，只包含有变化的行；最后一批没有变化
+    assert updates == [1, 2]
+    assert anilist_stub.request_count == 3
+    assert all(len(r["variables"]["ids"]) <= 3 for r in anilist_stub.requests)
+
+
+
+def test_sync_changes_table_version(async_engine, anilist_stub, tmp_path):
+    anilist_stub.handler = upstream
+
+    async def main():
+        await seed(async_engine, [1, 2, 3])
+        worker = CharacterSyncWorker(async_engine, batch_size=3, rate_limit=0, checkpoint_path=tmp_path / "cp.json")
+        before = await etag(async_engine)
+        await worker.run_pass()
+        after = await etag(async_engine)
+        # 第二轮没有变化，不更新版本
+        await worker.run_pass()
+        return before, after, await etag(async_engine)
+
+    before, after, unchanged = anyio.run(main)
+    assert after != before
+    assert unchanged == after
+
+def test_checkpoint_resume(async_engine, anilist_stub, tmp_path):
+    anilist_stub.handler = upstream
+    checkpoint = tmp_path / "cp.json"
+
+    async def main():
+        await seed(async_engine, range(1, 6))
+        first = CharacterSyncWorker(async_engine, batch_size=2, rate_limit=0, checkpoint_path=checkpoint)
+        assert await first.sync_batch()
+        # 重启后从检查点继续
+        second = CharacterSyncWorker(async_engine, batch_size=2, rate_limit=0, checkpoint_path=checkpoint)
+        assert second.last_id == 2
+        await second.run_pass()
+        return second
+
+    worker = anyio.run(main)
+    assert worker.checked == 3
+    assert [r["variables"]["ids"] for r in anilist_stub.requests] == [[1, 2], [3, 4], [5]]
+
+
+def test_rate_budget_spaces_requests(async_engine, anilist_stub, tmp_path):
+    anilist_stub.handler = upstream
+
+    async def main():
+        await seed(async_engine, range(1, 4))
+        worker = CharacterSyncWorker(async_engine, batch_size=1, rate_limit=600, checkpoint_path=None)
+        start = anyio.current_time()
+        await worker.run_pass()
+        return anyio.current_time() - start
+
+    # 每分钟 600 次 = 间隔 0.1 秒，3 个请求至少 0.2 秒
+    assert anyio.run(main) >= 0.2
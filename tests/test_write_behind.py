@@ -0,0 +1,179 @@
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+import anyio
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.models import Character, CharacterMedia
+from app.services import WriteBehindBacklogError, WriteBehindBuffer, get_write_behind, on_characters_saved
+from app.services import events, write_behind
+
+
+def payload(char_id, favourites=10):
+    return {
+        "id": char_id,
+        "name": {"full": f"Character {char_id}", "native": None, "alternative": [f"alt {char_id}"]},
+        "image": {"medium": f"{char_id}.jpg"},
+        "favourites": favourites,
+        "siteUrl": f"https://anilist.co/character/{char_id}",
+    }
+
+
+async def create_tables(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+
+async def favourites(engine):
+    async with AsyncSession(engine) as session:
+        return dict((await session.exec(select(Character.id, Character.favourites))).all())
+
+
+@pytest.fixture()
+def buffered(monkeypatch):
+    monkeypatch.setattr(settings, "write_behind_enabled", True)
+    monkeypatch.setattr(settings, "write_behind_max_items", 100)
+    monkeypatch.setattr(settings, "write_behind_flush_interval", 60)
+
+
+def test_repeated_saves_coalesce_into_one_upsert(test_client, async_engine, buffered, monkeypatch):
+    saved = []
+    monkeypatch.setattr(events, "_saved_listeners", list(events._saved_listeners))
+    on_characters_saved(saved.extend)
+
+    for favourites_count in (1, 2, 3):
+        response = test_client.post("/api/character/save", json=payload(1, favourites_count))
+        assert response.status_code == 200
+        assert response.json()["data"] == {"id": 1, "buffered": True}
+    test_client.post("/api/character/save", json=payload(2))
+
+    stats = test_client.get("/api/character/save/stats").json()["data"]
+    assert (stats["enabled"], stats["pending"], stats["accepted"], stats["coalesced"]) == (True, 2, 4, 2)
+    assert test_client.get("/api/getallcharacters").json() == []
+
+    assert test_client.portal.call(get_write_behind(async_engine).flush) == 2
+    assert test_client.portal.call(favourites, async_engine) == {1: 3, 2: 10}
+    assert sorted((s.row["id"], s.status, s.alternative) for s in saved) == [
+        (1, "created", ["alt 1"]), (2, "created", ["alt 2"]),
+    ]
+
+    stats = test_client.get("/api/character/save/stats").json()["data"]
+    assert (stats["pending"], stats["flushes"], stats["written"]) == (0, 1, 2)
+
+
+def test_flush_when_size_threshold_reached(test_client, async_engine, buffered, monkeypatch):
+    monkeypatch.setattr(settings, "write_behind_max_items", 3)
+    for char_id in (1, 2, 3):
+        test_client.post("/api/character/save", json=payload(char_id))
+
+    async def wait_for_flush():
+        with anyio.fail_after(5):
+            while get_write_behind(async_engine).flushes == 0:
+                await anyio.sleep(0.01)
+
+    test_client.portal.call(wait_for_flush)
+    assert test_client.portal.call(favourites, async_engine) == {1: 10, 2: 10, 3: 10}
+
+
+def test_save_without_buffer_writes_immediately(test_client):
+    response = test_client.post("/api/character/save", json=payload(1))
+    assert response.json()["data"] == {"id": 1}
+    assert test_client.get("/api/character/save/stats").json()["data"] == {"enabled": False}
+    assert [c["id"] for c in test_client.get("/api/getallcharacters").json()] == [1]
+
+
+def test_failed_flush_keeps_rows_and_newer_writes_win(async_engine):
+    async def scenario():
+        buffer = WriteBehindBuffer(async_engine, max_items=100, flush_interval=60)
+        await buffer.add(Character.from_anilist(payload(1, 1)))
+        await buffer.add(Character.from_anilist(payload(2, 1)))
+        # 表还不存在，写入失败，角色留在缓冲里
+        assert await buffer.flush() == 0
+        assert (len(buffer), buffer.errors) == (2, 1)
+
+        await buffer.add(Character.from_anilist(payload(1, 5)))
+        await create_tables(async_engine)
+        # 关闭时把剩余的角色全部写入
+        await buffer.close()
+        assert len(buffer) == 0
+        return await favourites(async_engine)
+
+    assert anyio.run(scenario) == {1: 5, 2: 1}
+
+
+def test_failed_flush_keeps_media_when_newer_save_has_none(async_engine, monkeypatch):
+    async def scenario():
+        await create_tables(async_engine)
+        buffer = WriteBehindBuffer(async_engine, max_items=100, flush_interval=60)
+        original = write_behind.upsert_characters
+
+        async def unavailable(*args, **kwargs):
+            # 写入进行中又保存了一次，这次的数据里没有作品信息；随后这次写入失败
+            await buffer.add(Character.from_anilist(payload(1, 5)), ["newer alt"])
+            raise RuntimeError("database is locked")
+
+        monkeypatch.setattr(write_behind, "upsert_characters", unavailable)
+        await buffer.add(Character.from_anilist(payload(1, 1)), media=[{"id": 7, "title": "Show", "type": "ANIME"}])
+        assert await buffer.flush() == 0
+
+        monkeypatch.setattr(write_behind, "upsert_characters", original)
+        assert await buffer.flush() == 1
+        async with AsyncSession(async_engine) as session:
+            links = (await session.exec(select(CharacterMedia.character_id, CharacterMedia.media_id))).all()
+        return await favourites(async_engine), links
+
+    # 角色以新数据为准，作品关联来自失败的那一批
+    assert anyio.run(scenario) == ({1: 5}, [(1, 7)])
+
+
+def test_backpressure_waits_for_flush_when_backlog_is_full(async_engine):
+    async def scenario():
+        await create_tables(async_engine)
+        buffer = WriteBehindBuffer(async_engine, max_items=2, flush_interval=60, max_pending=3)
+        for char_id in (1, 2, 3):
+            await buffer.add(Character.from_anilist(payload(char_id)))
+        # 第三个角色达到积压上限，add() 直接等待写入完成
+        assert (len(buffer), buffer.flushes) == (0, 1)
+        await buffer.close()
+        return await favourites(async_engine)
+
+    assert anyio.run(scenario) == {1: 10, 2: 10, 3: 10}
+
+
+def test_backpressure_failure_keeps_character_queued(async_engine):
+    async def scenario():
+        buffer = WriteBehindBuffer(async_engine, max_items=2, flush_interval=60, max_pending=2)
+        await buffer.add(Character.from_anilist(payload(1)))
+        # 表还不存在，积压达到上限时的同步写入失败：报告积压，角色仍在缓冲里
+        with pytest.raises(WriteBehindBacklogError):
+            await buffer.add(Character.from_anilist(payload(2)))
+        assert len(buffer) == 2
+
+        await create_tables(async_engine)
+        await buffer.close()
+        return await favourites(async_engine)
+
+    assert anyio.run(scenario) == {1: 10, 2: 10}
+
+
+def test_save_endpoint_reports_backlog_as_503(test_client, async_engine, buffered, monkeypatch):
+    monkeypatch.setattr(settings, "write_behind_max_items", 1)
+    monkeypatch.setattr(settings, "write_behind_max_pending", 1)
+
+    async def unavailable(*args, **kwargs):
+        raise RuntimeError("database is locked")
+
+    original = write_behind.upsert_characters
+    monkeypatch.setattr(write_behind, "upsert_characters", unavailable)
+    response = test_client.post("/api/character/save", json=payload(1))
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "60"
+    assert get_write_behind(async_engine).stats()["pending"] == 1
+
+    # 数据库恢复后，排队的角色照常写入
+    monkeypatch.setattr(write_behind, "upsert_characters", original)
+    assert test_client.portal.call(get_write_behind(async_engine).flush) == 1
+    assert test_client.portal.call(favourites, async_engine) == {1: 10}